@@ -9,6 +9,7 @@ from drf_spectacular.views import (
 )
 
 from school_tracker.accounts.views import (
+    PasswordSetupViewSet,
     UserViewSet,
     MeViewSet
 )
@@ -19,17 +20,20 @@ from school_tracker.members.views import (
     MemberViewSet, 
     TeacherViewSet
 )
-from school_tracker.schedules.views import DayPlanViewSet
+from school_tracker.schedules.views import DashboardViewSet, DayPlanViewSet, EventFeedViewSet
 
 
 router = routers.SimpleRouter()
 # User Management
 router.register(r'account', UserViewSet, basename="accounts")
 router.register(r'me', MeViewSet, basename="me")
+router.register(r'password-setup', PasswordSetupViewSet, basename="password-setup")
 # Messages/Chat
 router.register(r'chat', MessageViewSet, basename="messages")
 # DayPlan
 router.register(r'dayplan', DayPlanViewSet, basename="dayplans")
+router.register(r'event', EventFeedViewSet, basename="events")
+router.register(r'dashboard', DashboardViewSet, basename="dashboard")
 # Members Endpoints
 router.register(r'member', MemberViewSet, basename="members")
 router.register(r'child', ChildViewSet, basename="children")
@@ -1,4 +1,5 @@
 from django.contrib.auth.base_user import BaseUserManager
+from django.db import models
 from django.utils.translation import gettext_lazy as _
 
 
@@ -48,4 +49,29 @@ class CustomUserManager(BaseUserManager):
         """
         return CustomUser.objects.filter(
             parent__child__group__id=group_id
-        ).distinct()
\ No newline at end of file
+        ).distinct()
+
+    def fetch_child_audience(self, child_id: int):
+        """
+        Return ids of users allowed to see child's chat
+        (parents of the child and teachers assigned to child's group)
+        """
+        return self.filter(
+            models.Q(parent__children__id=child_id)
+            | models.Q(teacher__groups__group__group_students__id=child_id)
+        ).values_list("id", flat=True).distinct()
+
+    def fetch_group_audience(self, group_id: int, child_ids: list):
+        """
+        Return (user_id, child_id) pairs of users allowed to see chats
+        of given group's children
+        """
+        parents = self.filter(
+            parent__children__group__id=group_id,
+            parent__children__id__in=child_ids,
+        ).values_list("id", "parent__children__id")
+        teachers = self.filter(
+            teacher__groups__group__id=group_id
+        ).values_list("id", flat=True).distinct()
+        return set(parents) | {(teacher_id, child_id) for teacher_id in teachers for child_id in child_ids}
+
@@ -1,4 +1,8 @@
 from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.tokens import default_token_generator
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.utils.encoding import force_str
+from django.utils.http import urlsafe_base64_decode
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
@@ -90,4 +94,29 @@ class PasswordUpdateSerializer(GenericPasswordUpdateSerializer):
         if not user.check_password(password):
             raise serializers.ValidationError({
                 "password": "Old password is incorrect. Please enter a valid password."
-            })
\ No newline at end of file
+            })
+
+
+class PasswordSetupSerializer(serializers.Serializer):
+    """
+    Password of invited user, `uid` and `token` come from invitation link
+    """
+    uid = serializers.CharField(write_only=True)
+    token = serializers.CharField(write_only=True)
+    password = serializers.CharField(write_only=True)
+
+    invalid_link_message = "Invitation link is invalid or has already been used."
+
+    def validate(self, data):
+        try:
+            user = CustomUser.objects.get(pk=force_str(urlsafe_base64_decode(data["uid"])))
+        except (ValueError, OverflowError, CustomUser.DoesNotExist):
+            raise serializers.ValidationError({"token": self.invalid_link_message})
+        if not default_token_generator.check_token(user, data["token"]):
+            raise serializers.ValidationError({"token": self.invalid_link_message})
+        try:
+            validate_password(data["password"], user)
+        except DjangoValidationError as error:
+            raise serializers.ValidationError({"password": error.messages})
+        data["user"] = user
+        return data
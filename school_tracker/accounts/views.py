@@ -5,11 +5,12 @@ from rest_framework import (
     status
 )
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
 from school_tracker.accounts.models import CustomUser
 from school_tracker.accounts.serializers import (
+    PasswordSetupSerializer,
     PasswordUpdateSerializer,
     MeUpdateSerializer,
     UserUpdateSerializer,
@@ -65,4 +66,19 @@ class MeViewSet(mixins.UpdateModelMixin,
         serializer.is_valid(raise_exception=True)
         user.set_password(serializer.validated_data['password'])
         user.save()
-        return Response(status=status.HTTP_204_NO_CONTENT)
\ No newline at end of file
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class PasswordSetupViewSet(viewsets.GenericViewSet):
+    """
+    POST -> set password of invited user with `uid` and `token` from invitation link
+    """
+    permission_classes = [AllowAny]
+    serializer_class = PasswordSetupSerializer
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        user = serializer.validated_data["user"]
+        user.set_password(serializer.validated_data["password"])
+        user.save()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,30 @@
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from school_tracker.chats.notifications import user_group_name
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    WebSocket pushing new chat messages to parents and teachers related to child
+    """
+
+    async def connect(self):
+        user = self.scope.get("user")
+        if user is None or not user.is_authenticated:
+            await self.close()
+            return
+
+        self.group_name = user_group_name(user.id)
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if group_name := getattr(self, "group_name", None):
+            await self.channel_layer.group_discard(group_name, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        # Socket is push-only, messages are created through REST endpoint
+        pass
+
+    async def chat_message(self, event):
+        await self.send_json(event["message"])
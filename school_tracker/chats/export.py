@@ -0,0 +1,56 @@
+"""
+Streaming export of chat history.
+
+Rows are read with a chunked server-side cursor and written out one by one,
+so memory use does not depend on the number of exported messages.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_COLUMNS = {
+    "id": "id",
+    "timestamp": "timestamp",
+    "child": "child_id",
+    "child_first_name": "child__first_name",
+    "child_last_name": "child__last_name",
+    "sender": "sender_id",
+    "sender_first_name": "sender__first_name",
+    "sender_last_name": "sender__last_name",
+    "message_text": "message_text",
+}
+
+
+class Echo:
+    """
+    File-like object returning written value instead of buffering it
+    """
+    def write(self, value):
+        return value
+
+
+def iter_rows(queryset, chunk_size: int = EXPORT_CHUNK_SIZE):
+    return queryset.order_by("timestamp", "id").values_list(
+        *EXPORT_COLUMNS.values()
+    ).iterator(chunk_size=chunk_size)
+
+
+def stream_ndjson(queryset, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Yield messages as newline delimited JSON objects
+    """
+    columns = list(EXPORT_COLUMNS)
+    for row in iter_rows(queryset, chunk_size):
+        yield json.dumps(dict(zip(columns, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+def stream_csv(queryset, chunk_size: int = EXPORT_CHUNK_SIZE):
+    """
+    Yield messages as CSV lines, header first
+    """
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for row in iter_rows(queryset, chunk_size):
+        yield writer.writerow(row)
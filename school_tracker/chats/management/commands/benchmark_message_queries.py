@@ -0,0 +1,109 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+
+from school_tracker.accounts.models import CustomUser
+from school_tracker.chats.models import Message
+from school_tracker.members.models import Child
+
+
+class Command(BaseCommand):
+    help = (
+        "Print query plans and latencies of MessageManager lookups. "
+        "With --seed, first insert synthetic messages (PostgreSQL only)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seed", type=int, default=0, help="Number of synthetic messages to insert.")
+        parser.add_argument("--days", type=int, default=365, help="Spread seeded messages over last N days.")
+        parser.add_argument("--repeat", type=int, default=20, help="Number of timed runs per query.")
+        parser.add_argument("--limit", type=int, default=50, help="Page size used for child/sender lookups.")
+        parser.add_argument("--child", type=int, help="Child id to query (most active child by default).")
+        parser.add_argument("--sender", type=int, help="Sender id to query (most active sender by default).")
+
+    def handle(self, *args, **options):
+        if options["seed"]:
+            self.seed(options["seed"], options["days"])
+
+        total = Message.objects.count()
+        if not total:
+            raise CommandError("No messages to benchmark, use --seed to generate them.")
+
+        child_id = options["child"] or self._most_frequent("child_id")
+        sender_id = options["sender"] or self._most_frequent("sender_id")
+        day = Message.objects.filter(child=child_id).values_list("timestamp", flat=True).first()
+        day = timezone.localdate(day)
+        limit = options["limit"]
+
+        self.stdout.write(f"Messages: {total}, child: {child_id}, sender: {sender_id}, day: {day}")
+
+        queries = {
+            "day (legacy timestamp__date)": Message.objects.filter(child=child_id, timestamp__date=day),
+            "day (range)": Message.objects.fetch_by_date(child_id, day),
+            "child latest page": Message.objects.fetch_by_child_id(child_id).order_by("-timestamp", "-id")[:limit],
+            "child last 7 days": Message.objects.fetch_by_child_id(
+                child_id, since=timezone.now() - timedelta(days=7)
+            ),
+            "sender latest page": Message.objects.fetch_by_sender_id(sender_id).order_by("-timestamp")[:limit],
+        }
+        for name, queryset in queries.items():
+            self.benchmark(name, queryset, options["repeat"])
+
+    def seed(self, count, days):
+        if connection.vendor != "postgresql":
+            raise CommandError("Seeding is supported on PostgreSQL only.")
+        if not Child.objects.exists() or not CustomUser.objects.exists():
+            raise CommandError("Seeding requires at least one child and one user.")
+
+        started = time.perf_counter()
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {Message._meta.db_table} (sender_id, child_id, message_text, timestamp)
+                SELECT
+                    senders.ids[1 + i % array_length(senders.ids, 1)],
+                    children.ids[1 + i % array_length(children.ids, 1)],
+                    'Benchmark message ' || i,
+                    now() - random() * (%s * interval '1 day')
+                FROM generate_series(1, %s) AS i,
+                    (SELECT array_agg(id) AS ids FROM {CustomUser._meta.db_table}) AS senders,
+                    (SELECT array_agg(id) AS ids FROM {Child._meta.db_table}) AS children
+                """,
+                [days, count],
+            )
+            cursor.execute(f"ANALYZE {Message._meta.db_table}")
+        self.stdout.write(f"Seeded {count} messages in {time.perf_counter() - started:.1f}s")
+
+    def benchmark(self, name, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            list(queryset.values_list("id", flat=True))
+            timings.append((time.perf_counter() - started) * 1000)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n{name}"))
+        self.stdout.write(self.explain(queryset))
+        self.stdout.write(
+            f"min {min(timings):.2f} ms, median {statistics.median(timings):.2f} ms, max {max(timings):.2f} ms"
+        )
+
+    @staticmethod
+    def explain(queryset):
+        if connection.vendor == "postgresql":
+            return queryset.explain(analyze=True, buffers=True)
+        return queryset.explain()
+
+    @staticmethod
+    def _most_frequent(field):
+        return (
+            Message.objects.values(field)
+            .annotate(total=Count("id"))
+            .order_by("-total")
+            .values_list(field, flat=True)
+            .first()
+        )
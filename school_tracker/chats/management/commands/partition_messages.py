@@ -0,0 +1,67 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from school_tracker.chats import partitions
+
+
+class Command(BaseCommand):
+    help = (
+        "Manage monthly partitions of the chat Message table (PostgreSQL only). "
+        "`convert` partitions existing table, `create` adds future partitions "
+        "(run it from cron), `detach` detaches or archives old ones."
+    )
+
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest="action", required=True)
+
+        convert = subparsers.add_parser("convert", help="Convert Message table into partitioned table.")
+        convert.add_argument("--months-ahead", type=int, default=3)
+
+        create = subparsers.add_parser("create", help="Create partitions for upcoming months.")
+        create.add_argument("--months-ahead", type=int, default=3)
+
+        detach = subparsers.add_parser("detach", help="Detach partitions older than given month.")
+        detach.add_argument("--before", required=True, help="First month to keep attached (YYYY-MM).")
+        detach_mode = detach.add_mutually_exclusive_group()
+        detach_mode.add_argument("--archive-schema", help="Move detached partitions to this schema.")
+        detach_mode.add_argument("--drop", action="store_true", help="Drop detached partitions.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != "postgresql":
+            raise CommandError("Message partitioning is supported on PostgreSQL only.")
+
+        today = timezone.localdate()
+        action = options["action"]
+
+        if action == "convert":
+            if partitions.is_partitioned():
+                raise CommandError("Message table is already partitioned.")
+            created = partitions.convert_to_partitioned(options["months_ahead"], today)
+            self.stdout.write(self.style.SUCCESS(f"Message table partitioned into {len(created)} monthly partitions."))
+            return
+
+        if not partitions.is_partitioned():
+            raise CommandError("Message table is not partitioned yet, run `partition_messages convert` first.")
+
+        if action == "create":
+            last_month = partitions.add_months(partitions.month_start(today), options["months_ahead"])
+            created = partitions.create_partitions(today, last_month)
+            self.stdout.write(self.style.SUCCESS(f"Created partitions: {', '.join(created) or 'none'}"))
+
+        elif action == "detach":
+            before = self._parse_month(options["before"])
+            if before > partitions.month_start(today):
+                raise CommandError("Partitions of current and upcoming months cannot be detached.")
+            detached = partitions.detach_partitions(before, options["archive_schema"], options["drop"])
+            self.stdout.write(self.style.SUCCESS(f"Detached partitions: {', '.join(detached) or 'none'}"))
+
+    @staticmethod
+    def _parse_month(value):
+        try:
+            year, month = value.split("-")
+            return date(int(year), int(month), 1)
+        except ValueError:
+            raise CommandError("Month has to be given as YYYY-MM.")
@@ -1,26 +1,212 @@
-from django.db import models
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections, models, transaction
+from django.db.models import F, OuterRef, Q, Subquery
 
-class MessageManager(models.Manager):
-    def fetch_by_child_id(self, child_id: int):
+from school_tracker.chats.search import SEARCH_CONFIG
+
+from school_tracker.utils.datetools import get_day_range
+
+
+class MessageQuerySet(models.QuerySet):
+    def older_than(self, timestamp, pk: int):
+        """
+        Messages placed before (timestamp, pk) position, newest first
+        """
+        return self.filter(
+            Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=pk),
+            timestamp__lte=timestamp,
+        ).order_by("-timestamp", "-id")
+
+    def newer_than(self, timestamp, pk: int):
+        """
+        Messages placed after (timestamp, pk) position, oldest first
+        """
+        return self.filter(
+            Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=pk),
+            timestamp__gte=timestamp,
+        ).order_by("timestamp", "id")
+
+    def between(self, since=None, until=None):
+        """
+        Messages placed in half-open [since, until) datetime range
+        """
+        queryset = self
+        if since is not None:
+            queryset = queryset.filter(timestamp__gte=since)
+        if until is not None:
+            queryset = queryset.filter(timestamp__lt=until)
+        return queryset
+
+    def latest_per_child(self):
+        """
+        The newest message of every child chat, resolved in a single query
+        (DISTINCT ON on PostgreSQL, correlated subquery elsewhere)
+        """
+        if connections[self.db].vendor == "postgresql":
+            return self.order_by("child_id", "-timestamp", "-id").distinct("child_id")
+
+        newest = self.model.objects.filter(child=OuterRef("child")).order_by("-timestamp", "-id")
+        return self.filter(id=Subquery(newest.values("id")[:1]))
+
+    def search(self, text: str):
+        """
+        Messages matching text, best matches first.
+        Uses GIN indexed search_vector on PostgreSQL, plain text match elsewhere
+        """
+        if connections[self.db].vendor != "postgresql":
+            return self.filter(message_text__icontains=text).order_by("-timestamp", "-id")
+
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type="websearch")
+        return self.filter(search_vector=query).annotate(
+            rank=SearchRank(F("search_vector"), query)
+        ).order_by("-rank", "-timestamp", "-id")
+
+
+class MessageManager(models.Manager.from_queryset(MessageQuerySet)):
+    def fetch_by_child_id(self, child_id: int, since=None, until=None):
         """
-        Fetch messages by child_id
+        Fetch messages by child_id, optionally within [since, until) range
         """
-        return self.filter(child=child_id)
-    
-    def fetch_by_sender_id(self, sender_id: int):
+        return self.filter(child=child_id).between(since, until)
+
+    def fetch_by_sender_id(self, sender_id: int, since=None, until=None):
+        """
+        Fetch messages by sender, optionally within [since, until) range
+        """
+        return self.filter(sender=sender_id).between(since, until)
+
+    def fetch_filtered(self, child_id: int = None, sender_id: int = None, since=None, until=None):
         """
-        Fetch messages by sender
+        Fetch messages matching any combination of child, sender and [since, until) range
         """
-        return self.filter(sender=sender_id)
+        queryset = self.between(since, until)
+        if child_id is not None:
+            queryset = queryset.filter(child=child_id)
+        if sender_id is not None:
+            queryset = queryset.filter(sender=sender_id)
+        return queryset
 
     def fetch_by_sender_and_child(self, sender_id: int, child_id: int):
         """
         Fetch messages for sender's particular child
         """
         return self.filter(sender=sender_id, child_id=child_id)
-    
+
     def fetch_by_date(self, child_id: int, date):
         """
         Fetch messages about particular child for a particular day
+        (day boundaries in institution's timezone)
+        """
+        return self.fetch_by_child_id(child_id, *get_day_range(date))
+
+    def create_for_group(self, sender, group_id: int, message_text: str):
         """
-        return self.filter(child=child_id, timestamp__date=date)
\ No newline at end of file
+        Create the same message about every child of a group with a single insert
+        """
+        from school_tracker.members.models import Child
+
+        child_ids = Child.objects.filter(group=group_id).values_list("id", flat=True)
+        return self.bulk_create([
+            self.model(sender=sender, child_id=child_id, message_text=message_text)
+            for child_id in child_ids
+        ])
+
+    def fetch_latest_for_child(self, child_id: int):
+        """
+        Fetch (id, timestamp) of the newest message about child
+        """
+        return self.fetch_by_child_id(child_id).order_by(
+            "-timestamp", "-id"
+        ).values_list("id", "timestamp").first()
+
+    def fetch_since(self, child_id: int, timestamp=None, pk: int = None):
+        """
+        Fetch messages about child placed after (timestamp, pk) position, oldest first
+        """
+        if timestamp is None:
+            return self.fetch_by_child_id(child_id).order_by("timestamp", "id")
+        return self.fetch_by_child_id(child_id).newer_than(timestamp, pk)
+
+
+class ReadCursorManager(models.Manager):
+    def register_message(self, message, audience_ids):
+        """
+        Increment unread counters of child's audience for a new message,
+        sender's own cursor moves to the message
+        """
+        audience_ids = list(audience_ids)
+        self.bulk_create(
+            [self.model(user_id=user_id, child_id=message.child_id) for user_id in audience_ids],
+            ignore_conflicts=True,
+        )
+        self.filter(child=message.child_id, user__in=audience_ids).exclude(
+            user=message.sender_id
+        ).update(unread_count=F("unread_count") + 1)
+        self.filter(child=message.child_id, user=message.sender_id).update(
+            unread_count=0,
+            last_read_message_id=message.id,
+            last_read_at=message.timestamp,
+        )
+
+    def register_group_messages(self, messages, audience):
+        """
+        Increment unread counters for messages created at once for many children
+
+        :param messages: Created messages (all sent by the same sender).
+        :param audience: (user_id, child_id) pairs of users allowed to see the messages.
+        """
+        if not messages:
+            return
+        self.bulk_create(
+            [self.model(user_id=user_id, child_id=child_id) for user_id, child_id in audience],
+            ignore_conflicts=True,
+        )
+        self.filter(
+            child__in={message.child_id for message in messages},
+            user__in={user_id for user_id, _ in audience},
+        ).exclude(user=messages[0].sender_id).update(unread_count=F("unread_count") + 1)
+
+    def advance(self, user_id: int, child_id: int, message_id: int = None):
+        """
+        Move user's cursor forward to given (or the newest) message
+        and recount messages left unread after it
+        """
+        from school_tracker.chats.models import Message
+
+        with transaction.atomic():
+            self.get_or_create(user_id=user_id, child_id=child_id)
+            # Lock cursor first, so counters of messages created meanwhile are not lost
+            cursor = self.select_for_update().get(user_id=user_id, child_id=child_id)
+
+            latest = Message.objects.fetch_latest_for_child(child_id)
+            if message_id is None:
+                target = latest
+            else:
+                target = Message.objects.fetch_by_child_id(child_id).filter(
+                    id=message_id
+                ).values_list("id", "timestamp").first()
+                if target is None:
+                    raise Message.DoesNotExist("Message not found.")
+
+            if target is None or (
+                cursor.last_read_at is not None
+                and (cursor.last_read_at, cursor.last_read_message_id) >= (target[1], target[0])
+            ):
+                return cursor
+
+            cursor.last_read_message_id, cursor.last_read_at = target
+            if target == latest:
+                cursor.unread_count = 0
+            else:
+                cursor.unread_count = Message.objects.fetch_by_child_id(child_id).newer_than(
+                    cursor.last_read_at, cursor.last_read_message_id
+                ).exclude(sender=user_id).count()
+            cursor.save(update_fields=["last_read_message_id", "last_read_at", "unread_count"])
+        return cursor
+
+    def fetch_badges(self, user_id: int):
+        """
+        Fetch unread counters for every child chat of the user
+        """
+        return self.filter(user=user_id).values("child", "unread_count")
+
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0001_initial"),
+        ("members", "0003_remove_parent_child_child_parents"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="message",
+            options={"ordering": ("-timestamp", "-id")},
+        ),
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["child", "-timestamp", "-id"], name="chats_msg_child_ts_id_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:32
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0002_message_keyset_index"),
+        ("members", "0003_remove_parent_child_child_parents"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="message",
+            index=models.Index(
+                fields=["sender", "-timestamp"], name="chats_msg_sender_ts_idx"
+            ),
+        ),
+        migrations.AlterField(
+            model_name="message",
+            name="child",
+            field=models.ForeignKey(
+                blank=True,
+                db_index=False,
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="members.child",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="message",
+            name="sender",
+            field=models.ForeignKey(
+                db_index=False,
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="sent_messages",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:35
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+from school_tracker.chats.search import install_search_index, remove_search_index
+
+
+def create_search_index(apps, schema_editor):
+    install_search_index(schema_editor)
+
+
+def drop_search_index(apps, schema_editor):
+    remove_search_index(schema_editor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("chats", "0004_readcursor"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="message",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,7 +1,8 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
 
 from school_tracker.accounts.models import CustomUser
-from school_tracker.chats.manager import MessageManager
+from school_tracker.chats.manager import MessageManager, ReadCursorManager
 from school_tracker.members.models import (
     Child, 
     Group
@@ -13,10 +14,19 @@ class Message(models.Model):
         CustomUser,
         on_delete=models.CASCADE,
         related_name='sent_messages',
+        db_index=False,  # covered by (sender, timestamp) index
+    )
+    child = models.ForeignKey(
+        Child,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,  # covered by (child, timestamp, id) index
     )
-    child = models.ForeignKey(Child, on_delete=models.CASCADE, null=True, blank=True)
     message_text = models.CharField(max_length=1000)
     timestamp = models.DateTimeField(auto_now_add=True)
+    # Maintained by database trigger and GIN indexed on PostgreSQL (see chats/search.py)
+    search_vector = SearchVectorField(null=True, editable=False)
 
     objects = MessageManager()
 
@@ -24,6 +34,32 @@ class Message(models.Model):
         return f"Message about {self.child.full_name} sent by {self.sender.email}"
 
     class Meta:
-        ordering = ('-timestamp',)
+        ordering = ('-timestamp', '-id')
+        indexes = [
+            models.Index(fields=["child", "-timestamp", "-id"], name="chats_msg_child_ts_id_idx"),
+            models.Index(fields=["sender", "-timestamp"], name="chats_msg_sender_ts_idx"),
+        ]
+
+
+class ReadCursor(models.Model):
+    """
+    Position of the last message read by user in child's chat
+    together with materialized number of unread messages
+    """
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name="read_cursors")
+    child = models.ForeignKey(Child, on_delete=models.CASCADE, related_name="read_cursors")
+    # Plain id instead of FK, messages may be moved out of the main table
+    last_read_message_id = models.BigIntegerField(null=True, blank=True)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    unread_count = models.PositiveIntegerField(default=0)
 
+    objects = ReadCursorManager()
+
+    def __str__(self):
+        return f"Read cursor of {self.user.email} for {self.child.full_name}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "child"], name="unique_read_cursor_per_user_and_child"),
+        ]
 
@@ -0,0 +1,28 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+
+def user_group_name(user_id: int) -> str:
+    """
+    Name of channel layer group which holds all sockets opened by user
+    """
+    return f"chat.user.{user_id}"
+
+
+def broadcast_message(message, audience_ids):
+    """
+    Push created message to every connected user from audience
+    """
+    from school_tracker.chats.serializers import MessageCreateSerializer
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    event = {
+        "type": "chat.message",
+        "message": dict(MessageCreateSerializer(message).data),
+    }
+    group_send = async_to_sync(channel_layer.group_send)
+    for user_id in audience_ids:
+        group_send(user_group_name(user_id), event)
@@ -0,0 +1,138 @@
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from school_tracker.utils.cursors import CursorPageSizeMixin, decode_cursor, encode_cursor
+
+
+class MessageCursorPagination(CursorPageSizeMixin, BasePagination):
+    """
+    Keyset pagination over (timestamp, id) for chat scrollback.
+
+    ?before=<cursor> -> page of messages older than cursor
+    ?after=<cursor> -> page of messages newer than cursor
+    ?around=<message_id> -> page centered on a particular message
+
+    Results are always returned newest first, every page costs
+    a single index range scan no matter how deep in history it is.
+    """
+    page_size = 50
+    max_page_size = 200
+    before_query_param = "before"
+    after_query_param = "after"
+    around_query_param = "around"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+        params = request.query_params
+
+        if around := params.get(self.around_query_param):
+            page = self._paginate_around(queryset, around, page_size)
+        elif after := params.get(self.after_query_param):
+            page = self._paginate_after(queryset, after, page_size)
+        else:
+            page = self._paginate_before(queryset, params.get(self.before_query_param), page_size)
+
+        self.page = page
+        return page
+
+    def get_paginated_response(self, data):
+        return Response({
+            "older": self.get_older_link(),
+            "newer": self.get_newer_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "older": {"type": "string", "nullable": True, "format": "uri"},
+                "newer": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_older_link(self):
+        if not (self.has_older and self.page):
+            return None
+        return self._build_link(self.before_query_param, self.page[-1])
+
+    def get_newer_link(self):
+        if not (self.has_newer and self.page):
+            return None
+        return self._build_link(self.after_query_param, self.page[0])
+
+    def _build_link(self, query_param, message):
+        url = self.base_url
+        for param in (self.before_query_param, self.after_query_param, self.around_query_param):
+            url = remove_query_param(url, param)
+        return replace_query_param(url, query_param, self.encode_position(message))
+
+    @staticmethod
+    def encode_position(message) -> str:
+        return encode_cursor(message.timestamp.isoformat(), message.pk)
+
+    def decode_position(self, cursor: str):
+        try:
+            timestamp, pk = decode_cursor(cursor, size=2)
+            timestamp = parse_datetime(timestamp)
+            pk = int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if timestamp is None:
+            raise NotFound(self.invalid_cursor_message)
+        return timestamp, pk
+
+    def _paginate_before(self, queryset, cursor, page_size):
+        if cursor:
+            queryset = queryset.older_than(*self.decode_position(cursor))
+        else:
+            queryset = queryset.order_by("-timestamp", "-id")
+
+        rows = list(queryset[:page_size + 1])
+        self.has_older = len(rows) > page_size
+        self.has_newer = bool(cursor)
+        return rows[:page_size]
+
+    def _paginate_after(self, queryset, cursor, page_size):
+        rows = list(queryset.newer_than(*self.decode_position(cursor))[:page_size + 1])
+        self.has_newer = len(rows) > page_size
+        self.has_older = True
+        rows = rows[:page_size]
+        rows.reverse()
+        return rows
+
+    def _paginate_around(self, queryset, message_id, page_size):
+        try:
+            anchor = queryset.get(id=int(message_id))
+        except (ValueError, queryset.model.DoesNotExist):
+            raise NotFound("Message not found.")
+
+        newer_count = (page_size - 1) // 2
+        older_count = page_size - 1 - newer_count
+
+        newer = list(queryset.newer_than(anchor.timestamp, anchor.pk)[:newer_count + 1])
+        older = list(queryset.older_than(anchor.timestamp, anchor.pk)[:older_count + 1])
+        self.has_newer = len(newer) > newer_count
+        self.has_older = len(older) > older_count
+
+        newer = newer[:newer_count]
+        newer.reverse()
+        return newer + [anchor] + older[:older_count]
+
+
+class MessageSearchPagination(PageNumberPagination):
+    """
+    Search results are ordered by rank, so they are paginated by page number
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = "page_size"
+
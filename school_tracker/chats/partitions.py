@@ -0,0 +1,166 @@
+"""
+Monthly range partitioning of the Message table on PostgreSQL.
+
+The table is converted once with `partition_messages convert`, afterwards
+future partitions are created ahead of time (`partition_messages create`,
+safe to run from cron) and old ones can be detached or archived
+(`partition_messages detach`).
+"""
+import re
+from datetime import date
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from school_tracker.chats.models import Message
+from school_tracker.chats.search import install_search_index
+from school_tracker.utils.datetools import get_day_start
+
+TABLE = Message._meta.db_table
+DEFAULT_PARTITION = f"{TABLE}_default"
+PARTITION_NAME_RE = re.compile(rf"^{TABLE}_p(?P<year>\d{{4}})_(?P<month>\d{{2}})$")
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(day: date, months: int) -> date:
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_p{month.year:04d}_{month.month:02d}"
+
+
+def partition_month(name: str):
+    """
+    Return first day of month stored in partition, None for other tables
+    """
+    if match := PARTITION_NAME_RE.match(name):
+        return date(int(match["year"]), int(match["month"]), 1)
+    return None
+
+
+def is_partitioned() -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+            [TABLE],
+        )
+        row = cursor.fetchone()
+    return bool(row) and row[0] == "p"
+
+
+def list_partitions() -> list:
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.oid = to_regclass(%s)
+            ORDER BY child.relname
+            """,
+            [TABLE],
+        )
+        return [name for name, in cursor.fetchall()]
+
+
+def create_partition(cursor, month: date) -> str:
+    """
+    Create partition holding messages of given month (bounds in institution's timezone)
+    """
+    name = partition_name(month)
+    cursor.execute(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} FOR VALUES FROM (%s) TO (%s)",
+        [get_day_start(month), get_day_start(add_months(month, 1))],
+    )
+    return name
+
+
+def create_partitions(first_month: date, last_month: date) -> list:
+    created = []
+    existing = set(list_partitions())
+    with transaction.atomic(), connection.cursor() as cursor:
+        month = month_start(first_month)
+        while month <= last_month:
+            if partition_name(month) not in existing:
+                created.append(create_partition(cursor, month))
+            month = add_months(month, 1)
+    return created
+
+
+def convert_to_partitioned(months_ahead: int, today: date) -> list:
+    """
+    Recreate Message table as partitioned by month and move existing rows into it
+    """
+    legacy_table = f"{TABLE}_unpartitioned"
+    with connection.schema_editor() as schema_editor, connection.cursor() as cursor:
+        # Old table cannot be dropped while its deferred FK checks are pending
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute(f"LOCK TABLE {TABLE} IN ACCESS EXCLUSIVE MODE")
+        cursor.execute(f'SELECT min("timestamp") FROM {TABLE}')
+        oldest, = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {TABLE} RENAME TO {legacy_table}")
+        cursor.execute(
+            f"""
+            CREATE TABLE {TABLE} (LIKE {legacy_table} INCLUDING CONSTRAINTS INCLUDING STORAGE)
+            PARTITION BY RANGE ("timestamp")
+            """
+        )
+        # Partition key has to be a part of the primary key
+        cursor.execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY (id, "timestamp")')
+
+        first_month = month_start(timezone.localdate(oldest) if oldest else today)
+        month, partitions = first_month, []
+        while month <= add_months(month_start(today), months_ahead):
+            partitions.append(create_partition(cursor, month))
+            month = add_months(month, 1)
+        cursor.execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT")
+
+        cursor.execute(f"INSERT INTO {TABLE} SELECT * FROM {legacy_table}")
+        cursor.execute(f"DROP TABLE {legacy_table}")
+
+        cursor.execute(f"CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id")
+        cursor.execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+        cursor.execute(f"SELECT setval('{TABLE}_id_seq', COALESCE(max(id), 0) + 1, false) FROM {TABLE}")
+
+        for field in (Message._meta.get_field("sender"), Message._meta.get_field("child")):
+            target = field.related_model._meta
+            cursor.execute(
+                f"""
+                ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_{field.column}_fk
+                FOREIGN KEY ({field.column}) REFERENCES {target.db_table} ({target.pk.column})
+                DEFERRABLE INITIALLY DEFERRED
+                """
+            )
+        for index in Message._meta.indexes:
+            schema_editor.add_index(Message, index)
+        install_search_index(schema_editor, TABLE, backfill=False)
+    return partitions
+
+
+def detach_partitions(before: date, archive_schema: str = None, drop: bool = False) -> list:
+    """
+    Detach partitions holding messages older than `before` month,
+    optionally moving them to archive schema or dropping them
+    """
+    detached = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if archive_schema:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {archive_schema}")
+        for name in list_partitions():
+            month = partition_month(name)
+            if month is None or month >= month_start(before):
+                continue
+            cursor.execute(f"ALTER TABLE {TABLE} DETACH PARTITION {name}")
+            if drop:
+                cursor.execute(f"DROP TABLE {name}")
+            elif archive_schema:
+                cursor.execute(f"ALTER TABLE {name} SET SCHEMA {archive_schema}")
+            detached.append(name)
+    return detached
@@ -17,4 +17,5 @@ class MessagePermission(permissions.BasePermission):
             return obj.child.parents.filter(user__id=request.user.id).exists()
         
         elif request.user.user_type == UserTypeEnum.teacher:
-            return obj.child.group.assigned_teachers.filter(teacher__user__id=request.user.id).exists()
\ No newline at end of file
+            return obj.child.group.assigned_teachers.filter(teacher__user__id=request.user.id).exists()
+
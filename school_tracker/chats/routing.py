@@ -0,0 +1,8 @@
+from django.urls import path
+
+from school_tracker.chats.consumers import ChatConsumer
+
+
+websocket_urlpatterns = [
+    path("ws/chat/", ChatConsumer.as_asgi()),
+]
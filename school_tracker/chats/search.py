@@ -0,0 +1,40 @@
+"""
+Full-text search over chat history.
+
+On PostgreSQL Message.search_vector is kept up to date by a trigger and
+indexed with GIN, other databases fall back to a plain text match.
+"""
+
+SEARCH_CONFIG = "pg_catalog.simple"
+SEARCH_TRIGGER_NAME = "chats_message_search_vector_update"
+SEARCH_INDEX_NAME = "chats_msg_search_gin_idx"
+
+
+def install_search_index(schema_editor, table="chats_message", backfill=True):
+    """
+    Create trigger maintaining search_vector column and its GIN index (PostgreSQL only)
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(
+        f"""
+        CREATE TRIGGER {SEARCH_TRIGGER_NAME}
+        BEFORE INSERT OR UPDATE OF message_text ON {table}
+        FOR EACH ROW EXECUTE FUNCTION
+        tsvector_update_trigger(search_vector, '{SEARCH_CONFIG}', message_text)
+        """
+    )
+    if backfill:
+        schema_editor.execute(
+            f"UPDATE {table} SET search_vector = to_tsvector('{SEARCH_CONFIG}', message_text)"
+        )
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {SEARCH_INDEX_NAME} ON {table} USING gin (search_vector)"
+    )
+
+
+def remove_search_index(schema_editor, table="chats_message"):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute(f"DROP INDEX IF EXISTS {SEARCH_INDEX_NAME}")
+    schema_editor.execute(f"DROP TRIGGER IF EXISTS {SEARCH_TRIGGER_NAME} ON {table}")
@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
-from school_tracker.chats.models import Message
+from school_tracker.chats.models import Message, ReadCursor
 from school_tracker.members.models import Child, Group
 from school_tracker.utils.serializers import ReadOnlyModelSerializer
 
@@ -14,6 +14,7 @@ class MessageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Message
         fields = (
+            "id",
             "sender",
             "child",
             "timestamp",
@@ -21,6 +22,59 @@ class MessageSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     
+class ReadCursorSerializer(ReadOnlyModelSerializer):
+
+    class Meta:
+        model = ReadCursor
+        fields = (
+            "child",
+            "unread_count",
+            "last_read_message_id",
+            "last_read_at",
+        )
+        read_only_fields = fields
+
+
+class ReadCursorUpdateSerializer(serializers.Serializer):
+    message = serializers.IntegerField(min_value=1, required=False)
+
+
+class MessageInboxSerializer(ReadOnlyModelSerializer):
+    sender_name = serializers.CharField(source="sender.full_name")
+    child_name = serializers.CharField(source="child.full_name")
+
+    class Meta:
+        model = Message
+        fields = (
+            "id",
+            "child",
+            "child_name",
+            "sender",
+            "sender_name",
+            "message_text",
+            "timestamp",
+        )
+        read_only_fields = fields
+
+
+class MessageExportSerializer(serializers.Serializer):
+    output = serializers.ChoiceField(choices=["ndjson", "csv"], default="ndjson")
+    child = serializers.IntegerField(min_value=1, required=False)
+    sender = serializers.IntegerField(min_value=1, required=False)
+    since = serializers.DateField(required=False)
+    until = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if "since" in attrs and "until" in attrs and attrs["since"] > attrs["until"]:
+            raise serializers.ValidationError({"until": "Date range end must not precede its start."})
+        return attrs
+
+
+class MessageBroadcastSerializer(serializers.Serializer):
+    group = serializers.PrimaryKeyRelatedField(queryset=Group.objects.all())
+    message_text = serializers.CharField(max_length=1000)
+
+
 class MessageCreateSerializer(MessageSerializer):
     message_text = serializers.CharField(max_length=1000)
 
@@ -1,18 +1,42 @@
+from datetime import timedelta
 
+from django.db import transaction
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags, quote_etag
 from rest_framework import (
     mixins, 
+    status,
     viewsets
 )
 from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 
 from drf_spectacular.utils import extend_schema
 
-from school_tracker.chats.models import Message
+from school_tracker.accounts.models import CustomUser
+from school_tracker.chats.export import stream_csv, stream_ndjson
+from school_tracker.chats.models import Message, ReadCursor
+from school_tracker.chats.notifications import broadcast_message
+from school_tracker.chats.pagination import MessageCursorPagination, MessageSearchPagination
 from school_tracker.chats.serializers import (
+    MessageBroadcastSerializer,
     MessageCreateSerializer,
-    MessageSerializer
+    MessageExportSerializer,
+    MessageInboxSerializer,
+    MessageSerializer,
+    ReadCursorSerializer,
+    ReadCursorUpdateSerializer
 )
+from school_tracker.members.models import AssignedTeacher, Child
+from school_tracker.members.permissions import (
+    GroupTeacherPermission,
+    InstitutionManagerPermission,
+    TeacherOrParentRelatedToChildPermission
+)
+from school_tracker.utils.datetools import get_day_start
 from school_tracker.utils.enums import UserTypeEnum
 from school_tracker.chats.permissions import MessagePermission
 
@@ -25,23 +49,50 @@ class MessageViewSet(mixins.CreateModelMixin,
     
     permission_classes = [MessagePermission]
     serializer_class = MessageSerializer
+    pagination_class = MessageCursorPagination
     lookup_field = "child_id"
 
     '''
     GET -> To retrieve a particular message from a chat (message/child_id/message_pk)
-    GET -> To see list of messages about a child (message/child_id)
+    LIST -> To see messages related to user, newest first, paginated by cursor
+            (?child=<id>, ?before=<cursor>, ?after=<cursor>, ?around=<message_id>)
     POST -> To create new message (message/child_id/)
     DELETE -> To delete a particular message from a chat (message/child_id/message_pk/)
+
+    Custom method:
+    SYNC -> messages about a child created after ?since=<cursor>, served with ETag
+    READ -> move user's read cursor in child's chat (message/child_id/read/)
+    UNREAD -> unread messages counters for all chats of user (message/unread/)
+    BROADCAST -> send the same message to every family in a group (message/broadcast/)
+    SEARCH -> full-text search over messages visible to user (message/search/?q=<text>)
+    INBOX -> the newest message of every chat visible to user (message/inbox/)
+    EXPORT -> streamed chat history for institution managers (message/export/?output=ndjson|csv)
     '''
 
     serializer_map = {
         "create": MessageCreateSerializer,
+        "sync": MessageCreateSerializer,
+        "mark_read": ReadCursorUpdateSerializer,
+        "unread": ReadCursorSerializer,
+        "broadcast": MessageBroadcastSerializer,
+        "search": MessageCreateSerializer,
+        "inbox": MessageInboxSerializer,
+        "export": MessageExportSerializer,
     }
 
     permission_map = {
         "create": [IsAuthenticated],    
+        "sync": [TeacherOrParentRelatedToChildPermission],
+        "mark_read": [TeacherOrParentRelatedToChildPermission],
+        "unread": [IsAuthenticated],
+        "broadcast": [GroupTeacherPermission],
+        "search": [IsAuthenticated],
+        "inbox": [IsAuthenticated],
+        "export": [InstitutionManagerPermission],
     }
 
+    sync_page_size = 200
+
     def get_permissions(self):
         permission_classes = self.permission_map.get(self.action, self.permission_classes)
         return [permission() for permission in permission_classes]
@@ -52,12 +103,19 @@ class MessageViewSet(mixins.CreateModelMixin,
     def get_queryset(self):
         user = self.request.user
         if user.user_type == UserTypeEnum.parent:
-            return Message.objects.filter(child__parents__user=user)
+            queryset = Message.objects.filter(child__parents__user=user)
         elif user.user_type == UserTypeEnum.teacher:
-            Message.objects.filter(child__group__assigned_teachers__teacher__user=user)
+            # Subquery rather than join, teacher might be assigned to a group more than once
+            queryset = Message.objects.filter(
+                child__group__in=AssignedTeacher.objects.filter(teacher__user=user).values("group")
+            )
         else:
-            Message.objects.filter(sender=user)
-            
+            queryset = Message.objects.filter(sender=user)
+
+        if self.action in ("list", "search") and (child_id := self.request.query_params.get("child")):
+            queryset = queryset.filter(child=child_id)
+        return queryset
+
         # if child_id := self.kwargs.get("child_id"):
         #     return Message.objects.filter(child=child_id).select_related("sender", "child")
         # else:
@@ -69,5 +127,142 @@ class MessageViewSet(mixins.CreateModelMixin,
         return context
 
     def perform_create(self, serializer):
-        serializer.save(sender=self.request.user)
-        
\ No newline at end of file
+        with transaction.atomic():
+            message = serializer.save(sender=self.request.user)
+            audience = list(CustomUser.objects.fetch_child_audience(message.child_id))
+            ReadCursor.objects.register_message(message, audience)
+            transaction.on_commit(lambda: broadcast_message(message, audience))
+
+    @extend_schema(description="Method GET to fetch messages about child newer than `since` cursor. "
+                               "Answers 304 when `If-None-Match` matches child's newest message, "
+                               "ETag is sent only with the page reaching it.")
+    @action(methods=["get"], detail=True, url_path="sync")
+    def sync(self, request, *args, **kwargs):
+        child = self._get_child()
+
+        latest = Message.objects.fetch_latest_for_child(child.id)
+        etag = self._get_chat_etag(child.id, latest)
+        if etag in parse_etags(request.headers.get("If-None-Match", "")):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+        position = (None, None)
+        if since := request.query_params.get("since"):
+            position = self.paginator.decode_position(since)
+
+        messages = list(Message.objects.fetch_since(child.id, *position)[:self.sync_page_size + 1])
+        has_more = len(messages) > self.sync_page_size
+        messages = messages[:self.sync_page_size]
+
+        cursor = self.paginator.encode_position(messages[-1]) if messages else since
+        serializer = self.get_serializer(messages, many=True)
+        # Truncated page does not reach the newest message, its ETag would hide the remaining pages
+        return Response(
+            {"cursor": cursor, "has_more": has_more, "results": serializer.data},
+            headers={} if has_more else {"ETag": etag},
+        )
+
+    @extend_schema(description="Method POST to mark child's chat as read up to `message` (the newest by default)")
+    @action(methods=["post"], detail=True, url_path="read")
+    def mark_read(self, request, *args, **kwargs):
+        child = self._get_child()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            cursor = ReadCursor.objects.advance(
+                request.user.id, child.id, serializer.validated_data.get("message")
+            )
+        except Message.DoesNotExist:
+            raise NotFound("Message not found.")
+        return Response(ReadCursorSerializer(cursor).data)
+
+    @extend_schema(description="Method GET to list unread messages counters for every chat of user")
+    @action(methods=["get"], detail=False, url_path="unread")
+    def unread(self, request, *args, **kwargs):
+        return Response(list(ReadCursor.objects.fetch_badges(request.user.id)))
+
+    @extend_schema(description="Method POST to send the same message about every child of a group")
+    @action(methods=["post"], detail=False, url_path="broadcast")
+    def broadcast(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        group = serializer.validated_data["group"]
+        self.check_object_permissions(request, group)
+
+        with transaction.atomic():
+            messages = Message.objects.create_for_group(
+                request.user, group.id, serializer.validated_data["message_text"]
+            )
+            child_ids = [message.child_id for message in messages]
+            audience = CustomUser.objects.fetch_group_audience(group.id, child_ids)
+            ReadCursor.objects.register_group_messages(messages, audience)
+            transaction.on_commit(lambda: self._broadcast_group_messages(messages, audience))
+
+        return Response(
+            {"group": group.id, "messages_created": len(messages), "children": child_ids},
+            status=status.HTTP_201_CREATED,
+        )
+
+    @extend_schema(description="Method GET to search messages visible to user, best matches first "
+                               "(?q=<text>, optionally ?child=<id>)")
+    @action(methods=["get"], detail=False, url_path="search")
+    def search(self, request, *args, **kwargs):
+        text = request.query_params.get("q", "").strip()
+        if not text:
+            raise ValidationError({"q": "Search text is required."})
+
+        paginator = MessageSearchPagination()
+        page = paginator.paginate_queryset(self.get_queryset().search(text), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @extend_schema(description="Method GET to list the newest message of every chat visible to user, "
+                               "most recent chats first")
+    @action(methods=["get"], detail=False, url_path="inbox")
+    def inbox(self, request, *args, **kwargs):
+        messages = self.get_queryset().latest_per_child().select_related("sender", "child")
+        messages = sorted(messages, key=lambda message: (message.timestamp, message.id), reverse=True)
+        serializer = self.get_serializer(messages, many=True)
+        return Response(serializer.data)
+
+    @extend_schema(description="Method GET to stream chat history as NDJSON or CSV "
+                               "(?output=ndjson|csv, optionally ?child=<id>, ?sender=<id>, "
+                               "?since=<YYYY-MM-DD>, ?until=<YYYY-MM-DD>)")
+    @action(methods=["get"], detail=False, url_path="export")
+    def export(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.query_params)
+        serializer.is_valid(raise_exception=True)
+        params = serializer.validated_data
+
+        since = get_day_start(params["since"]) if "since" in params else None
+        until = get_day_start(params["until"] + timedelta(days=1)) if "until" in params else None
+        messages = Message.objects.fetch_filtered(
+            child_id=params.get("child"), sender_id=params.get("sender"), since=since, until=until
+        )
+
+        if params["output"] == "csv":
+            response = StreamingHttpResponse(stream_csv(messages), content_type="text/csv")
+        else:
+            response = StreamingHttpResponse(stream_ndjson(messages), content_type="application/x-ndjson")
+        response["Content-Disposition"] = f'attachment; filename="messages.{params["output"]}"'
+        return response
+
+    @staticmethod
+    def _broadcast_group_messages(messages, audience):
+        audience_by_child = {}
+        for user_id, child_id in audience:
+            audience_by_child.setdefault(child_id, []).append(user_id)
+        for message in messages:
+            broadcast_message(message, audience_by_child.get(message.child_id, []))
+
+    def _get_child(self):
+        child = get_object_or_404(Child, id=self.kwargs.get("child_id"))
+        self.check_object_permissions(self.request, child)
+        return child
+
+    @staticmethod
+    def _get_chat_etag(child_id, latest):
+        if latest is None:
+            return quote_etag(f"{child_id}-0")
+        message_id, timestamp = latest
+        return quote_etag(f"{child_id}-{message_id}-{int(timestamp.timestamp() * 1_000_000)}")
+
@@ -2,7 +2,7 @@ from typing import Any, Optional
 from django.contrib import admin
 from django.contrib.auth import get_user_model
 
-from .models import Child, Parent, Teacher, Group
+from .models import Child, Parent, ParentInvitation, Teacher, Group
 
 
 CustomUser = get_user_model()
@@ -16,4 +16,10 @@ admin.site.register(Parent) #add user filtering by user_type in admin panel
 admin.site.register(Group)
 
 
+@admin.register(ParentInvitation)
+class ParentInvitationAdmin(admin.ModelAdmin):
+    list_display = ("parent", "status", "attempts", "next_attempt_at", "sent_at")
+    list_filter = ["status"]
+
+
 
@@ -0,0 +1,80 @@
+"""
+Delivery of parent invitations.
+
+Invitations are queued in ParentInvitation outbox (creating a parent only
+inserts a row) and sent by send_parent_invitations worker in batches over
+a single reused SMTP connection. Failed deliveries are retried with
+exponential backoff. The link carries a password reset token, which stops
+working once the password is set.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.tokens import default_token_generator
+from django.core.mail import EmailMessage, get_connection
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from school_tracker.members.models import ParentInvitation
+
+INVITATION_BATCH_SIZE = getattr(settings, "INVITATION_BATCH_SIZE", 100)
+INVITATION_MAX_ATTEMPTS = getattr(settings, "INVITATION_MAX_ATTEMPTS", 6)
+INVITATION_BACKOFF = timedelta(seconds=getattr(settings, "INVITATION_BACKOFF", 60))
+INVITATION_LEASE = timedelta(minutes=10)
+INVITATION_SUBJECT = "Invitation to School Tracker"
+
+
+def get_password_setup_url(user) -> str:
+    return settings.PASSWORD_SETUP_URL.format(
+        uid=urlsafe_base64_encode(force_bytes(user.pk)),
+        token=default_token_generator.make_token(user),
+    )
+
+
+def build_invitation_message(invitation, connection=None) -> EmailMessage:
+    user = invitation.parent.user
+    body = (
+        f"Hello {user.first_name},\n\n"
+        "you have been invited to School Tracker to follow your child's day at school.\n"
+        f"Set your password to sign in: {get_password_setup_url(user)}\n"
+    )
+    return EmailMessage(INVITATION_SUBJECT, body, to=[user.email], connection=connection)
+
+
+def send_pending_invitations(batch_size: int = INVITATION_BATCH_SIZE, connection=None) -> dict:
+    """
+    Send invitations due for delivery until the outbox is drained
+
+    :param connection: Email backend connection, default one is opened with the first claimed invitation
+                       and reused for all batches.
+    :return: Numbers of sent and failed deliveries.
+    """
+    counters = {"sent": 0, "failed": 0}
+    connection = connection or get_connection()
+    is_open = False
+    try:
+        while invitations := ParentInvitation.objects.claim_due(batch_size, INVITATION_LEASE):
+            sent = []
+            for invitation in invitations:
+                try:
+                    # Opened only once there is something to send, failures to connect are retried with backoff
+                    if not is_open:
+                        connection.open()
+                        is_open = True
+                    connection.send_messages([build_invitation_message(invitation, connection)])
+                except Exception as error:
+                    # Connection might be broken, it is reopened for the next message
+                    connection.close()
+                    is_open = False
+                    ParentInvitation.objects.mark_failed(
+                        invitation, str(error) or error.__class__.__name__, INVITATION_MAX_ATTEMPTS, INVITATION_BACKOFF
+                    )
+                    counters["failed"] += 1
+                else:
+                    sent.append(invitation.id)
+            ParentInvitation.objects.mark_sent(sent)
+            counters["sent"] += len(sent)
+    finally:
+        if is_open:
+            connection.close()
+    return counters
@@ -0,0 +1,43 @@
+import time
+from pathlib import Path
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+
+from school_tracker.members.roster import ROSTER_BATCH_SIZE, ROSTER_COLUMNS, RosterImport
+
+
+class Command(BaseCommand):
+    help = (
+        "Import children with their parents (and missing groups) from CSV file with columns: "
+        f"{', '.join(ROSTER_COLUMNS)}. One row per child's parent, safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", type=Path, help="CSV file to import.")
+        parser.add_argument("--batch-size", type=int, default=ROSTER_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def report_progress(roster_import):
+            self.stdout.write(
+                f"{roster_import.rows} rows processed, {len(roster_import.errors)} rejected "
+                f"({time.perf_counter() - started:.1f}s)"
+            )
+
+        try:
+            with open(options["path"], encoding="utf-8-sig", newline="") as lines:
+                roster_import = RosterImport(options["batch_size"], report_progress).run(lines)
+        except (OSError, UnicodeDecodeError, ValidationError) as error:
+            raise CommandError(error)
+
+        result = roster_import.as_dict()
+        for error in result["errors"]:
+            details = "; ".join(f"{column}: {message}" for column, message in error["errors"].items())
+            self.stderr.write(f"Line {error['line']}: {details}")
+        created = ", ".join(f"{count} {name}" for name, count in result["created"].items())
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['rows'] - len(result['errors'])} of {result['rows']} rows in "
+            f"{time.perf_counter() - started:.2f}s, created {created}"
+        ))
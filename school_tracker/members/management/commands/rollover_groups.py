@@ -0,0 +1,48 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from school_tracker.members.models import Group
+
+
+def parse_move(value: str) -> tuple:
+    try:
+        old, new = value.split(":")
+        return int(old), int(new)
+    except ValueError:
+        raise ValueError(f"Expected OLD_GROUP_ID:NEW_GROUP_ID, got {value!r}.")
+
+
+class Command(BaseCommand):
+    help = (
+        "Move children (and teacher assignments) between groups at the end of school year "
+        "in one transaction, e.g. --move 1:2 --move 2:3. Use --dry-run to only print the changes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--move", type=parse_move, action="append", required=True, metavar="OLD:NEW")
+        parser.add_argument("--keep-teachers", action="store_true", help="Teachers stay in their groups.")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        mapping = dict(options["move"])
+        if len(mapping) != len(options["move"]):
+            raise CommandError("Every group can be moved only once.")
+
+        started = time.perf_counter()
+        try:
+            moves = Group.objects.rollover(mapping, not options["keep_teachers"], options["dry_run"])
+        except Group.DoesNotExist as error:
+            raise CommandError(error)
+
+        for move in moves:
+            self.stdout.write(
+                f"Group {move['group']} -> {move['to']}: {move['children']} children, {move['teachers']} teachers, "
+                f"{move['duplicate_teachers']} duplicate teacher assignments dropped"
+            )
+        action = "Would move" if options["dry_run"] else "Moved"
+        self.stdout.write(self.style.SUCCESS(
+            f"{action} {sum(move['children'] for move in moves)} children and "
+            f"{sum(move['teachers'] for move in moves)} teacher assignments "
+            f"in {time.perf_counter() - started:.2f}s"
+        ))
@@ -0,0 +1,37 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from school_tracker.members.invitations import INVITATION_BATCH_SIZE, send_pending_invitations
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued parent invitations in batches over a single email connection, failed ones are retried "
+        "with exponential backoff. Drains the outbox and exits unless --interval is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=INVITATION_BATCH_SIZE)
+        parser.add_argument("--interval", type=int, default=0, help="Keep polling the outbox every N seconds.")
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.perf_counter()
+            try:
+                counters = send_pending_invitations(options["batch_size"])
+            except Exception as error:
+                # Claimed invitations are picked up again once their lease expires
+                if not options["interval"]:
+                    raise
+                self.stderr.write(f"Sending invitations failed: {error}")
+                time.sleep(options["interval"])
+                continue
+            if counters["sent"] or counters["failed"] or not options["interval"]:
+                self.stdout.write(
+                    f"Sent {counters['sent']} invitations, {counters['failed']} failed "
+                    f"in {time.perf_counter() - started:.2f}s"
+                )
+            if not options["interval"]:
+                return
+            time.sleep(options["interval"])
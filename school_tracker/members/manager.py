@@ -1,18 +1,80 @@
-from django.db.models import Manager
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Case, Count, IntegerField, Manager, Prefetch, Value, When
+from django.utils import timezone
 
 from school_tracker.accounts.models import CustomUser
-from school_tracker.utils.enums import UserTypeEnum
+from school_tracker.utils.enums import InvitationStatusEnum, UserTypeEnum
 
 
 class ParentManager(Manager):
     def create_with_invitation(self, parent):
         """
-        Method for sending email invitation to app with link to set password
+        Queue email invitation to app with link to set password,
+        it is sent by send_parent_invitations worker
+        """
+        from school_tracker.members.models import ParentInvitation
+
+        return ParentInvitation.objects.create(parent=parent)
+
+
+class ParentInvitationManager(Manager):
+    def enqueue(self, parent_ids):
+        """
+        Queue invitations of many parents with a single insert
+        """
+        return self.bulk_create([self.model(parent_id=parent_id) for parent_id in parent_ids])
+
+    def claim_due(self, limit: int, lease: timedelta):
+        """
+        Lock pending invitations due for delivery and postpone them by `lease`,
+        so concurrent workers (and a crashed one) do not send them twice right away
+
+        :return: Claimed invitations with parent's user selected.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            due = self.filter(status=InvitationStatusEnum.pending, next_attempt_at__lte=now).order_by(
+                "next_attempt_at", "id"
+            )
+            if connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            ids = list(due.values_list("id", flat=True)[:limit])
+            self.filter(id__in=ids).update(next_attempt_at=now + lease)
+        return list(self.filter(id__in=ids).select_related("parent__user").order_by("id"))
+
+    def mark_sent(self, ids):
+        return self.filter(id__in=ids).update(
+            status=InvitationStatusEnum.sent, sent_at=timezone.now(), last_error=""
+        )
+
+    def mark_failed(self, invitation, error: str, max_attempts: int, backoff: timedelta):
         """
-        pass
+        Schedule another attempt with exponential backoff, give up after `max_attempts`
+        """
+        attempts = invitation.attempts + 1
+        invitation.attempts = attempts
+        invitation.last_error = error
+        if attempts >= max_attempts:
+            invitation.status = InvitationStatusEnum.failed
+        else:
+            invitation.next_attempt_at = timezone.now() + backoff * 2 ** (attempts - 1)
+        invitation.save(update_fields=["attempts", "last_error", "status", "next_attempt_at"])
+        return invitation
 
 
 class ChildManager(Manager):
+    def fetch_related_to_user(self, user):
+        """
+        Own children of parent, children of groups assigned to teacher
+        """
+        if user.user_type == UserTypeEnum.parent:
+            return self.filter(parents__user=user)
+        if user.user_type == UserTypeEnum.teacher:
+            return self.filter(group__assigned_teachers__teacher__user=user).distinct()
+        return self.none()
+
     def create_with_parent(self, parent_data, child_data):
         from school_tracker.members.models import Group, Parent
 
@@ -28,8 +90,8 @@ class ChildManager(Manager):
             user_type=UserTypeEnum.parent,
         )
         parent = Parent.objects.create(user=member)
-        # Send invitation for Parent user to app
-        Parent.objects.create_with_send_invitation(parent)
+        # Invitation for Parent user to app is sent in background
+        Parent.objects.create_with_invitation(parent)
 
         child, created = self.get_or_create(
             first_name=child_data["first_name"],
@@ -67,6 +129,124 @@ class AssignedTeacherManager(Manager):
         return assigned_teacher
     
 class GroupManager(Manager):
+    def fetch_ids_related_to_user(self, user):
+        """
+        Ids of groups of parent's children or teacher's assignments,
+        None for users related to the whole institution
+        """
+        if user.is_superuser or user.user_type in [UserTypeEnum.manager, UserTypeEnum.admin]:
+            return None
+        if user.user_type == UserTypeEnum.parent:
+            groups = self.filter(group_students__parents__user=user)
+        elif user.user_type == UserTypeEnum.teacher:
+            groups = self.filter(assigned_teachers__teacher__user=user)
+        else:
+            groups = self.none()
+        return list(groups.values_list("id", flat=True).distinct())
+
+    def rollover(self, mapping: dict, move_teachers: bool = True, dry_run: bool = False) -> list:
+        """
+        Move children (and teacher assignments) between groups at the end of school year,
+        with a single UPDATE per table in one transaction
+
+        :param mapping: Old group id -> new group id. Chains and swaps (A -> B, B -> A) are applied at once.
+        :param move_teachers: Teachers follow their children to the new group, assignments which would
+                              duplicate teacher's assignment to the new group are deleted.
+        :param dry_run: Only count what would be moved.
+        :raises Group.DoesNotExist: When mapping refers to unknown groups.
+        :return: Old group, new group, numbers of moved children, moved and deleted duplicate teacher assignments.
+        """
+        from school_tracker.members.models import AssignedTeacher, Child
+
+        mapping = {old: new for old, new in mapping.items() if old != new}
+        groups = set(mapping) | set(mapping.values())
+        unknown = groups - set(self.filter(id__in=groups).values_list("id", flat=True))
+        if unknown:
+            raise self.model.DoesNotExist(f"Groups not found: {', '.join(map(str, sorted(unknown)))}.")
+
+        diff = {
+            old: {"group": old, "to": new, "children": 0, "teachers": 0, "duplicate_teachers": 0}
+            for old, new in sorted(mapping.items())
+        }
+        new_group = Case(
+            *[When(group=old, then=Value(new)) for old, new in mapping.items()], output_field=IntegerField()
+        )
+        with transaction.atomic():
+            children = Child.objects.filter(group__in=mapping)
+            for group_id, total in children.values_list("group").annotate(total=Count("id")).order_by():
+                diff[group_id]["children"] = total
+            if not dry_run:
+                children.update(group=new_group)
+
+            if move_teachers:
+                duplicates = []
+                for assignment_id, group_id, is_duplicate in self._get_rollover_assignments(mapping, groups):
+                    diff[group_id]["duplicate_teachers" if is_duplicate else "teachers"] += 1
+                    if is_duplicate:
+                        duplicates.append(assignment_id)
+                if not dry_run:
+                    if duplicates:
+                        AssignedTeacher.objects.filter(id__in=duplicates).delete()
+                    AssignedTeacher.objects.filter(group__in=mapping).update(group=new_group)
+        return list(diff.values())
+
+    @staticmethod
+    def _get_rollover_assignments(mapping: dict, groups: set):
+        """
+        Yield (id, group, is_duplicate) of assignments to moved groups. Duplicate would give a teacher
+        a second assignment to the same group, the one staying in the group (or the oldest moved one) is kept
+        """
+        from school_tracker.members.models import AssignedTeacher
+
+        assignments = AssignedTeacher.objects.filter(group__in=groups).select_for_update().values_list(
+            "id", "teacher_id", "group_id"
+        )
+        kept = set()
+        for assignment_id, teacher_id, group_id in sorted(assignments, key=lambda row: (row[2] in mapping, row[0])):
+            key = (teacher_id, mapping.get(group_id, group_id))
+            if group_id in mapping:
+                yield assignment_id, group_id, key in kept
+            kept.add(key)
+
+    def fetch_roster(self):
+        """
+        Groups annotated with roster size, with children and teachers (with users) prefetched
+        """
+        from school_tracker.members.models import AssignedTeacher, Child
+
+        return self.annotate(roster_size=Count("group_students")).order_by("group_name", "id").prefetch_related(
+            Prefetch(
+                "group_students",
+                queryset=Child.objects.only("id", "group_id", "first_name", "last_name").order_by(
+                    "last_name", "first_name", "id"
+                ),
+            ),
+            Prefetch(
+                "assigned_teachers",
+                queryset=AssignedTeacher.objects.select_related("teacher__user").order_by("assigned_at", "id"),
+            ),
+        )
+
+    def fetch_directory(self):
+        """
+        Groups with their teachers, children and children's parents prefetched,
+        so any number of groups costs the same number of queries
+        """
+        from school_tracker.members.models import AssignedTeacher, Child, Parent
+
+        return self.order_by("group_name", "id").prefetch_related(
+            Prefetch(
+                "assigned_teachers",
+                queryset=AssignedTeacher.objects.select_related("teacher__user").order_by("assigned_at", "id"),
+            ),
+            Prefetch(
+                "group_students",
+                queryset=Child.objects.order_by("last_name", "first_name", "id").prefetch_related(
+                    Prefetch("parents", queryset=Parent.objects.select_related("user").order_by("id"))
+                ),
+            ),
+        )
+
     def with_related_teachers(self, group_id):
         return self.get_queryset().filter(id=group_id).prefetch_related(
             "assigned_teachers__user"
@@ -7,10 +7,12 @@ from school_tracker.members.manager import (
     AssignedTeacherManager,
     ChildManager,
     GroupManager,
+    ParentInvitationManager,
     ParentManager,
 )
 from school_tracker.utils.enums import (
     AssignedTeacherTypeEnum,
+    InvitationStatusEnum,
     UserTypeEnum
 )
 
@@ -42,6 +44,35 @@ class Parent(models.Model):
         super().save(*args, **kwargs)
 
 
+class ParentInvitation(models.Model):
+    """
+    Outbox of invitation emails with link to set password, drained by send_parent_invitations
+    """
+    parent = models.ForeignKey(Parent, on_delete=models.CASCADE, related_name="invitations")
+    status = models.CharField(
+        max_length=20, choices=InvitationStatusEnum.choices, default=InvitationStatusEnum.pending
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ParentInvitationManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(status=InvitationStatusEnum.pending),
+                name="pending_invitation_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Invitation of {self.parent_id} ({self.status})"
+
+
 class Group(models.Model):
     group_name = models.CharField(max_length=50)
 
@@ -0,0 +1,10 @@
+from rest_framework.pagination import PageNumberPagination
+
+
+class MemberDirectoryPagination(PageNumberPagination):
+    """
+    Directory is paginated by group, every page holds whole groups with all their members
+    """
+    page_size = 10
+    max_page_size = 50
+    page_size_query_param = "page_size"
@@ -41,6 +41,32 @@ class TeacherOrIsStaffPermission(permissions.BasePermission):
             return True
 
 
+class InstitutionManagerPermission(permissions.BasePermission):
+    message = "Only institution managers can access this content."
+
+    def has_permission(self, request, view=None):
+        if not request.user.is_authenticated:
+            return False
+
+        return request.user.is_superuser or request.user.user_type in [
+            UserTypeEnum.manager, UserTypeEnum.admin
+        ]
+
+
+class GroupTeacherPermission(permissions.BasePermission):
+    message = "Only teachers assigned to group can perform this action."
+
+    def has_permission(self, request, view):
+        if not request.user.is_authenticated:
+            return False
+        return request.user.is_superuser or request.user.user_type == UserTypeEnum.teacher
+
+    def has_object_permission(self, request, view, obj):
+        if request.user.is_superuser:
+            return True
+        return obj.assigned_teachers.filter(teacher__user__id=request.user.id).exists()
+
+
 class TeacherOrParentRelatedToChildPermission(permissions.BasePermission):
     message = "Only parents or teachers related to child can see this content."
 
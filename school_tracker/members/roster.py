@@ -0,0 +1,203 @@
+"""
+Bulk import of children and parents from CSV.
+
+Every row links a child with one parent:
+
+    first_name,last_name,birth_date,group,parent_email,parent_first_name,parent_last_name
+
+Child with two parents comes in two rows, siblings share parent's email.
+Rows are validated and written in batches: missing groups, parent users,
+parents, children and child-parent links are created with one bulk insert
+each per batch, in a transaction of its own. Parents are matched by email
+and children by (first name, last name, birth date, group), so re-running
+an import does not create duplicates. New parents get invitations queued.
+"""
+import csv
+from datetime import date
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.db.models.functions import Lower
+
+from school_tracker.accounts.models import CustomUser
+from school_tracker.members.models import Child, Group, Parent, ParentInvitation
+from school_tracker.utils.enums import UserTypeEnum
+
+ROSTER_COLUMNS = (
+    "first_name", "last_name", "birth_date", "group", "parent_email", "parent_first_name", "parent_last_name"
+)
+ROSTER_BATCH_SIZE = 500
+NAME_MAX_LENGTH = 50
+
+
+class RosterImport:
+    """
+    Import of a single CSV file, counters and row errors are kept on the instance
+
+    :param batch_size: Number of rows validated and written in one transaction.
+    :param progress: Optional callable receiving the import after every batch.
+    """
+
+    def __init__(self, batch_size: int = ROSTER_BATCH_SIZE, progress=None):
+        self.batch_size = batch_size
+        self.progress = progress
+        self.rows = 0
+        self.created = {"groups": 0, "parents": 0, "children": 0, "links": 0}
+        self.errors = []
+        self._group_ids = {}
+        self._parent_ids = {}
+        self._child_ids = {}
+
+    def run(self, lines):
+        """
+        Import rows of CSV text lines (header first)
+
+        :raises ValidationError: When required columns are missing.
+        """
+        reader = csv.DictReader(lines)
+        missing = set(ROSTER_COLUMNS) - set(reader.fieldnames or [])
+        if missing:
+            raise ValidationError(f"Missing columns: {', '.join(sorted(missing))}.")
+
+        numbered_rows = ((reader.line_num, row) for row in reader)
+        while batch := list(islice(numbered_rows, self.batch_size)):
+            self.rows += len(batch)
+            rows = []
+            for line, row in batch:
+                values, errors = self.validate_row(row)
+                if errors:
+                    self.errors.append({"line": line, "errors": errors})
+                else:
+                    rows.append((line, values))
+            with transaction.atomic():
+                self.write_batch(rows)
+            if self.progress:
+                self.progress(self)
+        return self
+
+    @staticmethod
+    def validate_row(row: dict) -> tuple:
+        """
+        Return cleaned values of row and dict of errors by column
+        """
+        errors = {}
+        values = {column: (row.get(column) or "").strip() for column in ROSTER_COLUMNS}
+        for column in ("first_name", "last_name", "group", "parent_first_name", "parent_last_name"):
+            if not values[column]:
+                errors[column] = "This field is required."
+            elif len(values[column]) > NAME_MAX_LENGTH:
+                errors[column] = f"Ensure this field has no more than {NAME_MAX_LENGTH} characters."
+        try:
+            values["birth_date"] = date.fromisoformat(values["birth_date"])
+        except ValueError:
+            errors["birth_date"] = "Enter a date in YYYY-MM-DD format."
+        try:
+            validate_email(values["parent_email"])
+        except ValidationError:
+            errors["parent_email"] = "Enter a valid email address."
+        values["parent_email"] = CustomUser.objects.normalize_email(values["parent_email"]).lower()
+        return values, errors
+
+    def write_batch(self, rows):
+        """
+        Create groups, parents, children and links of validated rows with bulk inserts
+        """
+        self._load_groups({values["group"] for _, values in rows})
+        rows = self._load_parents(rows)
+        self._load_children(rows)
+
+        links = {
+            (self._child_ids[self._get_child_key(values)], self._parent_ids[values["parent_email"]])
+            for _, values in rows
+        }
+        through = Child.parents.through
+        links -= set(through.objects.filter(
+            child__in={child_id for child_id, _ in links}, parent__in={parent_id for _, parent_id in links}
+        ).values_list("child_id", "parent_id"))
+        through.objects.bulk_create(
+            [through(child_id=child_id, parent_id=parent_id) for child_id, parent_id in links],
+            ignore_conflicts=True,
+        )
+        self.created["links"] += len(links)
+
+    def as_dict(self) -> dict:
+        return {"rows": self.rows, "created": self.created, "errors": sorted(self.errors, key=lambda error: error["line"])}
+
+    def _load_groups(self, names):
+        names = names - self._group_ids.keys()
+        if not names:
+            return
+        self._group_ids.update(Group.objects.filter(group_name__in=names).values_list("group_name", "id"))
+        missing = [Group(group_name=name) for name in sorted(names - self._group_ids.keys())]
+        for group in Group.objects.bulk_create(missing):
+            self._group_ids[group.group_name] = group.id
+        self.created["groups"] += len(missing)
+
+    def _load_parents(self, rows) -> list:
+        """
+        Resolve parents by email, create missing ones (first row of a new email wins).
+        Return rows which can be imported, emails of other kind of users are rejected
+        """
+        new_parents = {}
+        for _, values in rows:
+            if values["parent_email"] not in self._parent_ids:
+                new_parents.setdefault(values["parent_email"], values)
+
+        users = CustomUser.objects.annotate(email_lower=Lower("email")).filter(
+            email_lower__in=new_parents
+        ).values_list("email_lower", "parent__id")
+        rejected = set()
+        for email, parent_id in users:
+            if parent_id is None:
+                rejected.add(email)
+            else:
+                self._parent_ids[email] = parent_id
+            new_parents.pop(email, None)
+
+        created_users = CustomUser.objects.bulk_create([
+            CustomUser(
+                email=email,
+                first_name=values["parent_first_name"],
+                last_name=values["parent_last_name"],
+                user_type=UserTypeEnum.parent,
+                password=make_password(None),
+            ) for email, values in new_parents.items()
+        ])
+        created_parents = Parent.objects.bulk_create([Parent(user_id=user.id) for user in created_users])
+        for user, parent in zip(created_users, created_parents):
+            self._parent_ids[user.email] = parent.id
+        ParentInvitation.objects.enqueue(parent.id for parent in created_parents)
+        self.created["parents"] += len(created_parents)
+
+        accepted = []
+        for line, values in rows:
+            if values["parent_email"] in rejected:
+                self.errors.append({"line": line, "errors": {"parent_email": "Email belongs to a non-parent user."}})
+            else:
+                accepted.append((line, values))
+        return accepted
+
+    def _load_children(self, rows):
+        keys = {self._get_child_key(values) for _, values in rows} - self._child_ids.keys()
+        if not keys:
+            return
+        existing = Child.objects.filter(
+            group__in={key[3] for key in keys}, birth_date__in={key[2] for key in keys}
+        ).values_list("first_name", "last_name", "birth_date", "group_id", "id")
+        for *key, child_id in existing:
+            if tuple(key) in keys:
+                self._child_ids[tuple(key)] = child_id
+
+        created = Child.objects.bulk_create([
+            Child(first_name=first_name, last_name=last_name, birth_date=birth_date, group_id=group_id)
+            for first_name, last_name, birth_date, group_id in sorted(keys - self._child_ids.keys())
+        ])
+        for child in created:
+            self._child_ids[(child.first_name, child.last_name, child.birth_date, child.group_id)] = child.id
+        self.created["children"] += len(created)
+
+    def _get_child_key(self, values) -> tuple:
+        return values["first_name"], values["last_name"], values["birth_date"], self._group_ids[values["group"]]
@@ -9,7 +9,7 @@ from school_tracker.members.models import (
     Parent,
     Teacher
 )
-from school_tracker.utils.enums import AssignedTeacherTypeEnum
+from school_tracker.utils.enums import AssignedTeacherTypeEnum, UserTypeEnum
 from school_tracker.utils.serializers import ReadOnlyModelSerializer
 
 
@@ -79,7 +79,7 @@ class AssignedTeacherSerializer(serializers.ModelSerializer):
         read_only_fields = fields
 
     def get_group(self, obj):
-        return [group.group_name for group in Group.objects.filter(assigned_teachers=obj)]
+        return [obj.group.group_name]
     
     def validate_teacher(self, obj):
         if not obj.teacher:
@@ -93,6 +93,10 @@ class AssignedTeacherSerializer(serializers.ModelSerializer):
     
 
 class GroupSerializer(serializers.ModelSerializer):
+    """
+    Group with its roster, expects queryset of GroupManager.fetch_roster
+    """
+    roster_size = serializers.IntegerField(read_only=True)
     group_members = serializers.SerializerMethodField()
     assigned_teachers = serializers.SerializerMethodField()
 
@@ -100,22 +104,123 @@ class GroupSerializer(serializers.ModelSerializer):
         model = Group
         fields = (
             "id",
+            "roster_size",
             "group_members",
             "assigned_teachers",
             "group_name"
         )
         
     def get_group_members(self, obj):
-        return [{'full_name': f"{child.first_name} {child.last_name}"} for child in obj.group_students.all()]
+        return [{'full_name': child.full_name} for child in obj.group_students.all()]
     
     def get_assigned_teachers(self, obj):
-        if obj.assigned_teachers:
-            return [assigned_teacher.teacher.user.first_name for assigned_teacher in obj.assigned_teachers.all()]
-        return None
+        return [assigned_teacher.teacher.user.first_name for assigned_teacher in obj.assigned_teachers.all()]
 
 
 class GroupCreateSerializer(serializers.ModelSerializer):
     name = serializers.CharField()
     class Meta:
         model = Group
-        fields = ("name",)
\ No newline at end of file
+        fields = ("name",)
+
+class DirectoryContactSerializer(ReadOnlyModelSerializer):
+    """
+    Person in members directory, email is shown to teachers and managers only
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is None or request.user.user_type == UserTypeEnum.parent:
+            fields.pop("email")
+        return fields
+
+
+class DirectoryParentSerializer(DirectoryContactSerializer):
+    """
+    Parent in members directory, expects `user` selected with it
+    """
+    first_name = serializers.CharField(source="user.first_name")
+    last_name = serializers.CharField(source="user.last_name")
+    email = serializers.EmailField(source="user.email")
+
+    class Meta:
+        model = Parent
+        fields = ("id", "first_name", "last_name", "email")
+        read_only_fields = fields
+
+
+class DirectoryTeacherSerializer(DirectoryContactSerializer):
+    id = serializers.IntegerField(source="teacher.id")
+    first_name = serializers.CharField(source="teacher.user.first_name")
+    last_name = serializers.CharField(source="teacher.user.last_name")
+    email = serializers.EmailField(source="teacher.user.email")
+
+    class Meta:
+        model = AssignedTeacher
+        fields = ("id", "first_name", "last_name", "email", "assigned_type")
+        read_only_fields = fields
+
+
+class DirectoryChildSerializer(ReadOnlyModelSerializer):
+    parents = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Child
+        fields = ("id", "first_name", "last_name", "parents")
+        read_only_fields = fields
+
+    def get_parents(self, obj):
+        return [parent.id for parent in obj.parents.all()]
+
+
+class MemberDirectorySerializer(ReadOnlyModelSerializer):
+    """
+    Group with all its members, expects queryset of GroupManager.fetch_directory
+    """
+    teachers = DirectoryTeacherSerializer(source="assigned_teachers", many=True)
+    children = DirectoryChildSerializer(source="group_students", many=True)
+    parents = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Group
+        fields = ("id", "group_name", "teachers", "children", "parents")
+        read_only_fields = fields
+
+    def get_parents(self, obj):
+        parents = {}
+        for child in obj.group_students.all():
+            for parent in child.parents.all():
+                parents.setdefault(parent.id, parent)
+        return DirectoryParentSerializer(parents.values(), many=True, context=self.context).data
+
+
+class RosterImportSerializer(serializers.Serializer):
+    """
+    CSV file with columns: first_name, last_name, birth_date, group,
+    parent_email, parent_first_name, parent_last_name (one row per child's parent)
+    """
+    file = serializers.FileField()
+
+
+class GroupRolloverMoveSerializer(serializers.Serializer):
+    def get_fields(self):
+        return {
+            "from": serializers.IntegerField(min_value=1),
+            "to": serializers.IntegerField(min_value=1),
+        }
+
+
+class GroupRolloverSerializer(serializers.Serializer):
+    """
+    End-of-year moves of whole groups, every group can be moved once
+    """
+    moves = GroupRolloverMoveSerializer(many=True, allow_empty=False)
+    move_teachers = serializers.BooleanField(default=True)
+    dry_run = serializers.BooleanField(default=False)
+
+    def validate_moves(self, moves):
+        sources = [move["from"] for move in moves]
+        if len(sources) != len(set(sources)):
+            raise serializers.ValidationError("Every group can be moved only once.")
+        return moves
@@ -1,3 +1,6 @@
+import io
+
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 from rest_framework import (
@@ -6,6 +9,7 @@ from rest_framework import (
     viewsets,
 )
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 
@@ -15,19 +19,22 @@ from school_tracker.members.models import (
     AssignedTeacher, 
     Child,
     Group,
-    Parent
 )
 from school_tracker.members.serializers import (
     AssignedTeacherSerializer,
     ChildSerializer,
     GroupCreateSerializer,
+    GroupRolloverSerializer,
     GroupSerializer,
-    ParentSerializer, 
-    
+    MemberDirectorySerializer,
+    RosterImportSerializer,
 )
+from school_tracker.members.pagination import MemberDirectoryPagination
+from school_tracker.members.roster import RosterImport
 from school_tracker.utils.dicttools import get_values_from_dict
 from school_tracker.utils.enums import UserTypeEnum
 from school_tracker.members.permissions import (
+    InstitutionManagerPermission,
     TeacherOrIsStaffPermission,
     TeacherOrParentRelatedToChildPermission,
     TeacherOrParentRelatedToGroupPermission
@@ -38,26 +45,48 @@ class MemberViewSet(mixins.ListModelMixin,
                     viewsets.GenericViewSet):
 
     """
-    LIST -> all members sorted by groups (children, parents, teachers)
+    LIST -> institution directory: every group with its teachers, children and parents,
+            paginated by group (?page=<n>&page_size=<n>)
+
+    Custom method:
+    IMPORT_ROSTER -> create children, parents and groups from uploaded CSV (member/import/)
     """
     permission_classes = [IsAuthenticated]
+    serializer_class = MemberDirectorySerializer
+    pagination_class = MemberDirectoryPagination
+
+    serializer_map = {
+        "import_roster": RosterImportSerializer,
+    }
+
+    permission_map = {
+        "import_roster": [InstitutionManagerPermission],
+    }
+
+    def get_permissions(self):
+        permission_classes = self.permission_map.get(self.action, self.permission_classes)
+        return [permission() for permission in permission_classes]
+
+    def get_serializer_class(self, *args, **kwargs):
+        return self.serializer_map.get(self.action, self.serializer_class)
 
-    def list(self, request, *args, **kwargs):
-        for group in Group.objects.all():
-            teachers = group.assigned_teachers.all()
-            children = group.group_students.all()
-            parents = Parent.objects.filter(children__group=group).distinct()
-
-            teacher_serializer = AssignedTeacherSerializer(teachers, many=True)
-            children_serializer = ChildSerializer(children, many=True)
-            parent_serializer = ParentSerializer(parents, many=True)
-
-            return Response({
-                f"Members for {group.group_name}"
-                "teachers": teacher_serializer.data,
-                "children": children_serializer.data,
-                "parents": parent_serializer.data,
-            })
+    def get_queryset(self):
+        return Group.objects.fetch_directory()
+
+    @extend_schema(description="Method POST to import children with their parents from CSV file, rows are "
+                               "written in batches and invalid rows are reported with their line numbers")
+    @action(methods=["post"], detail=False, url_path="import")
+    def import_roster(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lines = io.TextIOWrapper(serializer.validated_data["file"], encoding="utf-8-sig", newline="")
+        try:
+            roster_import = RosterImport().run(lines)
+        except DjangoValidationError as error:
+            raise ValidationError({"file": error.messages})
+        except UnicodeDecodeError:
+            raise ValidationError({"file": ["File must be a UTF-8 encoded CSV."]})
+        return Response(roster_import.as_dict())
   
     
 class GroupViewSet(mixins.CreateModelMixin, 
@@ -76,19 +105,21 @@ class GroupViewSet(mixins.CreateModelMixin,
 
     Custom method:
     CREATE_GROUP -> create new group
+    ROLLOVER -> end-of-year move of children (and teachers) between groups (group/rollover/)
     """
 
-    queryset = Group.objects.all()
     permission_classes = [TeacherOrIsStaffPermission]
     serializer_class = GroupSerializer
 
     serializer_map = {
-        "create": ChildSerializer
+        "create": ChildSerializer,
+        "rollover": GroupRolloverSerializer,
     }
 
     permission_map = {
         "retrieve": [TeacherOrParentRelatedToGroupPermission],
         "create_group": [TeacherOrIsStaffPermission],
+        "rollover": [InstitutionManagerPermission],
     }
 
     def get_permissions(self):
@@ -97,6 +128,9 @@ class GroupViewSet(mixins.CreateModelMixin,
         
     def get_serializer_class(self, *args, **kwargs):
         return self.serializer_map.get(self.action, self.serializer_class)
+
+    def get_queryset(self):
+        return Group.objects.fetch_roster()
     
     _member_creation_keys = ["first_name", "last_name", "email"]
     _child_creation_keys = ["first_name", "last_name", "birth_date"]
@@ -108,7 +142,7 @@ class GroupViewSet(mixins.CreateModelMixin,
         member_data = get_values_from_dict(serializer.validated_data.get('user'), self._member_creation_keys)
         child_data = get_values_from_dict(serializer.validated_data.get('child'), self._child_creation_keys)
         child_data["group_id"] = self.kwargs.get("group_id")
-        child = Child.objects.create_with_parent(**member_data, **child_data)
+        child = Child.objects.create_with_parent(member_data, child_data)
         return Response({"detail": f"{child.first_name} {child.last_name} created successfully."}, status=status.HTTP_201_CREATED)
     
     @extend_schema(description='Method POST to create Group instance')
@@ -119,6 +153,21 @@ class GroupViewSet(mixins.CreateModelMixin,
         group_data = serializer.validated_data
         group = Group.objects.create(**group_data)
         return Response({"detail": f"{group.group_name} created successfully."}, status=status.HTTP_201_CREATED)
+
+    @extend_schema(description="Method POST to move children (and their teachers unless `move_teachers` is false) "
+                               "of groups to other groups at once, `dry_run` returns the changes without applying them")
+    @action(methods=["post"], detail=False, url_path="rollover")
+    def rollover(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            moves = Group.objects.rollover(
+                {move["from"]: move["to"] for move in data["moves"]}, data["move_teachers"], data["dry_run"]
+            )
+        except Group.DoesNotExist as error:
+            raise ValidationError({"moves": [str(error)]})
+        return Response({"dry_run": data["dry_run"], "moves": moves})
        
 
 class TeacherViewSet(mixins.CreateModelMixin,
@@ -131,7 +180,7 @@ class TeacherViewSet(mixins.CreateModelMixin,
     POST -> create teacher instance with group assignment
     PUT/PATCH -> update teacher details
     """
-    queryset = AssignedTeacher.objects.all()
+    queryset = AssignedTeacher.objects.select_related("teacher__user", "group")
     permission_classes = [TeacherOrIsStaffPermission]
     serializer_class = AssignedTeacherSerializer
 
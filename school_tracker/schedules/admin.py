@@ -10,7 +10,6 @@ class DayPlanAdmin(admin.ModelAdmin):
     )
     ordering = ["day"]
     list_filter = ["child", "day"]
-    index_together = ["child", "day"]
 
 
 @admin.register(Event)
@@ -18,5 +17,8 @@ class EventAdmin(admin.ModelAdmin):
     list_display = (
         "title",
         "date",
+        "recurrence",
+        "is_day_off",
     )
     ordering = ["date"]
+    filter_horizontal = ["groups"]
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class SchedulesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "school_tracker.schedules"
+
+    def ready(self):
+        from school_tracker.schedules import signals  # noqa: F401
@@ -0,0 +1,248 @@
+"""
+Columnar archive of dayplans of closed school years.
+
+One file per school year keeps rows sorted by (child, day) in columns:
+child ids (uint32), days as offsets from the school year start (uint16),
+meals and behaviour as uint8 codes, summaries as utf-8 blob with uint32
+offsets. Metadata (code tables, column offsets) is stored as JSON after
+the magic bytes. Reader memory-maps the file, so answering a query only
+touches pages of the requested child.
+"""
+import array
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+from collections import Counter
+from datetime import date, timedelta
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+
+from school_tracker.schedules.statistics import STATISTIC_FIELDS, get_counter_keys
+from school_tracker.utils.enums import BehaviourStatusEnum, MealStatusEnum
+
+ARCHIVE_MAGIC = b"DPARCH01"
+ARCHIVE_HEADER = struct.Struct("<8sI")
+ARCHIVE_ALIGNMENT = 8
+SCHOOL_YEAR_START_MONTH = 9
+
+CODE_TABLES = {
+    "meals_at_school": MealStatusEnum.values,
+    "behaviour": BehaviourStatusEnum.values,
+}
+COLUMN_TYPES = {
+    "child": "I",
+    "day": "H",
+    "meals_at_school": "B",
+    "behaviour": "B",
+    "summary_offsets": "I",
+    "summary": "B",
+}
+
+
+class ArchiveError(Exception):
+    pass
+
+
+def get_school_year_range(year: int) -> tuple:
+    """
+    Return first and last day of school year starting in September of given year
+    """
+    return date(year, SCHOOL_YEAR_START_MONTH, 1), date(year + 1, SCHOOL_YEAR_START_MONTH, 1) - timedelta(days=1)
+
+
+def get_school_year(day: date) -> int:
+    """
+    Return year the school year containing given day starts in
+    """
+    return day.year if day.month >= SCHOOL_YEAR_START_MONTH else day.year - 1
+
+
+def get_archive_path(year: int) -> Path:
+    return Path(settings.DAYPLAN_ARCHIVE_DIR) / f"dayplans_{year}_{year + 1}.dpa"
+
+
+def get_archived_years() -> list:
+    """
+    Return years of school years archived in DAYPLAN_ARCHIVE_DIR
+    """
+    return sorted(
+        int(path.name.split("_")[1]) for path in Path(settings.DAYPLAN_ARCHIVE_DIR).glob("dayplans_*_*.dpa")
+    )
+
+
+def write_archive(path, year: int, rows) -> int:
+    """
+    Write dayplans of school year into archive file
+
+    :param path: Destination file, replaced atomically.
+    :param year: Year the school year starts in.
+    :param rows: (child_id, day, meals_at_school, behaviour, summary) tuples sorted by child and day.
+    :return: Number of archived rows.
+    """
+    start_day, _ = get_school_year_range(year)
+    codes = {field: {value: code for code, value in enumerate(values)} for field, values in CODE_TABLES.items()}
+    columns = {name: array.array(typecode) for name, typecode in COLUMN_TYPES.items()}
+    columns["summary_offsets"].append(0)
+    summaries = bytearray()
+
+    for child_id, day, meals_at_school, behaviour, summary in rows:
+        columns["child"].append(child_id)
+        columns["day"].append((day - start_day).days)
+        columns["meals_at_school"].append(codes["meals_at_school"][meals_at_school])
+        columns["behaviour"].append(codes["behaviour"][behaviour])
+        summaries += (summary or "").encode()
+        columns["summary_offsets"].append(len(summaries))
+    columns["summary"] = array.array("B", summaries)
+
+    meta = {
+        "year": year,
+        "rows": len(columns["child"]),
+        "byteorder": sys.byteorder,
+        "codes": CODE_TABLES,
+        "columns": {},
+    }
+    # Column offsets are relative to data start, which follows padded metadata
+    offset = 0
+    for name, column in columns.items():
+        meta["columns"][name] = [offset, len(column) * column.itemsize, column.typecode]
+        offset += _padded(len(column) * column.itemsize)
+    meta_bytes = json.dumps(meta).encode()
+
+    tmp_path = Path(f"{path}.tmp")
+    tmp_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(tmp_path, "wb") as archive:
+        archive.write(ARCHIVE_HEADER.pack(ARCHIVE_MAGIC, len(meta_bytes)))
+        archive.write(meta_bytes)
+        archive.write(b"\0" * (_padded(archive.tell()) - archive.tell()))
+        for column in columns.values():
+            column.tofile(archive)
+            archive.write(b"\0" * (_padded(archive.tell()) - archive.tell()))
+    os.replace(tmp_path, path)
+    return meta["rows"]
+
+
+class ArchiveReader:
+    """
+    Memory-mapped reader of dayplans archive
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, "rb") as archive:
+            self._mmap = mmap.mmap(archive.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, meta_size = ARCHIVE_HEADER.unpack_from(self._mmap, 0)
+        if magic != ARCHIVE_MAGIC:
+            raise ArchiveError(f"{self.path} is not a dayplans archive.")
+        self.meta = json.loads(self._mmap[ARCHIVE_HEADER.size:ARCHIVE_HEADER.size + meta_size])
+        if self.meta["byteorder"] != sys.byteorder:
+            raise ArchiveError(f"{self.path} was written with different byte order.")
+
+        self.start_day, self.end_day = get_school_year_range(self.meta["year"])
+        data_start = _padded(ARCHIVE_HEADER.size + meta_size)
+        view = memoryview(self._mmap)[data_start:]
+        self._columns = {
+            name: view[offset:offset + size].cast(typecode)
+            for name, (offset, size, typecode) in self.meta["columns"].items()
+        }
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        for column in self._columns.values():
+            column.release()
+        self._columns = {}
+        self._mmap.close()
+
+    def timeline(self, child_id: int, start_day: date = None, end_day: date = None) -> list:
+        """
+        Archived dayplans of child within [start_day, end_day] range, newest first
+        """
+        first, last = self._get_child_rows(child_id)
+        days = self._columns["day"]
+        if start_day is not None:
+            first = bisect.bisect_left(days, (start_day - self.start_day).days, first, last)
+        if end_day is not None:
+            last = bisect.bisect_right(days, (end_day - self.start_day).days, first, last)
+        return [self._get_row(index) for index in range(last - 1, first - 1, -1)]
+
+    def statistics(self, child_id: int, period: str) -> list:
+        """
+        Archived counters of child, same shape as DayPlanStatistic summary rows
+        """
+        totals = {}
+        first, last = self._get_child_rows(child_id)
+        for index in range(first, last):
+            row = self._get_row(index, with_summary=False)
+            for _, row_period, period_start, field, value in get_counter_keys(child_id, row["day"], row):
+                if row_period == period:
+                    key = (period_start, field, value)
+                    totals[key] = totals.get(key, 0) + 1
+        return [
+            {"period_start": period_start, "field": field, "value": value, "total": total}
+            for (period_start, field, value), total in sorted(totals.items())
+        ]
+
+    def counters(self, child_ids=None, skip=frozenset()) -> Counter:
+        """
+        Counters of archived dayplans (of given children or all of them) keyed like DayPlanStatistic rows,
+        dayplans whose (child_id, day) is in `skip` are left out
+        """
+        if child_ids is None:
+            ranges = [(0, len(self))]
+        else:
+            ranges = [self._get_child_rows(child_id) for child_id in sorted(set(child_ids))]
+        children = self._columns["child"]
+        totals = Counter()
+        for first, last in ranges:
+            for index in range(first, last):
+                row = self._get_row(index, with_summary=False)
+                if (children[index], row["day"]) not in skip:
+                    totals.update(get_counter_keys(children[index], row["day"], row))
+        return totals
+
+    def _get_child_rows(self, child_id: int) -> tuple:
+        children = self._columns["child"]
+        return bisect.bisect_left(children, child_id), bisect.bisect_right(children, child_id)
+
+    def _get_row(self, index: int, with_summary: bool = True) -> dict:
+        row = {"day": self.start_day + timedelta(days=self._columns["day"][index])}
+        for field in STATISTIC_FIELDS:
+            row[field] = self.meta["codes"][field][self._columns[field][index]]
+        if with_summary:
+            offsets = self._columns["summary_offsets"]
+            row["summary"] = bytes(self._columns["summary"][offsets[index]:offsets[index + 1]]).decode() or None
+        return row
+
+
+@lru_cache(maxsize=16)
+def _open_archive(path: str, modified_at: float) -> ArchiveReader:
+    return ArchiveReader(path)
+
+
+def open_archive(year: int):
+    """
+    Return (cached) reader of school year archive or None when year is not archived
+    """
+    path = get_archive_path(year)
+    try:
+        modified_at = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    return _open_archive(str(path), modified_at)
+
+
+def _padded(size: int) -> int:
+    return -(-size // ARCHIVE_ALIGNMENT) * ARCHIVE_ALIGNMENT
@@ -0,0 +1,94 @@
+"""
+Process-local cache of events (titles and groups) keyed by date.
+
+Dayplans of many days are serialized at once, so events of the whole range
+are loaded with a single query (recurring events expanded for the range)
+and kept in memory. Cache is cleared when an
+event is saved or deleted (see schedules.signals); entries also expire after
+EVENT_CALENDAR_TIMEOUT seconds, so other processes pick up changes too.
+"""
+import threading
+import time
+from datetime import date, timedelta
+
+from django.conf import settings
+
+EVENT_CALENDAR_TIMEOUT = getattr(settings, "EVENT_CALENDAR_TIMEOUT", 300)
+
+
+class EventCalendar:
+
+    def __init__(self, timeout: int = EVENT_CALENDAR_TIMEOUT):
+        self.timeout = timeout
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def get_titles(self, day: date, group_id: int = None) -> list:
+        """
+        Return titles of events planned for given day concerning the group
+        (institution-wide events and the group's ones, every event without group)
+        """
+        entry = self._events.get(day)
+        if entry is None or self._is_expired(entry):
+            # Returned entries are used, cache might be cleared by another thread in the meantime
+            entries = self.prefetch(day, day)[day]
+        else:
+            entries = entry[1]
+        return [
+            title for title, group_ids in entries
+            if group_id is None or not group_ids or group_id in group_ids
+        ]
+
+    def prefetch(self, start_day: date, end_day: date) -> dict:
+        """
+        Load events of days missing in cache from [start_day, end_day] range with one query
+
+        :return: (title, group ids) entries of every day of the range.
+        """
+        from school_tracker.schedules.models import Event
+
+        days = [start_day + timedelta(days=offset) for offset in range((end_day - start_day).days + 1)]
+        with self._lock:
+            cached = {
+                day: self._events[day][1] for day in days
+                if day in self._events and not self._is_expired(self._events[day])
+            }
+        missing = [day for day in days if day not in cached]
+        if not missing:
+            return cached
+
+        events = {}
+        rows = Event.objects.occurrences(missing[0], missing[-1], "id", "title", "groups")
+        for day, event_id, title, group_id in rows:
+            title, group_ids = events.setdefault((day, event_id), (title, set()))
+            if group_id is not None:
+                group_ids.add(group_id)
+
+        day_events = {day: [] for day in missing}
+        for (day, _), event in sorted(events.items()):
+            if day in day_events:
+                day_events[day].append(event)
+
+        loaded_at = time.monotonic()
+        with self._lock:
+            self._events.update({day: (loaded_at, entries) for day, entries in day_events.items()})
+        cached.update(day_events)
+        return cached
+
+    def prefetch_days(self, days):
+        """
+        Load events covering all given days
+        """
+        days = list(days)
+        if days:
+            self.prefetch(min(days), max(days))
+
+    def clear(self):
+        with self._lock:
+            self._events.clear()
+
+    def _is_expired(self, entry) -> bool:
+        return time.monotonic() - entry[0] > self.timeout
+
+
+event_calendar = EventCalendar()
@@ -0,0 +1,120 @@
+"""
+iCalendar feed of events.
+
+Feed of an audience (set of groups) is generated by streaming events and kept
+in cache under a key containing the events version: time of the last event
+change and number of events (so deletions count too), read from the database
+with a single aggregate query, so every app process sees the same version.
+The version also serves as feed's ETag, so polling clients mostly get 304
+responses without generating the feed. There is no Last-Modified: deleting
+an event or changing user's groups does not move any date.
+"""
+import hashlib
+from datetime import timezone as dt_timezone
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+ICAL_CACHE_TIMEOUT = getattr(settings, "ICAL_CACHE_TIMEOUT", 60 * 60)
+ICAL_TOKEN_SALT = "school_tracker.schedules.ical"
+ICAL_PRODID = "-//School Tracker//Events//EN"
+ICAL_LINE_LIMIT = 75
+
+
+def get_events_version() -> str:
+    """
+    Return version of events: time (in microseconds) of the last event change and number of events
+    """
+    from school_tracker.schedules.models import Event
+
+    events = Event.objects.aggregate(changed_at=Max("updated_at"), total=Count("id"))
+    changed_at = int(events["changed_at"].timestamp() * 1_000_000) if events["changed_at"] else 0
+    return f"{changed_at}-{events['total']}"
+
+
+def get_audience_key(group_ids=None) -> str:
+    """
+    Return key shared by users seeing the same events
+    """
+    if group_ids is None:
+        return "all"
+    groups = ",".join(str(group_id) for group_id in sorted(set(group_ids)))
+    return hashlib.sha1(groups.encode()).hexdigest()
+
+
+def get_feed_cache_key(audience_key: str, version: str) -> str:
+    return f"schedules:ical:feed:{audience_key}:{version}"
+
+
+def make_feed_token(user_id: int) -> str:
+    return signing.dumps(user_id, salt=ICAL_TOKEN_SALT)
+
+
+def read_feed_token(token: str) -> int:
+    """
+    :raises signing.BadSignature: When token was not issued by make_feed_token.
+    """
+    return signing.loads(token, salt=ICAL_TOKEN_SALT)
+
+
+def escape_text(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+        .replace("\r\n", "\\n").replace("\n", "\\n")
+    )
+
+
+def fold_line(line: str) -> str:
+    """
+    Split content line into chunks of at most 75 octets (RFC 5545, 3.1)
+    """
+    chunks, chunk, size = [], "", 0
+    for char in line:
+        char_size = len(char.encode())
+        if size + char_size > ICAL_LINE_LIMIT:
+            chunks.append(chunk)
+            chunk, size = " ", 1
+        chunk += char
+        size += char_size
+    chunks.append(chunk)
+    return "\r\n".join(chunks) + "\r\n"
+
+
+def iter_feed(events, chunk_size: int = 500):
+    """
+    Yield iCalendar document of all-day events piece by piece
+    """
+    yield fold_line("BEGIN:VCALENDAR")
+    yield fold_line("VERSION:2.0")
+    yield fold_line(f"PRODID:{ICAL_PRODID}")
+    yield fold_line("CALSCALE:GREGORIAN")
+    rows = events.order_by("date", "id").values_list(
+        "id", "title", "description", "date", "recurrence", "updated_at"
+    )
+    for event_id, title, description, day, recurrence, updated_at in rows.iterator(chunk_size=chunk_size):
+        # Recurring events are expanded by calendar apps
+        lines = [
+            "BEGIN:VEVENT",
+            f"UID:event-{event_id}@school-tracker",
+            f"DTSTAMP:{updated_at.astimezone(dt_timezone.utc):%Y%m%dT%H%M%SZ}",
+            f"DTSTART;VALUE=DATE:{day:%Y%m%d}",
+            *([f"RRULE:{recurrence}"] if recurrence else []),
+            f"SUMMARY:{escape_text(title)}",
+            f"DESCRIPTION:{escape_text(description)}",
+            "END:VEVENT",
+        ]
+        yield "".join(fold_line(line) for line in lines)
+    yield fold_line("END:VCALENDAR")
+
+
+def iter_cached_feed(events, audience_key: str, version: str):
+    """
+    Stream feed and store it in cache once the whole document was produced
+    """
+    chunks = []
+    for chunk in iter_feed(events):
+        chunks.append(chunk)
+        yield chunk
+    cache.set(get_feed_cache_key(audience_key, version), "".join(chunks), ICAL_CACHE_TIMEOUT)
@@ -0,0 +1,51 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from school_tracker.schedules.archive import get_archive_path, get_school_year_range, open_archive, write_archive
+from school_tracker.schedules.models import DayPlan
+
+
+class Command(BaseCommand):
+    help = (
+        "Export dayplans of a closed school year (September - August) into a columnar archive file "
+        "served by dayplan/<child_id>/archive/. With --delete, archived rows are removed from the database "
+        "(statistics counters are kept)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--year", type=int, required=True, help="Year the school year starts in.")
+        parser.add_argument("--output", type=Path, help="Archive file (DAYPLAN_ARCHIVE_DIR by default).")
+        parser.add_argument("--delete", action="store_true", help="Delete archived dayplans from the database.")
+
+    def handle(self, *args, **options):
+        year = options["year"]
+        start_day, end_day = get_school_year_range(year)
+        if end_day >= timezone.localdate():
+            raise CommandError(f"School year {year}/{year + 1} is not closed yet.")
+        if options["delete"] and options["output"]:
+            raise CommandError("--delete requires the archive to be stored in DAYPLAN_ARCHIVE_DIR.")
+        path = options["output"] or get_archive_path(year)
+
+        started = time.perf_counter()
+        rows = DayPlan.objects.filter(day__range=(start_day, end_day)).order_by("child", "day").values_list(
+            "child_id", "day", "meals_at_school", "behaviour", "summary"
+        )
+        with transaction.atomic():
+            archived = write_archive(path, year, rows.iterator(chunk_size=5000))
+            self.stdout.write(
+                f"Archived {archived} dayplans into {path} ({path.stat().st_size} bytes) "
+                f"in {time.perf_counter() - started:.2f}s"
+            )
+
+            if options["delete"]:
+                # Check the file reads back before history leaves the database
+                if len(open_archive(year)) != archived:
+                    raise CommandError(f"{path} does not match archived dayplans, database rows are kept.")
+                deleted, _ = DayPlan.objects.filter(day__range=(start_day, end_day)).delete()
+                self.stdout.write(f"Deleted {deleted} dayplans from the database")
+
+        self.stdout.write(self.style.SUCCESS(f"School year {year}/{year + 1} archived"))
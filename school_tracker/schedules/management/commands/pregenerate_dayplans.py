@@ -0,0 +1,63 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from school_tracker.schedules.models import DayPlan, Event
+
+WEEKEND = (5, 6)
+LOOKAHEAD_DAYS = 60
+
+
+class Command(BaseCommand):
+    help = (
+        "Create empty dayplans of every child for upcoming school days "
+        "(weekends and days off are skipped). Safe to run repeatedly, e.g. nightly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--day", type=date.fromisoformat, help="Generate for given day (YYYY-MM-DD) only.")
+        parser.add_argument("--days", type=int, default=1, help="Number of upcoming school days to generate.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options["day"]:
+            start_day, end_day = options["day"], options["day"]
+        else:
+            start_day = timezone.localdate() + timedelta(days=1)
+            end_day = start_day + timedelta(days=LOOKAHEAD_DAYS)
+        days_off = Event.objects.fetch_days_off(start_day, end_day)
+
+        school_days = [day for day in self._iter_days(start_day, end_day) if self._is_school_day(day, days_off)]
+        if options["day"] and not school_days:
+            raise CommandError(f"{options['day']} is not a school day.")
+
+        total = 0
+        for day in school_days[:options["days"]]:
+            day_started = time.perf_counter()
+            closed_groups = days_off.get(day, set())
+            created = DayPlan.objects.create_empty_for_day(day, closed_groups, options["batch_size"])
+            total += created
+            skipped = f", groups off: {sorted(closed_groups)}" if closed_groups else ""
+            self.stdout.write(
+                f"{day}: created {created} dayplans in {(time.perf_counter() - day_started) * 1000:.0f} ms{skipped}"
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {total} dayplans in {time.perf_counter() - started:.2f}s"
+        ))
+
+    @staticmethod
+    def _iter_days(start_day, end_day):
+        day = start_day
+        while day <= end_day:
+            yield day
+            day += timedelta(days=1)
+
+    @staticmethod
+    def _is_school_day(day, days_off):
+        if day.weekday() in WEEKEND:
+            return False
+        return not (day in days_off and days_off[day] is None)
@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from school_tracker.schedules.models import DayPlanStatistic
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute weekly and monthly dayplan statistics from dayplans (e.g. after backfills), "
+        "dayplans of archived school years are counted from their archives."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--child", type=int, action="append", help="Rebuild only given child (repeatable).")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        created = DayPlanStatistic.objects.rebuild(options["child"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {created} statistic counters in {time.perf_counter() - started:.1f}s"
+        ))
@@ -1,6 +1,22 @@
-from django.db import models
+from collections import Counter
+
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Sum, When
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from school_tracker.schedules.archive import get_archived_years, get_school_year_range, open_archive
+from school_tracker.schedules.recurrence import expand_recurrence
+from school_tracker.schedules.statistics import (
+    NOT_SPECIFIED,
+    STATISTIC_FIELDS,
+    get_counter_deltas
+)
+from school_tracker.utils.enums import StatisticPeriodEnum, UserTypeEnum
+
 
 class DayPlanManager(models.Manager):
+    report_fields = ["meals_at_school", "behaviour", "summary"]
+
     def fetch_by_child_id(self, child_id: int):
         """
         Group dayplans by child_id
@@ -11,4 +27,259 @@ class DayPlanManager(models.Manager):
         """
         Group dayplans by date for given child
         """
-        return self.filter(child=child_id, day=date)
\ No newline at end of file
+        return self.filter(child=child_id, day=date)
+
+    def fetch_timeline(self, child_id: int, start_day=None, end_day=None):
+        """
+        Child's dayplans within [start_day, end_day] range, newest first
+        """
+        queryset = self.filter(child=child_id)
+        if start_day is not None:
+            queryset = queryset.filter(day__gte=start_day)
+        if end_day is not None:
+            queryset = queryset.filter(day__lte=end_day)
+        return queryset.order_by("-day")
+
+    def fetch_group_behaviour(self, group_id: int, start_day, end_day):
+        """
+        (child_id, day, behaviour) of reported behaviour of group's children within [start_day, end_day] range
+        """
+        return self.filter(child__group=group_id, day__range=(start_day, end_day)).exclude(
+            behaviour=NOT_SPECIFIED
+        ).values_list("child_id", "day", "behaviour")
+
+    def fetch_related_to_user(self, user):
+        """
+        Dayplans of children related to user (own children of parent, group children of teacher)
+        """
+        from school_tracker.members.models import AssignedTeacher
+
+        if user.is_superuser:
+            return self.all()
+        if user.user_type == UserTypeEnum.parent:
+            return self.filter(child__parents__user=user)
+        if user.user_type == UserTypeEnum.teacher:
+            # Subquery rather than join, teacher might be assigned to a group more than once
+            return self.filter(
+                child__group__in=AssignedTeacher.objects.filter(teacher__user=user).values("group")
+            )
+        return self.none()
+
+    def create_empty_for_day(self, day, exclude_groups=(), batch_size: int = 1000):
+        """
+        Create empty dayplans of every child (except excluded groups) for given day,
+        existing dayplans are left untouched
+
+        :return: Number of created dayplans.
+        """
+        from school_tracker.members.models import Child
+
+        child_ids = Child.objects.exclude(
+            group__in=exclude_groups
+        ).values_list("id", flat=True)
+        existing = self.filter(day=day).count()
+        self.bulk_create(
+            [self.model(child_id=child_id, day=day) for child_id in child_ids.iterator(chunk_size=batch_size)],
+            ignore_conflicts=True,
+            batch_size=batch_size,
+        )
+        return self.filter(day=day).count() - existing
+
+    def upsert_reports(self, day, reports) -> int:
+        """
+        Insert or update dayplans of many children for given day, with a single query per set of reported fields
+        (fields missing from a report keep their stored values), statistics are updated with replaced values
+        (locked until the end of transaction)
+
+        :param day: Day of the reports.
+        :param reports: Dicts with child (id) and any of meals_at_school, behaviour and summary.
+        :return: Number of saved dayplans.
+        """
+        from school_tracker.schedules.models import DayPlanStatistic
+
+        by_fields = {}
+        for report in reports:
+            fields = tuple(field for field in self.report_fields if field in report)
+            by_fields.setdefault(fields, []).append(report)
+        child_ids = sorted({report["child"] for report in reports})
+        with transaction.atomic():
+            # Lock the replaced dayplans (missing ones are created empty first, they do not count
+            # in statistics), so concurrent upserts of the same day do not subtract the same values
+            self.bulk_create(
+                [self.model(child_id=child_id, day=day) for child_id in child_ids], ignore_conflicts=True
+            )
+            stored = self.select_for_update().filter(
+                child__in=child_ids, day=day
+            ).order_by("child", "day").values_list("child_id", *STATISTIC_FIELDS)
+            before = {child_id: dict(zip(STATISTIC_FIELDS, values)) for child_id, *values in stored}
+
+            for fields, field_reports in by_fields.items():
+                if not fields:
+                    continue
+                self.bulk_create(
+                    [
+                        self.model(day=day, child_id=report["child"], **{field: report[field] for field in fields})
+                        for report in field_reports
+                    ],
+                    update_conflicts=True,
+                    unique_fields=["child", "day"],
+                    update_fields=fields,
+                )
+            after = {
+                report["child"]: {
+                    field: report.get(field, before[report["child"]][field]) for field in STATISTIC_FIELDS
+                } for report in reports
+            }
+            DayPlanStatistic.objects.record_changes(
+                [(child_id, day, values) for child_id, values in before.items()],
+                [(child_id, day, values) for child_id, values in after.items()],
+            )
+        return len(reports)
+
+
+class DayPlanStatisticManager(models.Manager):
+    period_truncs = {
+        StatisticPeriodEnum.week: TruncWeek,
+        StatisticPeriodEnum.month: TruncMonth,
+    }
+
+    def record_changes(self, before, after):
+        """
+        Update counters with dayplans replaced by a change
+
+        :param before: (child_id, day, values) of dayplans before the change.
+        :param after: (child_id, day, values) of dayplans after the change.
+        """
+        self.apply_deltas(get_counter_deltas(before, after))
+
+    def apply_deltas(self, deltas):
+        """
+        Add deltas to counters keyed by (child, period, period_start, field, value),
+        missing counters are created first, all counters change with a single update
+        """
+        if not deltas:
+            return
+        self.bulk_create([
+            self.model(child_id=child_id, period=period, period_start=start, field=field, value=value)
+            for child_id, period, start, field, value in deltas
+        ], ignore_conflicts=True)
+
+        self.filter(
+            child__in={key[0] for key in deltas},
+            period_start__in={key[2] for key in deltas},
+        ).update(count=F("count") + Case(
+            *[
+                When(Q(child=child_id, period=period, period_start=start, field=field, value=value), then=delta)
+                for (child_id, period, start, field, value), delta in deltas.items()
+            ],
+            default=0,
+        ))
+
+    def rebuild(self, child_ids=None):
+        """
+        Recompute counters from dayplans (of given children or all of them),
+        dayplans of archived school years missing from the database are counted from the archive
+
+        :return: Number of created counters.
+        """
+        from school_tracker.schedules.models import DayPlan
+
+        dayplans = DayPlan.objects.all()
+        counters = self.all()
+        if child_ids is not None:
+            dayplans = dayplans.filter(child__in=child_ids)
+            counters = counters.filter(child__in=child_ids)
+
+        totals = Counter()
+        for period, trunc in self.period_truncs.items():
+            for field in STATISTIC_FIELDS:
+                rows = dayplans.exclude(**{field: NOT_SPECIFIED}).annotate(
+                    period_start=trunc("day")
+                ).values("child_id", "period_start", field).annotate(total=Count("id")).order_by()
+                for row in rows:
+                    totals[(row["child_id"], period, row["period_start"], field, row[field])] += row["total"]
+
+        for year in get_archived_years():
+            # Rows still in the database (archived without --delete, or backfilled later) win
+            live = set(dayplans.filter(day__range=get_school_year_range(year)).values_list("child_id", "day"))
+            totals.update(open_archive(year).counters(child_ids, skip=live))
+
+        statistics = [
+            self.model(child_id=child_id, period=period, period_start=start, field=field, value=value, count=total)
+            for (child_id, period, start, field, value), total in totals.items()
+        ]
+        with transaction.atomic():
+            counters.delete()
+            self.bulk_create(statistics, batch_size=1000)
+        return len(statistics)
+
+    def fetch_for_child(self, child_id: int, period: str, start_day=None, end_day=None):
+        """
+        Counters of child for periods starting within [start_day, end_day] range
+        """
+        return self._fetch_summary(self.filter(child=child_id), period, start_day, end_day)
+
+    def fetch_for_group(self, group_id: int, period: str, start_day=None, end_day=None):
+        """
+        Counters summed over group's children for periods starting within [start_day, end_day] range
+        """
+        return self._fetch_summary(self.filter(child__group=group_id), period, start_day, end_day)
+
+    @staticmethod
+    def _fetch_summary(queryset, period, start_day, end_day):
+        queryset = queryset.filter(period=period, count__gt=0)
+        if start_day is not None:
+            queryset = queryset.filter(period_start__gte=start_day)
+        if end_day is not None:
+            queryset = queryset.filter(period_start__lte=end_day)
+        return queryset.values("period_start", "field", "value").annotate(
+            total=Sum("count")
+        ).order_by("period_start", "field", "value")
+
+
+class EventQuerySet(models.QuerySet):
+    def occurring(self, start_day, end_day):
+        """
+        Events occurring within [start_day, end_day] range: single ones planned for it
+        and recurring ones started before its end and not finished before its start
+        """
+        recurring = ~Q(recurrence="") & Q(date__lte=end_day) & (
+            Q(recurrence_end__isnull=True) | Q(recurrence_end__gte=start_day)
+        )
+        return self.filter(Q(date__range=(start_day, end_day)) | recurring)
+
+    def occurrences(self, start_day, end_day, *fields):
+        """
+        Yield (day, *fields) of every occurrence within [start_day, end_day] range,
+        recurring events are expanded for the range only
+        """
+        rows = self.occurring(start_day, end_day).order_by("date", "id").values_list("date", "recurrence", *fields)
+        for first_day, recurrence, *values in rows:
+            days = expand_recurrence(recurrence, first_day, start_day, end_day) if recurrence else [first_day]
+            for day in days:
+                yield day, *values
+
+
+class EventManager(models.Manager.from_queryset(EventQuerySet)):
+    def fetch_for_groups(self, group_ids=None):
+        """
+        Events concerning given groups: institution-wide ones and those planned for the groups.
+        None stands for every event (institution managers)
+        """
+        if group_ids is None:
+            return self.all()
+        return self.filter(Q(groups__isnull=True) | Q(groups__in=group_ids)).distinct()
+
+    def fetch_days_off(self, start_day, end_day):
+        """
+        Days off within [start_day, end_day] range
+
+        :return: Dict of day -> None when the whole institution is closed, set of closed groups' ids otherwise.
+        """
+        days_off = {}
+        for day, group_id in self.filter(is_day_off=True).occurrences(start_day, end_day, "groups"):
+            if group_id is None:
+                days_off[day] = None
+            elif days_off.get(day, set()) is not None:
+                days_off.setdefault(day, set()).add(group_id)
+        return days_off
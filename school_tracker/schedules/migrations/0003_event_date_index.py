@@ -0,0 +1,18 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("schedules", "0002_alter_dayplan_behaviour_alter_dayplan_child_and_more"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="event",
+            name="date",
+            field=models.DateField(db_index=True),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:42
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def remove_duplicated_dayplans(apps, schema_editor):
+    """
+    Keep only the most recent dayplan of each child and day
+    """
+    DayPlan = apps.get_model("schedules", "DayPlan")
+    latest_ids = DayPlan.objects.values("child", "day").annotate(latest_id=Max("id")).values("latest_id")
+    DayPlan.objects.exclude(id__in=latest_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("schedules", "0003_event_date_index"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="dayplan",
+            name="day",
+            field=models.DateField(default=django.utils.timezone.localdate),
+        ),
+        migrations.RunPython(remove_duplicated_dayplans, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="dayplan",
+            constraint=models.UniqueConstraint(
+                fields=("child", "day"), name="unique_dayplan_per_child_and_day"
+            ),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("members", "0003_remove_parent_child_child_parents"),
+        ("schedules", "0004_dayplan_unique_child_day"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DayPlanStatistic",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "period",
+                    models.CharField(
+                        choices=[("week", "Week"), ("month", "Month")], max_length=10
+                    ),
+                ),
+                ("period_start", models.DateField()),
+                ("field", models.CharField(max_length=20)),
+                ("value", models.CharField(max_length=20)),
+                ("count", models.IntegerField(default=0)),
+                (
+                    "child",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="dayplan_statistics",
+                        to="members.child",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("child", "period", "period_start", "field", "value"),
+                        name="unique_dayplan_statistic_counter",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("members", "0003_remove_parent_child_child_parents"),
+        ("schedules", "0005_dayplanstatistic"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="groups",
+            field=models.ManyToManyField(
+                blank=True, related_name="events", to="members.group"
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
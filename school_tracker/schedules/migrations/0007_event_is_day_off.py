@@ -0,0 +1,20 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("schedules", "0006_event_groups"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="is_day_off",
+            field=models.BooleanField(
+                default=False, help_text="Institution (or groups) closed on this day."
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.3 on 2026-10-18 13:55
+
+import school_tracker.schedules.recurrence
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("members", "0003_remove_parent_child_child_parents"),
+        ("schedules", "0007_event_is_day_off"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="recurrence",
+            field=models.CharField(
+                blank=True,
+                help_text="Repeat rule (RFC 5545 RRULE), e.g. FREQ=WEEKLY;BYDAY=TU or FREQ=WEEKLY;UNTIL=20250627.",
+                max_length=255,
+                validators=[school_tracker.schedules.recurrence.validate_recurrence],
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="recurrence_end",
+            field=models.DateField(
+                blank=True,
+                editable=False,
+                help_text="Last occurrence of recurring event, empty for endless ones.",
+                null=True,
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                condition=models.Q(("recurrence", ""), _negated=True),
+                fields=["recurrence_end", "date"],
+                name="event_recurring_idx",
+            ),
+        ),
+    ]
@@ -1,31 +1,64 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
-from school_tracker.members.models import Child
+from school_tracker.members.models import Child, Group
 from school_tracker.utils.enums import (
     BehaviourStatusEnum,
-    MealStatusEnum
+    MealStatusEnum,
+    StatisticPeriodEnum
 )
-from school_tracker.schedules.manager import DayPlanManager
+from school_tracker.schedules.calendar import event_calendar
+from school_tracker.schedules.manager import DayPlanManager, DayPlanStatisticManager, EventManager
+from school_tracker.schedules.recurrence import get_last_occurrence, validate_recurrence
+from school_tracker.schedules.statistics import STATISTIC_FIELDS
 
 
 class Event(models.Model):
     """
     Model to store special events planned in a given institution or group
+    (event without groups concerns the whole institution).
+    Recurring event is stored once, date being its first occurrence
     """
     title = models.CharField(max_length=200)
     description = models.TextField()
-    date = models.DateField()
+    date = models.DateField(db_index=True)
+    groups = models.ManyToManyField(Group, blank=True, related_name="events")
+    is_day_off = models.BooleanField(default=False, help_text="Institution (or groups) closed on this day.")
+    recurrence = models.CharField(
+        max_length=255,
+        blank=True,
+        validators=[validate_recurrence],
+        help_text="Repeat rule (RFC 5545 RRULE), e.g. FREQ=WEEKLY;BYDAY=TU or FREQ=WEEKLY;UNTIL=20250627.",
+    )
+    recurrence_end = models.DateField(
+        null=True, blank=True, editable=False, help_text="Last occurrence of recurring event, empty for endless ones."
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = EventManager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["recurrence_end", "date"],
+                condition=~models.Q(recurrence=""),
+                name="event_recurring_idx",
+            ),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.recurrence_end = get_last_occurrence(self.recurrence, self.date) if self.recurrence else None
+        super().save(*args, **kwargs)
+
 
 class DayPlan(models.Model):
     """
     Model to represent daily activity and status
     """
-    day = models.DateField(auto_now=True)
+    day = models.DateField(default=timezone.localdate)
     child = models.ForeignKey(Child, on_delete=models.CASCADE, related_name="dayplans")
     meals_at_school = models.CharField(
         max_length=20, choices=MealStatusEnum.choices, default=MealStatusEnum.not_specified
@@ -37,10 +70,80 @@ class DayPlan(models.Model):
 
     objects = DayPlanManager()
 
+    class Meta:
+        # Unique index on (child, day) also serves child's timeline keyset paging
+        constraints = [
+            models.UniqueConstraint(fields=["child", "day"], name="unique_dayplan_per_child_and_day"),
+        ]
+
     def __str__(self):
         return f"Dayplan for {self.child.full_name} at {self.day}"
 
+    def get_statistic_values(self):
+        """
+        Return (child_id, day, values) counted in dayplan statistics
+        """
+        values = {field: self.__dict__.get(field) for field in STATISTIC_FIELDS}
+        return self.__dict__.get("child_id"), self.__dict__.get("day"), values
+
+    def save(self, *args, **kwargs):
+        """
+        Save dayplan and move its contribution to statistics
+        (queryset updates bypass it, run rebuild_dayplan_statistics after them)
+        """
+        with transaction.atomic():
+            before = self._lock_stored_statistic_values()
+            super().save(*args, **kwargs)
+            DayPlanStatistic.objects.record_changes(before, [self.get_statistic_values()])
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            before = self._lock_stored_statistic_values()
+            result = super().delete(*args, **kwargs)
+            DayPlanStatistic.objects.record_changes(before, [])
+        return result
+
+    def _lock_stored_statistic_values(self) -> list:
+        """
+        Return statistic values of the stored row (locked until the end of transaction),
+        the instance might have been loaded before another change
+        """
+        if self.pk is None:
+            return []
+        stored = DayPlan.objects.select_for_update().filter(pk=self.pk).values_list(
+            "child_id", "day", *STATISTIC_FIELDS
+        ).first()
+        if stored is None:
+            return []
+        child_id, day, *values = stored
+        return [(child_id, day, dict(zip(STATISTIC_FIELDS, values)))]
+
     @property
     def events(self):
-        if events := Event.objects.filter(date=self.day):
-            return [event.title for event in events] if events.exists() else "No events for today."
+        return event_calendar.get_titles(self.day, self.child.group_id) or "No events for today."
+
+
+class DayPlanStatistic(models.Model):
+    """
+    Rollup counting dayplan statuses of a child per week and month,
+    kept up to date on every dayplan change
+    """
+    child = models.ForeignKey(Child, on_delete=models.CASCADE, related_name="dayplan_statistics")
+    period = models.CharField(max_length=10, choices=StatisticPeriodEnum.choices)
+    period_start = models.DateField()
+    field = models.CharField(max_length=20)
+    value = models.CharField(max_length=20)
+    count = models.IntegerField(default=0)
+
+    objects = DayPlanStatisticManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["child", "period", "period_start", "field", "value"],
+                name="unique_dayplan_statistic_counter",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.field}={self.value} of {self.child_id} in {self.period} of {self.period_start}: {self.count}"
@@ -0,0 +1,65 @@
+from datetime import date
+
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from school_tracker.utils.cursors import CursorPageSizeMixin, decode_cursor, encode_cursor
+
+
+class DayPlanTimelinePagination(CursorPageSizeMixin, BasePagination):
+    """
+    Keyset pagination over child's days, newest first.
+
+    ?cursor=<cursor> -> page of dayplans older than cursor
+
+    Every page is a single range scan of the (child, day) index,
+    so latency does not grow with the depth of history.
+    """
+    page_size = 30
+    max_page_size = 100
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        page_size = self.get_page_size(request)
+
+        if cursor := request.query_params.get(self.cursor_query_param):
+            queryset = queryset.filter(day__lt=self.decode_position(cursor))
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "results": data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not (self.has_next and self.page):
+            return None
+        return replace_query_param(
+            self.base_url, self.cursor_query_param, encode_cursor(self.page[-1].day.isoformat())
+        )
+
+    def decode_position(self, cursor: str) -> date:
+        try:
+            day, = decode_cursor(cursor, size=1)
+            return date.fromisoformat(day)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
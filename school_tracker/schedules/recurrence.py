@@ -0,0 +1,71 @@
+"""
+Recurrence rules of events (RFC 5545 RRULE, e.g. FREQ=WEEKLY;BYDAY=TU).
+
+Recurring event is stored once, its occurrences are expanded only for the
+window being queried. Event's date is the first occurrence (DTSTART).
+Daily and weekly rules without COUNT are rebased close to the window before
+expanding, so a window costs the same no matter how long ago the event
+started. Expanded windows are kept in a small in-process cache.
+"""
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+
+from dateutil.rrule import rrulestr
+from django.core.exceptions import ValidationError
+
+# Length of a rule's period in days, for rules which can be rebased to a later start
+REBASE_PERIOD_DAYS = {"DAILY": 1, "WEEKLY": 7}
+
+
+def get_rule_parts(recurrence: str) -> dict:
+    return dict(part.split("=", 1) for part in recurrence.upper().split(";") if "=" in part)
+
+
+def parse_recurrence(recurrence: str, first_day: date):
+    """
+    :raises ValueError: When rule cannot be parsed.
+    """
+    return rrulestr(recurrence, dtstart=datetime.combine(first_day, time.min))
+
+
+def validate_recurrence(recurrence: str):
+    parts = get_rule_parts(recurrence)
+    if "FREQ" not in parts or "DTSTART" in recurrence.upper():
+        raise ValidationError("Enter a repeat rule like FREQ=WEEKLY;BYDAY=TU (event's date is the first occurrence).")
+    try:
+        parse_recurrence(recurrence, date.today()).after(datetime.min)
+    except (ValueError, TypeError) as error:
+        raise ValidationError(f"Invalid repeat rule: {error}")
+
+
+def get_last_occurrence(recurrence: str, first_day: date):
+    """
+    Return day of the last occurrence, None for endless rules
+    """
+    parts = get_rule_parts(recurrence)
+    if "COUNT" not in parts and "UNTIL" not in parts:
+        return None
+    occurrences = list(parse_recurrence(recurrence, first_day))
+    return max([first_day] + [occurrence.date() for occurrence in occurrences])
+
+
+@lru_cache(maxsize=4096)
+def expand_recurrence(recurrence: str, first_day: date, start_day: date, end_day: date) -> tuple:
+    """
+    Return days (sorted) the event occurs on within [start_day, end_day] range
+    """
+    parts = get_rule_parts(recurrence)
+    rule_start = first_day
+    if parts.get("FREQ") in REBASE_PERIOD_DAYS and not {"COUNT", "BYSETPOS"} & parts.keys():
+        step = REBASE_PERIOD_DAYS[parts["FREQ"]] * int(parts.get("INTERVAL", 1))
+        rule_start += timedelta(days=max(0, (start_day - first_day).days // step) * step)
+
+    rule = parse_recurrence(recurrence, rule_start)
+    days = {
+        occurrence.date() for occurrence in rule.between(
+            datetime.combine(start_day, time.min), datetime.combine(end_day, time.min), inc=True
+        )
+    }
+    if start_day <= first_day <= end_day:
+        days.add(first_day)
+    return tuple(sorted(day for day in days if day >= first_day))
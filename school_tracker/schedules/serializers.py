@@ -1,11 +1,25 @@
+from django.utils import timezone
 from rest_framework import serializers
 
-from school_tracker.schedules.models import (
-    DayPlan,
-    Event
-)
+from school_tracker.chats.serializers import MessageInboxSerializer
+from school_tracker.members.models import Child, Group
+from school_tracker.schedules.calendar import event_calendar
+from school_tracker.schedules.models import DayPlan
+from school_tracker.schedules.trends import TRENDS_WINDOW
+from school_tracker.utils.enums import BehaviourStatusEnum, MealStatusEnum, StatisticPeriodEnum
 from school_tracker.utils.serializers import ReadOnlyModelSerializer
 
+
+class DayPlanListSerializer(serializers.ListSerializer):
+    """
+    Loads events of all serialized days with a single query
+    """
+    def to_representation(self, data):
+        data = list(data.all() if hasattr(data, "all") else data)
+        event_calendar.prefetch_days(dayplan.day for dayplan in data)
+        return super().to_representation(data)
+
+
 class DayPlanSerializer(ReadOnlyModelSerializer):
     events = serializers.SerializerMethodField()
 
@@ -20,10 +34,10 @@ class DayPlanSerializer(ReadOnlyModelSerializer):
             "events",
         )
         read_only_fields = fields
+        list_serializer_class = DayPlanListSerializer
 
-    def get_events(self):
-        events = Event.objects.filter(date=self.instance.day)
-        return [event.title for event in events]
+    def get_events(self, obj) -> list:
+        return event_calendar.get_titles(obj.day, obj.child.group_id)
 
 
 class DayPlanCreateUpdateSerializer(serializers.ModelSerializer):
@@ -45,3 +59,137 @@ class DayPlanCreateUpdateSerializer(serializers.ModelSerializer):
         if value < self.instance.date.today():
             raise serializers.ValidationError("The date cannot be in the past.")
         return value
+
+
+class DayPlanReportSerializer(serializers.Serializer):
+    """
+    Report of a child, fields left out keep values stored in child's dayplan
+    """
+    child = serializers.IntegerField(min_value=1)
+    meals_at_school = serializers.ChoiceField(choices=MealStatusEnum.choices, required=False)
+    behaviour = serializers.ChoiceField(choices=BehaviourStatusEnum.choices, required=False)
+    summary = serializers.CharField(allow_null=True, allow_blank=True, required=False)
+
+
+class DayPlanBulkSerializer(serializers.Serializer):
+    """
+    Daily reports of group's children, every report replaces child's dayplan of the day
+    """
+    group = serializers.PrimaryKeyRelatedField(queryset=Group.objects.all())
+    day = serializers.DateField(default=timezone.localdate)
+    reports = DayPlanReportSerializer(many=True, allow_empty=False, max_length=200)
+
+    def validate_day(self, value):
+        if value > timezone.localdate():
+            raise serializers.ValidationError("Reports cannot be filled in for upcoming days.")
+        return value
+
+    def validate(self, attrs):
+        child_ids = [report["child"] for report in attrs["reports"]]
+        if len(child_ids) != len(set(child_ids)):
+            raise serializers.ValidationError({"reports": "Every child can be reported only once."})
+
+        group_child_ids = set(
+            Child.objects.filter(group=attrs["group"], id__in=child_ids).values_list("id", flat=True)
+        )
+        if missing := sorted(set(child_ids) - group_child_ids):
+            raise serializers.ValidationError({"reports": f"Children {missing} do not belong to the group."})
+        return attrs
+
+
+class DayPlanTimelineSerializer(serializers.Serializer):
+    """
+    Query params of child's timeline (`from` and `to` days, both inclusive)
+    """
+    def get_fields(self):
+        return {
+            "from": serializers.DateField(required=False),
+            "to": serializers.DateField(required=False),
+        }
+
+    def validate(self, attrs):
+        if "from" in attrs and "to" in attrs and attrs["from"] > attrs["to"]:
+            raise serializers.ValidationError({"to": "Date range end must not precede its start."})
+        return attrs
+
+
+class DayPlanStatisticsSerializer(DayPlanTimelineSerializer):
+    """
+    Query params of statistics (period and optional `from`/`to` days)
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        fields["period"] = serializers.ChoiceField(
+            choices=StatisticPeriodEnum.choices, default=StatisticPeriodEnum.week
+        )
+        return fields
+
+
+class DayPlanArchiveSerializer(DayPlanStatisticsSerializer):
+    """
+    Query params of archived school year (year it starts in, period and optional `from`/`to` days)
+    """
+    def get_fields(self):
+        fields = super().get_fields()
+        fields["year"] = serializers.IntegerField(min_value=2000, max_value=9999)
+        return fields
+
+
+class DayPlanGroupStatisticsSerializer(DayPlanStatisticsSerializer):
+    def get_fields(self):
+        fields = super().get_fields()
+        fields["group"] = serializers.PrimaryKeyRelatedField(queryset=Group.objects.all())
+        return fields
+
+
+class DayPlanTrendsSerializer(serializers.Serializer):
+    """
+    Query params of group's behaviour trends (rolling window in school days)
+    """
+    group = serializers.PrimaryKeyRelatedField(queryset=Group.objects.all())
+    window = serializers.IntegerField(min_value=3, max_value=30, default=TRENDS_WINDOW)
+
+
+class DashboardChildSerializer(ReadOnlyModelSerializer):
+    """
+    Child's today summary, expects `latest_messages` and `unread_counts`
+    (dicts keyed by child id) in context and `today_dayplans` prefetched
+    """
+    group_name = serializers.CharField(source="group.group_name")
+    dayplan = serializers.SerializerMethodField()
+    events = serializers.SerializerMethodField()
+    latest_message = serializers.SerializerMethodField()
+    unread_count = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Child
+        fields = (
+            "id",
+            "first_name",
+            "last_name",
+            "group",
+            "group_name",
+            "dayplan",
+            "events",
+            "latest_message",
+            "unread_count",
+        )
+        read_only_fields = fields
+
+    def get_dayplan(self, obj):
+        if not obj.today_dayplans:
+            return None
+        dayplan = DayPlanSerializer(obj.today_dayplans[0]).data
+        dayplan.pop("events")
+        return dayplan
+
+    def get_events(self, obj) -> list:
+        return event_calendar.get_titles(self.context["day"], obj.group_id)
+
+    def get_latest_message(self, obj):
+        if message := self.context["latest_messages"].get(obj.id):
+            return MessageInboxSerializer(message).data
+        return None
+
+    def get_unread_count(self, obj) -> int:
+        return self.context["unread_counts"].get(obj.id, 0)
@@ -0,0 +1,26 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from school_tracker.schedules.calendar import event_calendar
+from school_tracker.schedules.models import Event
+
+
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+def clear_event_calendar(sender, **kwargs):
+    """
+    Event may be moved to another day, so the whole cached calendar is dropped
+    """
+    event_calendar.clear()
+
+
+@receiver(m2m_changed, sender=Event.groups.through)
+def clear_event_calendar_on_groups_change(sender, instance, action, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, Event):
+        Event.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+    else:
+        Event.objects.filter(pk__in=pk_set or []).update(updated_at=timezone.now())
+    event_calendar.clear()
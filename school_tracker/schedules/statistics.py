@@ -0,0 +1,51 @@
+"""
+Helpers for incrementally maintained dayplan statistics.
+
+Every dayplan contributes one point to counters of its child's week and
+month for each statistic field. Not specified values are skipped, so
+pre-generated empty dayplans do not distort the distributions.
+"""
+from collections import Counter
+from datetime import date, timedelta
+
+from school_tracker.utils.enums import StatisticPeriodEnum
+
+STATISTIC_FIELDS = ("behaviour", "meals_at_school")
+NOT_SPECIFIED = "not_specified"
+
+
+def get_period_start(day: date, period: str) -> date:
+    """
+    Return first day of the week (Monday) or month containing given day
+    """
+    if period == StatisticPeriodEnum.week:
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+
+def get_counter_keys(child_id: int, day: date, values: dict) -> list:
+    """
+    Return (child, period, period_start, field, value) keys of counters a dayplan contributes to
+    """
+    return [
+        (child_id, period, get_period_start(day, period), field, values[field])
+        for period in StatisticPeriodEnum.values
+        for field in STATISTIC_FIELDS
+        if values.get(field) and values[field] != NOT_SPECIFIED
+    ]
+
+
+def get_counter_deltas(before, after) -> Counter:
+    """
+    Compute counter changes caused by replacing dayplans.
+
+    :param before: (child_id, day, values) of dayplans before the change.
+    :param after: (child_id, day, values) of dayplans after the change.
+    :return: Counter of non-zero deltas keyed by counter key.
+    """
+    deltas = Counter()
+    for child_id, day, values in before:
+        deltas.subtract(get_counter_keys(child_id, day, values))
+    for child_id, day, values in after:
+        deltas.update(get_counter_keys(child_id, day, values))
+    return Counter({key: delta for key, delta in deltas.items() if delta})
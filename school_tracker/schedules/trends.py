@@ -0,0 +1,147 @@
+"""
+Behaviour trends of a group.
+
+Group's behaviour history is loaded as a (children x school days) matrix of
+scores (0 for great_day up to 3 for talk_needed, NaN where nothing was
+reported), so rolling scores and deviations of all children are computed
+with a handful of array operations. A child is flagged when the recent
+rolling score drifts away from its own baseline (`drift`) or reaches
+might_be_better on average (`concern`).
+
+Trends cover the current school year up to yesterday and are cached per
+group per day.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from school_tracker.members.models import Child
+from school_tracker.schedules.archive import get_school_year, get_school_year_range
+from school_tracker.schedules.models import DayPlan
+from school_tracker.utils.enums import BehaviourStatusEnum
+
+TRENDS_CACHE_TIMEOUT = getattr(settings, "TRENDS_CACHE_TIMEOUT", 24 * 60 * 60)
+TRENDS_WINDOW = 10
+DRIFT_THRESHOLD = 2.0
+CONCERN_SCORE = 2.0
+MIN_DEVIATION = 0.5
+
+BEHAVIOUR_SCORES = {
+    BehaviourStatusEnum.great_day: 0.0,
+    BehaviourStatusEnum.ok_day: 1.0,
+    BehaviourStatusEnum.might_be_better: 2.0,
+    BehaviourStatusEnum.talk_needed: 3.0,
+}
+
+
+def get_score_matrix(child_ids, rows) -> tuple:
+    """
+    Build matrix of behaviour scores
+
+    :param child_ids: Children of the group (rows of the matrix).
+    :param rows: (child_id, day, behaviour) of reported dayplans.
+    :return: (child ids, days, scores) arrays, scores NaN where nothing was reported.
+    """
+    children = np.unique(np.fromiter(child_ids, dtype=np.int64))
+    if not rows:
+        return children, np.array([], dtype="datetime64[D]"), np.full((len(children), 0), np.nan)
+
+    row_children, row_days, behaviours = zip(*rows)
+    days, day_index = np.unique(np.array(row_days, dtype="datetime64[D]"), return_inverse=True)
+    codes, code_index = np.unique(np.array(behaviours), return_inverse=True)
+    code_scores = np.array([BEHAVIOUR_SCORES.get(code, np.nan) for code in codes])
+
+    row_children = np.array(row_children, dtype=np.int64)
+    # Children might have moved to another group between the queries
+    known = np.isin(row_children, children)
+    child_index = np.searchsorted(children, row_children)
+    scores = np.full((len(children), len(days)), np.nan)
+    scores[child_index[known], day_index[known]] = code_scores[code_index[known]]
+    return children, days, scores
+
+
+def rolling_mean(scores, window: int, min_reports: int = 1):
+    """
+    Mean of reported scores over the last `window` school days for every column,
+    NaN where fewer than `min_reports` were reported
+    """
+    reported = ~np.isnan(scores)
+    sums = np.cumsum(np.where(reported, scores, 0.0), axis=1)
+    counts = np.cumsum(reported, axis=1)
+    sums[:, window:] = sums[:, window:] - sums[:, :-window]
+    counts[:, window:] = counts[:, window:] - counts[:, :-window]
+    return _divide(sums, counts, counts >= min_reports)
+
+
+def get_trends(child_ids, rows, window: int = TRENDS_WINDOW) -> list:
+    """
+    Compute behaviour trend of every child
+
+    :return: Dicts with child's reports count, baseline, recent and previous rolling scores,
+             deviation of recent score from baseline and flags, most worrying children first.
+    """
+    children, days, scores = get_score_matrix(child_ids, rows)
+    min_reports = max(1, window // 2)
+    rolling = rolling_mean(scores, window, min_reports)
+    empty = np.full(len(children), np.nan)
+    recent = rolling[:, -1] if days.size else empty
+    previous = rolling[:, -window - 1] if days.size > window else empty
+
+    # Baseline is the history preceding the recent window
+    history = scores[:, :-window] if days.size > window else scores[:, :0]
+    reported = ~np.isnan(history)
+    counts = reported.sum(axis=1)
+    baseline = _divide(np.where(reported, history, 0.0).sum(axis=1), counts, counts >= min_reports)
+    squares = _divide(np.where(reported, history ** 2, 0.0).sum(axis=1), counts, counts >= min_reports)
+    deviation = np.maximum(np.sqrt(np.maximum(squares - baseline ** 2, 0.0)), MIN_DEVIATION)
+    zscores = (recent - baseline) / deviation
+
+    drift = np.nan_to_num(zscores, nan=0.0) >= DRIFT_THRESHOLD
+    concern = np.nan_to_num(recent, nan=0.0) >= CONCERN_SCORE
+    order = np.lexsort((children, -np.nan_to_num(zscores, nan=-np.inf), ~(drift | concern)))
+
+    reports = (~np.isnan(scores)).sum(axis=1)
+    return [
+        {
+            "child": int(children[index]),
+            "reports": int(reports[index]),
+            "baseline": _to_float(baseline[index]),
+            "previous": _to_float(previous[index]),
+            "recent": _to_float(recent[index]),
+            "zscore": _to_float(zscores[index]),
+            "flags": [flag for flag, flagged in (("drift", drift), ("concern", concern)) if flagged[index]],
+        }
+        for index in order
+    ]
+
+
+def get_group_trends(group_id: int, day, window: int = TRENDS_WINDOW) -> dict:
+    """
+    Return (cached) behaviour trends of group's children in the school year of given day up to the day before
+    """
+    key = f"schedules:trends:{group_id}:{day.isoformat()}:{window}"
+    if (trends := cache.get(key)) is not None:
+        return trends
+
+    start_day, _ = get_school_year_range(get_school_year(day))
+    end_day = day - timedelta(days=1)
+    child_ids = Child.objects.filter(group=group_id).values_list("id", flat=True)
+    rows = list(DayPlan.objects.fetch_group_behaviour(group_id, start_day, end_day))
+    trends = {
+        "group": group_id,
+        "day": day,
+        "window": window,
+        "results": get_trends(child_ids, rows, window),
+    }
+    cache.set(key, trends, timeout=TRENDS_CACHE_TIMEOUT)
+    return trends
+
+
+def _divide(numerator, denominator, where):
+    return np.divide(numerator, denominator, out=np.full(np.shape(numerator), np.nan), where=where)
+
+
+def _to_float(value):
+    return None if np.isnan(value) else round(float(value), 3)
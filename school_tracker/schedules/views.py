@@ -1,16 +1,49 @@
+from django.core import signing
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from rest_framework import (
     mixins,
     viewsets, 
     status
 )
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 
-from school_tracker.members.permissions import TeacherOrParentRelatedToChildPermission
-from school_tracker.schedules.models import DayPlan
+from drf_spectacular.utils import extend_schema
+
+from school_tracker.members.permissions import (
+    GroupTeacherPermission,
+    InstitutionManagerPermission,
+    TeacherOrParentRelatedToChildPermission
+)
+from school_tracker.accounts.models import CustomUser
+from school_tracker.chats.models import Message, ReadCursor
+from school_tracker.members.models import Child, Group
+from school_tracker.schedules import ical, trends
+from school_tracker.schedules.archive import open_archive
+from school_tracker.schedules.calendar import event_calendar
+from school_tracker.schedules.models import DayPlan, DayPlanStatistic, Event
+from school_tracker.schedules.pagination import DayPlanTimelinePagination
 from school_tracker.schedules.serializers import (
+    DashboardChildSerializer,
+    DayPlanArchiveSerializer,
+    DayPlanBulkSerializer,
     DayPlanCreateUpdateSerializer,
-    DayPlanSerializer
+    DayPlanGroupStatisticsSerializer,
+    DayPlanSerializer,
+    DayPlanStatisticsSerializer,
+    DayPlanTimelineSerializer,
+    DayPlanTrendsSerializer
 )
+from school_tracker.schedules.statistics import get_period_start
 from school_tracker.utils.dicttools import get_values_from_dict
 
 
@@ -19,14 +52,46 @@ class DayPlanViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.Retr
     serializer_class = DayPlanSerializer
     lookup_field = "child_id"
 
+    """
+    LIST -> dayplans of children related to user, newest first (?child=<id>)
+    GET -> dayplan of a child for a particular date
+    POST -> create dayplan of a child
+
+    Custom method:
+    BULK -> insert or update daily reports of a whole group (dayplan/bulk/)
+    TIMELINE -> child's dayplans newest first, paginated by cursor
+                (dayplan/child_id/timeline/?from=<YYYY-MM-DD>&to=<YYYY-MM-DD>&cursor=<cursor>)
+    STATISTICS -> weekly or monthly behaviour and meals distribution of a child
+                  (dayplan/child_id/statistics/?period=week|month&from=<YYYY-MM-DD>&to=<YYYY-MM-DD>)
+    GROUP_STATISTICS -> the same distribution summed over a group (dayplan/statistics/?group=<id>)
+    TRENDS -> behaviour trends of group's children with drift and concern flags (dayplan/trends/?group=<id>)
+    ARCHIVE -> child's dayplans and statistics of an archived school year, read from archive file
+               (dayplan/child_id/archive/?year=<YYYY>&period=week|month&from=<YYYY-MM-DD>&to=<YYYY-MM-DD>)
+    """
+
     serializer_map = {
         "create": DayPlanCreateUpdateSerializer,
-        "partial_update": DayPlanCreateUpdateSerializer
+        "partial_update": DayPlanCreateUpdateSerializer,
+        "bulk": DayPlanBulkSerializer,
+        "statistics": DayPlanStatisticsSerializer,
+        "group_statistics": DayPlanGroupStatisticsSerializer,
+        "archive": DayPlanArchiveSerializer,
+        "trends": DayPlanTrendsSerializer,
+    }
+
+    permission_map = {
+        "bulk": [GroupTeacherPermission],
+        "group_statistics": [InstitutionManagerPermission | GroupTeacherPermission],
+        "trends": [InstitutionManagerPermission | GroupTeacherPermission],
     }
 
     _dayplan_creation_keys = ["meals_at_school", "behaviour", "summary"]
 
 
+    def get_permissions(self):
+        permission_classes = self.permission_map.get(self.action, self.permission_classes)
+        return [permission() for permission in permission_classes]
+
     def get_serializer_class(self, *args, **kwargs):
         return self.serializer_map.get(self.action, self.serializer_class)
 
@@ -36,8 +101,13 @@ class DayPlanViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.Retr
         return context
 
     def get_queryset(self):
-        child_id = self.kwargs.get("child_id")
-        return DayPlan.objects.fetch_by_child_id(child_id)
+        if child_id := self.kwargs.get("child_id"):
+            return DayPlan.objects.fetch_by_child_id(child_id).select_related("child")
+
+        queryset = DayPlan.objects.fetch_related_to_user(self.request.user).select_related("child")
+        if child_id := self.request.query_params.get("child"):
+            queryset = queryset.filter(child=child_id)
+        return queryset.order_by("-day", "child")
 
     def retrieve(self, request, *args, **kwargs):
         date = kwargs.get('date')
@@ -53,3 +123,214 @@ class DayPlanViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.Retr
         data = get_values_from_dict(serializer.validated_data, self._dayplan_creation_keys)
         data["child"] = self.kwargs.get("child_id")
         serializer.save()
+
+    @extend_schema(description="Method POST to insert or update daily reports of group's children "
+                               "for a day (today by default), fields missing from a report are kept")
+    @action(methods=["post"], detail=False, url_path="bulk")
+    def bulk(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        group = serializer.validated_data["group"]
+        self.check_object_permissions(request, group)
+
+        day = serializer.validated_data["day"]
+        saved = DayPlan.objects.upsert_reports(day, serializer.validated_data["reports"])
+        return Response({"group": group.id, "day": day, "saved": saved})
+
+    @extend_schema(description="Method GET to walk child's dayplans newest first within optional "
+                               "`from`/`to` days, paginated by `cursor`")
+    @action(methods=["get"], detail=True, url_path="timeline")
+    def timeline(self, request, *args, **kwargs):
+        child = get_object_or_404(Child, id=self.kwargs.get("child_id"))
+        self.check_object_permissions(request, child)
+
+        params = DayPlanTimelineSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        dayplans = DayPlan.objects.fetch_timeline(
+            child.id, params.validated_data.get("from"), params.validated_data.get("to")
+        ).select_related("child")
+
+        paginator = DayPlanTimelinePagination()
+        page = paginator.paginate_queryset(dayplans, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @extend_schema(description="Method GET to read child's weekly or monthly behaviour and meals "
+                               "distribution (?period=week|month, optional `from`/`to` days)")
+    @action(methods=["get"], detail=True, url_path="statistics")
+    def statistics(self, request, *args, **kwargs):
+        child = get_object_or_404(Child, id=self.kwargs.get("child_id"))
+        self.check_object_permissions(request, child)
+
+        params = self.get_serializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        period, start_day, end_day = self._get_statistics_range(params.validated_data)
+        rows = DayPlanStatistic.objects.fetch_for_child(child.id, period, start_day, end_day)
+        return Response({"child": child.id, "period": period, "results": self._group_statistics(rows)})
+
+    @extend_schema(description="Method GET to read weekly or monthly behaviour and meals distribution "
+                               "of group's children (?group=<id>&period=week|month, optional `from`/`to` days)")
+    @action(methods=["get"], detail=False, url_path="statistics", url_name="group-statistics")
+    def group_statistics(self, request, *args, **kwargs):
+        params = self.get_serializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        group = params.validated_data["group"]
+        self.check_object_permissions(request, group)
+
+        period, start_day, end_day = self._get_statistics_range(params.validated_data)
+        rows = DayPlanStatistic.objects.fetch_for_group(group.id, period, start_day, end_day)
+        return Response({"group": group.id, "period": period, "results": self._group_statistics(rows)})
+
+    @extend_schema(description="Method GET to read rolling behaviour scores of group's children in the current "
+                               "school year with children drifting towards worse behaviour flagged "
+                               "(?group=<id>&window=<school days>), refreshed daily")
+    @action(methods=["get"], detail=False, url_path="trends")
+    def trends(self, request, *args, **kwargs):
+        params = self.get_serializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        group = params.validated_data["group"]
+        self.check_object_permissions(request, group)
+
+        return Response(trends.get_group_trends(group.id, timezone.localdate(), params.validated_data["window"]))
+
+    @extend_schema(description="Method GET to read child's dayplans and statistics of a closed school year "
+                               "(?year=<year it starts in>&period=week|month, optional `from`/`to` days)")
+    @action(methods=["get"], detail=True, url_path="archive")
+    def archive(self, request, *args, **kwargs):
+        child = get_object_or_404(Child, id=self.kwargs.get("child_id"))
+        self.check_object_permissions(request, child)
+
+        params = self.get_serializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        year = params.validated_data["year"]
+        if (reader := open_archive(year)) is None:
+            raise NotFound(f"School year {year}/{year + 1} is not archived.")
+
+        period, start_day, end_day = self._get_statistics_range(params.validated_data)
+        rows = [
+            row for row in reader.statistics(child.id, period)
+            if (start_day is None or row["period_start"] >= start_day)
+            and (end_day is None or row["period_start"] <= end_day)
+        ]
+        return Response({
+            "child": child.id,
+            "year": year,
+            "period": period,
+            "dayplans": reader.timeline(child.id, params.validated_data.get("from"), end_day),
+            "statistics": self._group_statistics(rows),
+        })
+
+    @staticmethod
+    def _get_statistics_range(params):
+        period = params["period"]
+        start_day = get_period_start(params["from"], period) if "from" in params else None
+        return period, start_day, params.get("to")
+
+    @staticmethod
+    def _group_statistics(rows):
+        periods = {}
+        for row in rows:
+            period = periods.setdefault(row["period_start"], {"period_start": row["period_start"]})
+            period.setdefault(row["field"], {})[row["value"]] = row["total"]
+        return list(periods.values())
+
+
+class EventFeedViewSet(viewsets.GenericViewSet):
+    """
+    Custom method:
+    FEED_URL -> address of user's personal iCalendar feed (event/feed-url/)
+    FEED -> iCalendar feed of institution-wide events and events of user's groups
+            (event/feed/<token>/), token in the address lets calendar apps poll it
+            without logging in, answers 304 for unchanged feed
+    """
+    permission_classes = [IsAuthenticated]
+
+    permission_map = {
+        "feed": [AllowAny],
+    }
+
+    def get_permissions(self):
+        permission_classes = self.permission_map.get(self.action, self.permission_classes)
+        return [permission() for permission in permission_classes]
+
+    @extend_schema(description="Method GET to get address of user's iCalendar feed")
+    @action(methods=["get"], detail=False, url_path="feed-url")
+    def feed_url(self, request, *args, **kwargs):
+        path = reverse("events-feed", kwargs={"token": ical.make_feed_token(request.user.id)})
+        return Response({"url": request.build_absolute_uri(path)})
+
+    @extend_schema(description="Method GET to fetch iCalendar feed, supports `If-None-Match` "
+                               "(deleted events do not move any date, so `If-Modified-Since` is not used)")
+    @action(methods=["get"], detail=False, url_path=r"feed/(?P<token>[^/]+)")
+    def feed(self, request, token=None, *args, **kwargs):
+        try:
+            user_id = ical.read_feed_token(token)
+        except signing.BadSignature:
+            raise NotFound("Feed not found.")
+        user = CustomUser.objects.filter(id=user_id, is_active=True).first()
+        if user is None:
+            raise NotFound("Feed not found.")
+
+        group_ids = Group.objects.fetch_ids_related_to_user(user)
+        audience_key = ical.get_audience_key(group_ids)
+        version = ical.get_events_version()
+        etag = quote_etag(f"{audience_key[:16]}-{version}")
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            content = cache.get(ical.get_feed_cache_key(audience_key, version))
+            if content is not None:
+                response = HttpResponse(content)
+            else:
+                events = Event.objects.fetch_for_groups(group_ids)
+                response = StreamingHttpResponse(ical.iter_cached_feed(events, audience_key, version))
+            response["Content-Type"] = "text/calendar; charset=utf-8"
+
+        response["ETag"] = etag
+        response["Cache-Control"] = "private, no-cache"
+        return response
+
+
+class DashboardViewSet(viewsets.GenericViewSet):
+    """
+    LIST -> today's summary of every child of user: child details, dayplan,
+            events, the newest chat message and unread messages counter (dashboard/)
+    """
+    permission_classes = [TeacherOrParentRelatedToChildPermission]
+    serializer_class = DashboardChildSerializer
+
+    def get_queryset(self):
+        return Child.objects.fetch_related_to_user(self.request.user).select_related("group").prefetch_related(
+            Prefetch(
+                "dayplans",
+                queryset=DayPlan.objects.filter(day=self.today),
+                to_attr="today_dayplans",
+            )
+        ).order_by("first_name", "last_name", "id")
+
+    @extend_schema(description="Method GET to fetch today's summary of every child of user "
+                               "with a fixed number of queries")
+    def list(self, request, *args, **kwargs):
+        self.today = timezone.localdate()
+        children = list(self.get_queryset())
+        children_by_id = {child.id: child for child in children}
+
+        event_calendar.prefetch(self.today, self.today)
+        latest_messages = {}
+        if children:
+            messages = Message.objects.filter(child__in=children_by_id).latest_per_child().select_related("sender")
+            for message in messages:
+                message.child = children_by_id[message.child_id]
+                latest_messages[message.child_id] = message
+        unread_counts = {
+            badge["child"]: badge["unread_count"]
+            for badge in ReadCursor.objects.fetch_badges(request.user.id).filter(child__in=children_by_id)
+        } if children else {}
+
+        serializer = self.get_serializer(children, many=True, context={
+            **self.get_serializer_context(),
+            "day": self.today,
+            "latest_messages": latest_messages,
+            "unread_counts": unread_counts,
+        })
+        return Response(serializer.data)
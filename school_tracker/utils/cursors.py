@@ -0,0 +1,51 @@
+import base64
+import json
+
+
+def encode_cursor(*values) -> str:
+    """
+    Encode position values into an opaque, url-safe cursor.
+
+    :param values: JSON serializable values describing position (e.g. timestamp, id).
+    :return: Cursor string safe to pass in query params.
+    """
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """
+    Decode cursor created with encode_cursor.
+
+    :param cursor: Cursor string received from client.
+    :param size: Expected number of values stored in cursor.
+    :return: A list of decoded values.
+    :raises ValueError: When cursor is malformed.
+    """
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(cursor + padding))
+    except (TypeError, ValueError) as error:
+        raise ValueError("Invalid cursor") from error
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+
+class CursorPageSizeMixin:
+    """
+    Page size of cursor paginations: ?page_size=<n> capped at max_page_size,
+    default page_size when missing or invalid
+    """
+    page_size = None
+    max_page_size = None
+    page_size_query_param = "page_size"
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
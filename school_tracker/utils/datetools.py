@@ -0,0 +1,30 @@
+from datetime import date, datetime, time, timedelta
+
+from django.utils import timezone
+
+
+def get_day_start(day: date, tz=None) -> datetime:
+    """
+    Return aware datetime of midnight starting given day.
+
+    :param day: Calendar day.
+    :param tz: Timezone of the day, institution's (current) timezone by default.
+    :return: Aware datetime.
+    """
+    return timezone.make_aware(datetime.combine(day, time.min), tz or timezone.get_current_timezone())
+
+
+def get_day_range(start_day: date, end_day: date = None, tz=None) -> tuple:
+    """
+    Return half-open [start, end) datetime range covering calendar days.
+
+    Filtering with timestamp__gte/timestamp__lt on the range keeps the column
+    untouched, so the query can use an index (unlike timestamp__date).
+
+    :param start_day: First day of the range.
+    :param end_day: Last day of the range (inclusive), same as start_day by default.
+    :param tz: Timezone of the days, institution's (current) timezone by default.
+    :return: A tuple of aware datetimes.
+    """
+    end_day = end_day or start_day
+    return get_day_start(start_day, tz), get_day_start(end_day + timedelta(days=1), tz)
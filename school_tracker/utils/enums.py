@@ -43,3 +43,18 @@ class MealStatusEnum(models.TextChoices):
     important_note = auto()
 
 
+class StatisticPeriodEnum(models.TextChoices):
+    """
+    Periods summarized in dayplan statistics
+    """
+    week = auto()
+    month = auto()
+
+
+class InvitationStatusEnum(models.TextChoices):
+    """
+    Delivery status of parent invitation
+    """
+    pending = auto()
+    sent = auto()
+    failed = auto()
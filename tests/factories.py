@@ -11,6 +11,7 @@ from school_tracker.members.models import (
     Group,
     Teacher
 )
+from school_tracker.schedules.models import DayPlan, Event
 from school_tracker.utils.enums import UserTypeEnum
 
 
@@ -83,4 +84,19 @@ class MessageFactory(DjangoModelFactory):
     sender = factory.SubFactory(CustomUserFactory)
     child = factory.SubFactory(ChildFactory)
     message_text = factory.Faker('text')
-    timestamp = factory.Faker('date')
\ No newline at end of file
+    timestamp = factory.Faker('date')
+
+class EventFactory(DjangoModelFactory):
+    class Meta:
+        model = Event
+
+    title = factory.Faker("sentence", nb_words=3)
+    description = factory.Faker("text")
+    date = factory.Faker("date_object")
+
+
+class DayPlanFactory(DjangoModelFactory):
+    class Meta:
+        model = DayPlan
+
+    child = factory.SubFactory(ChildFactory)
@@ -0,0 +1,591 @@
+import csv
+import json
+from datetime import date, datetime, timezone as dt_timezone
+from unittest import skipUnless
+from unittest.mock import patch
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import AnonymousUser
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from school_tracker.accounts.models import CustomUser
+from school_tracker.chats import partitions
+from school_tracker.chats.models import Message, ReadCursor
+from school_tracker.chats.notifications import user_group_name
+from school_tracker.chats.routing import websocket_urlpatterns
+from school_tracker.chats.views import MessageViewSet
+from school_tracker.utils.enums import UserTypeEnum
+from tests.factories import (
+    AssignedTeacher,
+    CustomUserFactory,
+    ParentFactory,
+    ChildFactory,
+    GroupFactory,
+    MessageFactory,
+    TeacherFactory
+)
+
+
+class TestMessageCursorPagination(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.parent = ParentFactory()
+        cls.group = GroupFactory()
+        cls.child = ChildFactory(parents=[cls.parent], group=cls.group)
+        cls.other_child = ChildFactory(parents=[cls.parent], group=cls.group)
+        cls.messages = [MessageFactory(sender=cls.parent.user, child=cls.child) for _ in range(7)]
+        MessageFactory(sender=cls.parent.user, child=cls.other_child)
+        cls.url = reverse('messages-list')
+
+    def _ids(self, response):
+        return [message["id"] for message in response.data["results"]]
+
+    def test_first_page_returns_newest_messages(self):
+        # when:
+        self.client.force_authenticate(self.parent.user)
+        response = self.client.get(self.url, {"child": self.child.id, "page_size": 3})
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._ids(response), [message.id for message in self.messages[:-4:-1]])
+        self.assertIsNotNone(response.data["older"])
+        self.assertIsNone(response.data["newer"])
+
+    def test_walk_older_pages_until_history_ends(self):
+        # when:
+        self.client.force_authenticate(self.parent.user)
+        url, collected = f"{self.url}?child={self.child.id}&page_size=3", []
+        while url:
+            response = self.client.get(url)
+            collected += self._ids(response)
+            url = response.data["older"]
+        # then:
+        self.assertEqual(collected, [message.id for message in reversed(self.messages)])
+
+    def test_newer_page_follows_cursor(self):
+        # when:
+        self.client.force_authenticate(self.parent.user)
+        first_page = self.client.get(self.url, {"child": self.child.id, "page_size": 3})
+        older_page = self.client.get(first_page.data["older"])
+        newer_page = self.client.get(older_page.data["newer"])
+        # then:
+        self.assertEqual(self._ids(newer_page), self._ids(first_page))
+
+    def test_page_around_message(self):
+        # when:
+        self.client.force_authenticate(self.parent.user)
+        anchor = self.messages[3]
+        response = self.client.get(self.url, {"child": self.child.id, "page_size": 3, "around": anchor.id})
+        # then:
+        self.assertEqual(self._ids(response), [self.messages[4].id, anchor.id, self.messages[2].id])
+        self.assertIsNotNone(response.data["older"])
+        self.assertIsNotNone(response.data["newer"])
+
+    def test_duplicate_teacher_assignment_does_not_repeat_messages(self):
+        # given:
+        teacher = TeacherFactory()
+        AssignedTeacher(teacher=teacher, group=self.group)
+        AssignedTeacher(teacher=teacher, group=self.group)
+        anchor = self.messages[3]
+        self.client.force_authenticate(teacher.user)
+        # when:
+        page = self.client.get(self.url, {"child": self.child.id, "page_size": 3})
+        around = self.client.get(self.url, {"child": self.child.id, "page_size": 3, "around": anchor.id})
+        # then:
+        self.assertEqual(self._ids(page), [message.id for message in self.messages[:-4:-1]])
+        self.assertEqual(self._ids(around), [self.messages[4].id, anchor.id, self.messages[2].id])
+
+    def test_invalid_cursor(self):
+        # when:
+        self.client.force_authenticate(self.parent.user)
+        response = self.client.get(self.url, {"before": "not-a-cursor"})
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestMessageRealTimeDelivery(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.parent = ParentFactory()
+        cls.other_parent = ParentFactory()
+        cls.group = GroupFactory()
+        cls.child = ChildFactory(parents=[cls.parent], group=cls.group)
+        cls.teacher = TeacherFactory()
+        cls.unrelated_teacher = TeacherFactory()
+        cls.assigned_teacher = AssignedTeacher(teacher=cls.teacher, group=cls.group)
+
+    def _subscribe(self, user):
+        channel_layer = get_channel_layer()
+        channel_name = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(user_group_name(user.id), channel_name)
+        self.addCleanup(async_to_sync(channel_layer.group_discard), user_group_name(user.id), channel_name)
+        return channel_name
+
+    def test_created_message_is_pushed_to_child_audience(self):
+        # when:
+        channel_layer = get_channel_layer()
+        teacher_channel = self._subscribe(self.teacher.user)
+        parent_channel = self._subscribe(self.parent.user)
+        self.client.force_authenticate(self.parent.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('messages-list'), {
+                'sender': self.parent.user.id,
+                'child': self.child.id,
+                'message_text': "Pick up at 3pm"
+            })
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        for channel_name in (teacher_channel, parent_channel):
+            event = async_to_sync(channel_layer.receive)(channel_name)
+            self.assertEqual(event["type"], "chat.message")
+            self.assertEqual(event["message"]["id"], response.data["id"])
+            self.assertEqual(event["message"]["message_text"], "Pick up at 3pm")
+
+    def test_audience_excludes_unrelated_users(self):
+        # when:
+        audience = set(CustomUser.objects.fetch_child_audience(self.child.id))
+        # then:
+        self.assertEqual(audience, {self.parent.user.id, self.teacher.user.id})
+
+    async def test_socket_receives_pushed_message(self):
+        # when:
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), "/ws/chat/")
+        communicator.scope["user"] = self.teacher.user
+        connected, _ = await communicator.connect()
+        await get_channel_layer().group_send(
+            user_group_name(self.teacher.user.id),
+            {"type": "chat.message", "message": {"message_text": "Hello"}},
+        )
+        # then:
+        self.assertTrue(connected)
+        self.assertEqual(await communicator.receive_json_from(), {"message_text": "Hello"})
+        await communicator.disconnect()
+
+    async def test_anonymous_socket_is_rejected(self):
+        # when:
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), "/ws/chat/")
+        communicator.scope["user"] = AnonymousUser()
+        connected, _ = await communicator.connect()
+        # then:
+        self.assertFalse(connected)
+
+
+class TestMessageSync(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.parent = ParentFactory()
+        cls.unrelated_parent = ParentFactory()
+        cls.group = GroupFactory()
+        cls.child = ChildFactory(parents=[cls.parent], group=cls.group)
+        cls.messages = [MessageFactory(sender=cls.parent.user, child=cls.child) for _ in range(3)]
+        cls.url = reverse('messages-sync', args=[cls.child.id])
+
+    def test_initial_sync_returns_whole_history(self):
+        # when:
+        self.client.force_authenticate(self.parent.user)
+        response = self.client.get(self.url)
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([message["id"] for message in response.data["results"]], [m.id for m in self.messages])
+        self.assertFalse(response.data["has_more"])
+        self.assertIn("ETag", response)
+
+    def test_sync_returns_only_delta(self):
+        # when:
+        self.client.force_authenticate(self.parent.user)
+        cursor = self.client.get(self.url).data["cursor"]
+        new_message = MessageFactory(sender=self.parent.user, child=self.child)
+        response = self.client.get(self.url, {"since": cursor})
+        # then:
+        self.assertEqual([message["id"] for message in response.data["results"]], [new_message.id])
+
+    def test_unchanged_chat_answers_not_modified(self):
+        # when:
+        self.client.force_authenticate(self.parent.user)
+        etag = self.client.get(self.url)["ETag"]
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_new_message_changes_etag(self):
+        # when:
+        self.client.force_authenticate(self.parent.user)
+        etag = self.client.get(self.url)["ETag"]
+        MessageFactory(sender=self.parent.user, child=self.child)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_truncated_page_has_no_etag(self):
+        # given:
+        self.client.force_authenticate(self.parent.user)
+        with patch.object(MessageViewSet, "sync_page_size", 2):
+            # when:
+            first = self.client.get(self.url)
+            last = self.client.get(self.url, {"since": first.data["cursor"]})
+        # then:
+        self.assertTrue(first.data["has_more"])
+        self.assertNotIn("ETag", first)
+        self.assertFalse(last.data["has_more"])
+        self.assertEqual([message["id"] for message in last.data["results"]], [self.messages[-1].id])
+        self.assertIn("ETag", last)
+
+    def test_unrelated_parent_cannot_sync(self):
+        # when:
+        self.client.force_authenticate(self.unrelated_parent.user)
+        response = self.client.get(self.url)
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestMessageDayLookups(TestCase):
+
+    def setUp(self):
+        self.message = MessageFactory()
+        # 23:30 UTC on 1st of March is already 2nd of March in Warsaw
+        Message.objects.filter(id=self.message.id).update(
+            timestamp=datetime(2024, 3, 1, 23, 30, tzinfo=dt_timezone.utc)
+        )
+
+    def test_fetch_by_date_uses_institution_timezone(self):
+        # when:
+        with timezone.override("Europe/Warsaw"):
+            on_first = Message.objects.fetch_by_date(self.message.child_id, date(2024, 3, 1))
+            on_second = Message.objects.fetch_by_date(self.message.child_id, date(2024, 3, 2))
+        # then:
+        self.assertFalse(on_first.exists())
+        self.assertEqual(list(on_second), [self.message])
+
+    def test_fetch_by_date_in_utc(self):
+        # when:
+        on_first = Message.objects.fetch_by_date(self.message.child_id, date(2024, 3, 1))
+        # then:
+        self.assertEqual(list(on_first), [self.message])
+
+
+class TestUnreadCounters(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.parent = ParentFactory()
+        cls.group = GroupFactory()
+        cls.child = ChildFactory(parents=[cls.parent], group=cls.group)
+        cls.teacher = TeacherFactory()
+        cls.assigned_teacher = AssignedTeacher(teacher=cls.teacher, group=cls.group)
+
+    def _send(self, user, text="Hello"):
+        self.client.force_authenticate(user)
+        response = self.client.post(reverse('messages-list'), {
+            'sender': user.id, 'child': self.child.id, 'message_text': text
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["id"]
+
+    def _badges(self, user):
+        self.client.force_authenticate(user)
+        return {badge["child"]: badge["unread_count"] for badge in self.client.get(reverse('messages-unread')).data}
+
+    def test_new_messages_increment_audience_counters(self):
+        # when:
+        self._send(self.teacher.user)
+        self._send(self.teacher.user)
+        # then:
+        self.assertEqual(self._badges(self.parent.user), {self.child.id: 2})
+        self.assertEqual(self._badges(self.teacher.user), {self.child.id: 0})
+
+    def test_badges_cost_single_query(self):
+        # when:
+        self._send(self.teacher.user)
+        self.client.force_authenticate(self.parent.user)
+        # then:
+        with self.assertNumQueries(1):
+            self.client.get(reverse('messages-unread'))
+
+    def test_reading_resets_counter(self):
+        # when:
+        self._send(self.teacher.user)
+        self._send(self.teacher.user)
+        self.client.force_authenticate(self.parent.user)
+        response = self.client.post(reverse('messages-mark-read', args=[self.child.id]))
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["unread_count"], 0)
+        self.assertEqual(self._badges(self.parent.user), {self.child.id: 0})
+
+    def test_reading_up_to_message_keeps_newer_unread(self):
+        # when:
+        first_id = self._send(self.teacher.user)
+        self._send(self.teacher.user)
+        self._send(self.teacher.user)
+        self.client.force_authenticate(self.parent.user)
+        response = self.client.post(reverse('messages-mark-read', args=[self.child.id]), {"message": first_id})
+        # then:
+        self.assertEqual(response.data["unread_count"], 2)
+        self.assertEqual(response.data["last_read_message_id"], first_id)
+
+    def test_read_cursor_does_not_move_back(self):
+        # when:
+        first_id = self._send(self.teacher.user)
+        self._send(self.teacher.user)
+        self.client.force_authenticate(self.parent.user)
+        self.client.post(reverse('messages-mark-read', args=[self.child.id]))
+        response = self.client.post(reverse('messages-mark-read', args=[self.child.id]), {"message": first_id})
+        # then:
+        self.assertEqual(response.data["unread_count"], 0)
+        self.assertNotEqual(response.data["last_read_message_id"], first_id)
+
+
+class TestGroupBroadcast(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = GroupFactory()
+        cls.other_group = GroupFactory()
+        cls.parents = [ParentFactory() for _ in range(3)]
+        cls.children = [ChildFactory(parents=[parent], group=cls.group) for parent in cls.parents]
+        cls.other_child = ChildFactory(group=cls.other_group)
+        cls.teacher = TeacherFactory()
+        cls.unrelated_teacher = TeacherFactory()
+        cls.assigned_teacher = AssignedTeacher(teacher=cls.teacher, group=cls.group)
+        cls.url = reverse('messages-broadcast')
+
+    def test_teacher_broadcasts_to_every_child_of_group(self):
+        # when:
+        self.client.force_authenticate(self.teacher.user)
+        response = self.client.post(self.url, {"group": self.group.id, "message_text": "Trip tomorrow"})
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["messages_created"], 3)
+        self.assertEqual(
+            set(Message.objects.filter(message_text="Trip tomorrow").values_list("child_id", flat=True)),
+            {child.id for child in self.children},
+        )
+        self.assertFalse(Message.objects.filter(child=self.other_child).exists())
+
+    def test_broadcast_updates_unread_counters(self):
+        # when:
+        self.client.force_authenticate(self.teacher.user)
+        self.client.post(self.url, {"group": self.group.id, "message_text": "Trip tomorrow"})
+        # then:
+        for parent, child in zip(self.parents, self.children):
+            self.assertEqual(
+                list(ReadCursor.objects.fetch_badges(parent.user.id)),
+                [{"child": child.id, "unread_count": 1}],
+            )
+        self.assertFalse(ReadCursor.objects.filter(user=self.teacher.user, unread_count__gt=0).exists())
+
+    def test_broadcast_query_count_does_not_depend_on_group_size(self):
+        # given:
+        big_group = GroupFactory()
+        for _ in range(12):
+            ChildFactory(parents=[ParentFactory()], group=big_group)
+        AssignedTeacher(teacher=self.teacher, group=big_group)
+        self.client.force_authenticate(self.teacher.user)
+        queries = []
+        for group, size in ((self.group, 3), (big_group, 12)):
+            # when:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(self.url, {"group": group.id, "message_text": "Trip tomorrow"})
+            queries.append(len(context.captured_queries))
+            # then:
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertEqual(response.data["messages_created"], size)
+        self.assertEqual(queries[0], queries[1])
+
+    def test_unrelated_teacher_cannot_broadcast(self):
+        # when:
+        self.client.force_authenticate(self.unrelated_teacher.user)
+        response = self.client.post(self.url, {"group": self.group.id, "message_text": "Trip tomorrow"})
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_parent_cannot_broadcast(self):
+        # when:
+        self.client.force_authenticate(self.parents[0].user)
+        response = self.client.post(self.url, {"group": self.group.id, "message_text": "Trip tomorrow"})
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestMessageSearch(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.parent = ParentFactory()
+        cls.other_parent = ParentFactory()
+        cls.group = GroupFactory()
+        cls.child = ChildFactory(parents=[cls.parent], group=cls.group)
+        cls.other_child = ChildFactory(parents=[cls.other_parent], group=cls.group)
+        cls.swimming = MessageFactory(sender=cls.parent.user, child=cls.child, message_text="Swimming lesson moved")
+        MessageFactory(sender=cls.parent.user, child=cls.child, message_text="Lunch was great")
+        MessageFactory(sender=cls.other_parent.user, child=cls.other_child, message_text="Swimming cap forgotten")
+        cls.url = reverse('messages-search')
+
+    def test_search_is_scoped_to_visible_chats(self):
+        # when:
+        self.client.force_authenticate(self.parent.user)
+        response = self.client.get(self.url, {"q": "swimming"})
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(response.data["results"][0]["id"], self.swimming.id)
+
+    def test_search_requires_text(self):
+        # when:
+        self.client.force_authenticate(self.parent.user)
+        response = self.client.get(self.url, {"q": " "})
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_anonymous_user_cannot_search(self):
+        # when:
+        response = self.client.get(self.url, {"q": "swimming"})
+        # then:
+        self.assertIn(response.status_code, (status.HTTP_401_UNAUTHORIZED, status.HTTP_403_FORBIDDEN))
+
+
+class TestMessageInbox(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = GroupFactory()
+        cls.teacher = TeacherFactory()
+        cls.assigned_teacher = AssignedTeacher(teacher=cls.teacher, group=cls.group)
+        cls.children = [ChildFactory(group=cls.group) for _ in range(3)]
+        cls.latest = {}
+        for hour, child in enumerate(cls.children):
+            for minute in range(3):
+                message = MessageFactory(sender=cls.teacher.user, child=child)
+                Message.objects.filter(id=message.id).update(
+                    timestamp=datetime(2024, 3, 1, 8 + hour, minute, tzinfo=dt_timezone.utc)
+                )
+                cls.latest[child.id] = message.id
+        MessageFactory()
+        cls.url = reverse('messages-inbox')
+
+    def test_inbox_lists_newest_message_per_child(self):
+        # when:
+        self.client.force_authenticate(self.teacher.user)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [(entry["child"], entry["id"]) for entry in response.data],
+            [(child.id, self.latest[child.id]) for child in reversed(self.children)],
+        )
+        self.assertEqual(response.data[0]["sender_name"], self.teacher.user.full_name)
+
+    def test_parent_inbox_contains_own_children_only(self):
+        # given:
+        parent = ParentFactory()
+        self.children[0].parents.add(parent)
+        # when:
+        self.client.force_authenticate(parent.user)
+        response = self.client.get(self.url)
+        # then:
+        self.assertEqual([entry["id"] for entry in response.data], [self.latest[self.children[0].id]])
+
+
+class TestMessageExport(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.manager = CustomUserFactory(user_type=UserTypeEnum.manager)
+        cls.parent = ParentFactory()
+        cls.child = ChildFactory(parents=[cls.parent])
+        cls.first = MessageFactory(sender=cls.parent.user, child=cls.child, message_text="First, with comma")
+        cls.second = MessageFactory(child=cls.child, message_text="Second")
+        cls.other = MessageFactory(message_text="Other child")
+        Message.objects.filter(id=cls.first.id).update(timestamp=datetime(2024, 3, 1, 8, tzinfo=dt_timezone.utc))
+        Message.objects.filter(id=cls.second.id).update(timestamp=datetime(2024, 3, 2, 8, tzinfo=dt_timezone.utc))
+        Message.objects.filter(id=cls.other.id).update(timestamp=datetime(2024, 3, 1, 9, tzinfo=dt_timezone.utc))
+        cls.url = reverse('messages-export')
+
+    def _export(self, **params):
+        self.client.force_authenticate(self.manager)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_ndjson_export_streams_all_messages_oldest_first(self):
+        # when:
+        rows = [json.loads(line) for line in self._export().splitlines()]
+        # then:
+        self.assertEqual([row["id"] for row in rows], [self.first.id, self.other.id, self.second.id])
+        self.assertEqual(rows[0]["sender_first_name"], self.parent.user.first_name)
+
+    def test_csv_export_with_filters(self):
+        # when:
+        content = self._export(output="csv", child=self.child.id, since="2024-03-01", until="2024-03-01")
+        rows = list(csv.reader(content.splitlines()))
+        # then:
+        self.assertEqual(rows[0][0], "id")
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], str(self.first.id))
+        self.assertEqual(rows[1][-1], "First, with comma")
+
+    def test_export_is_available_to_managers_only(self):
+        # when:
+        self.client.force_authenticate(self.parent.user)
+        response = self.client.get(self.url)
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestMessagePartitions(TestCase):
+
+    def test_month_helpers(self):
+        # then:
+        self.assertEqual(partitions.add_months(date(2024, 11, 1), 3), date(2025, 2, 1))
+        self.assertEqual(partitions.partition_name(date(2024, 3, 1)), "chats_message_p2024_03")
+        self.assertEqual(partitions.partition_month("chats_message_p2024_03"), date(2024, 3, 1))
+        self.assertIsNone(partitions.partition_month(partitions.DEFAULT_PARTITION))
+
+    @skipUnless(connection.vendor == "postgresql", "Partitioning requires PostgreSQL")
+    def test_convert_keeps_messages_and_accepts_new_ones(self):
+        # given:
+        old_message = MessageFactory(message_text="Before partitioning")
+        Message.objects.filter(id=old_message.id).update(
+            timestamp=datetime(2024, 3, 5, tzinfo=dt_timezone.utc)
+        )
+        # when:
+        created = partitions.convert_to_partitioned(months_ahead=1, today=date(2024, 5, 10))
+        new_message = MessageFactory(child=old_message.child, message_text="After partitioning")
+        # then:
+        self.assertTrue(partitions.is_partitioned())
+        self.assertEqual(created[0], "chats_message_p2024_03")
+        self.assertGreater(new_message.id, old_message.id)
+        self.assertEqual(
+            list(Message.objects.fetch_by_child_id(old_message.child_id)),
+            [new_message, Message.objects.get(id=old_message.id)],
+        )
+        self.assertEqual(Message.objects.search("partitioning").count(), 2)
+        # when:
+        detached = partitions.detach_partitions(date(2024, 4, 1), drop=True)
+        # then:
+        self.assertEqual(detached, ["chats_message_p2024_03"])
+        self.assertFalse(Message.objects.filter(id=old_message.id).exists())
@@ -1,4 +1,16 @@
-from django.test import TestCase
+import os
+import tempfile
+from io import StringIO
+from unittest.mock import patch
+
+from django.core import mail
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
@@ -6,6 +18,9 @@ from rest_framework import status
 from school_tracker.utils.enums import UserTypeEnum
 from school_tracker.accounts.models import CustomUser
 from school_tracker.chats.models import Message
+from school_tracker.members.invitations import INVITATION_MAX_ATTEMPTS, send_pending_invitations
+from school_tracker.members.models import Child, Group, Parent, ParentInvitation
+from school_tracker.utils.enums import InvitationStatusEnum
 from tests.factories import (
     AssignedTeacher,
     CustomUserFactory, 
@@ -145,6 +160,66 @@ class TestMemberViewPermissions(APITestCase):
         # then:
         self.assertEqual(response.status_code, status.HTTP_200_OK)
       
+class TestMemberDirectory(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.teacher = TeacherFactory()
+        cls.groups = [GroupFactory(group_name=f"Group {index}") for index in range(3)]
+        cls.shared_parent = ParentFactory()
+        for size, group in enumerate(cls.groups, start=1):
+            AssignedTeacher(teacher=TeacherFactory(), group=group)
+            for _ in range(size * 3):
+                ChildFactory(group=group, parents=[ParentFactory(), cls.shared_parent])
+        cls.url = reverse('members-list')
+
+    def test_directory_covers_every_group_with_fixed_queries(self):
+        # given:
+        self.client.force_authenticate(self.teacher.user)
+        # when:
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+        groups = response.data["results"]
+        self.assertEqual([group["group_name"] for group in groups], ["Group 0", "Group 1", "Group 2"])
+        self.assertEqual([len(group["children"]) for group in groups], [3, 6, 9])
+        self.assertEqual([len(group["parents"]) for group in groups], [4, 7, 10])
+        self.assertEqual(len(groups[0]["teachers"]), 1)
+
+    def test_directory_is_paginated_by_group(self):
+        # given:
+        self.client.force_authenticate(self.teacher.user)
+        # when:
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url, {"page_size": 2, "page": 2})
+        # then:
+        self.assertEqual([group["group_name"] for group in response.data["results"]], ["Group 2"])
+        self.assertIsNone(response.data["next"])
+
+    def test_manager_can_see_directory(self):
+        # given:
+        self.client.force_authenticate(CustomUserFactory(user_type=UserTypeEnum.manager))
+        # when:
+        response = self.client.get(self.url)
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("email", response.data["results"][0]["parents"][0])
+
+    def test_parent_does_not_see_emails(self):
+        # given:
+        self.client.force_authenticate(self.shared_parent.user)
+        # when:
+        response = self.client.get(self.url)
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        group = response.data["results"][0]
+        self.assertNotIn("email", group["parents"][0])
+        self.assertNotIn("email", group["teachers"][0])
+
+
 class TestGroupViewPermissions(APITestCase):
 
     @classmethod
@@ -206,6 +281,407 @@ class TestGroupViewPermissions(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 
+class TestGroupRoster(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.staff = CustomUserFactory(is_staff=True)
+        cls.teacher = TeacherFactory()
+        cls.groups = [GroupFactory(group_name=f"Group {index}") for index in range(3)]
+        for size, group in enumerate(cls.groups):
+            cls.assigned_teacher = AssignedTeacher(teacher=TeacherFactory(), group=group)
+            for _ in range(size * 4):
+                ChildFactory(group=group, parents=[ParentFactory()])
+        AssignedTeacher(teacher=cls.teacher, group=cls.groups[2])
+
+    def test_group_list_with_fixed_queries(self):
+        # given:
+        self.client.force_authenticate(self.staff)
+        # when:
+        with self.assertNumQueries(3):
+            response = self.client.get(reverse('groups-list'))
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([group["roster_size"] for group in response.data], [0, 4, 8])
+        self.assertEqual([len(group["group_members"]) for group in response.data], [0, 4, 8])
+        self.assertEqual([len(group["assigned_teachers"]) for group in response.data], [1, 1, 2])
+
+    def test_group_detail_with_fixed_queries(self):
+        # given:
+        self.client.force_authenticate(self.teacher.user)
+        # when:
+        with self.assertNumQueries(4):
+            response = self.client.get(reverse('groups-detail', args=[self.groups[2].id]))
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["roster_size"], 8)
+        self.assertIn(self.teacher.user.first_name, response.data["assigned_teachers"])
+
+    def test_teacher_assignment_uses_joined_group(self):
+        # given:
+        self.client.force_authenticate(self.staff)
+        # when:
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('teachers-detail', args=[self.assigned_teacher.id]))
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["group"], ["Group 2"])
+
+
+class TestRosterImport(APITestCase):
+    header = "first_name,last_name,birth_date,group,parent_email,parent_first_name,parent_last_name\n"
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.manager = CustomUserFactory(user_type=UserTypeEnum.manager)
+        cls.parent = ParentFactory()
+        cls.teacher = TeacherFactory()
+        cls.group = GroupFactory(group_name="Ladybirds")
+        cls.url = reverse('members-import-roster')
+
+    def _csv(self, rows):
+        return self.header + "".join(f"{row}\n" for row in rows)
+
+    def _run(self, content, **options):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as roster:
+            roster.write(content)
+        self.addCleanup(os.remove, roster.name)
+        output, errors = StringIO(), StringIO()
+        call_command("import_roster", roster.name, stdout=output, stderr=errors, **options)
+        return output.getvalue(), errors.getvalue()
+
+    def _generated(self, count):
+        return self._csv(
+            f"Child{index},Family{index},2019-05-{index % 28 + 1:02d},Group {index % 3},"
+            f"parent{index}@example.com,Parent{index},Family{index}"
+            for index in range(count)
+        )
+
+    def test_command_imports_siblings_and_reports_errors(self):
+        # given:
+        content = self._csv([
+            "Ann,Smith,2019-03-01,Ladybirds,Mary.Smith@Example.com,Mary,Smith",
+            "Ann,Smith,2019-03-01,Ladybirds,john.smith@example.com,John,Smith",
+            "Tom,Smith,2020-07-12,Bees,mary.smith@example.com,Mary,Smith",
+            "Eve,Brown,2019-13-01,Bees,eve.parent@example.com,Eve,Brown",
+            f"Bob,Green,2019-01-01,Bees,{self.teacher.user.email},Bob,Green",
+            f"Kim,White,2020-02-02,Bees,{self.parent.user.email},Kim,White",
+        ])
+        # when:
+        output, errors = self._run(content, batch_size=2)
+        self._run(content, batch_size=4)
+        # then:
+        self.assertIn("Imported 4 of 6 rows", output)
+        self.assertIn("created 1 groups, 2 parents, 3 children, 4 links", output)
+        self.assertIn("Line 5: birth_date", errors)
+        self.assertIn("Line 6: parent_email", errors)
+        mary = Parent.objects.get(user__email="mary.smith@example.com")
+        self.assertEqual(
+            sorted(mary.children.values_list("first_name", flat=True)), ["Ann", "Tom"]
+        )
+        self.assertEqual(Child.objects.get(first_name="Ann").parents.count(), 2)
+        self.assertEqual(Group.objects.filter(group_name="Bees").count(), 1)
+        self.assertEqual(Child.objects.count(), 3)
+        self.assertFalse(mary.user.has_usable_password())
+        self.assertEqual(ParentInvitation.objects.filter(parent=mary).count(), 1)
+
+    def test_import_endpoint_query_count_does_not_depend_on_rows(self):
+        # given:
+        self.client.force_authenticate(self.manager)
+        queries = []
+        # when:
+        for count, prefix in ((10, "small"), (60, "large")):
+            content = self._generated(count).replace("@example.com", f"@{prefix}.example.com").replace(
+                "Group", prefix
+            )
+            upload = SimpleUploadedFile("roster.csv", content.encode(), content_type="text/csv")
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(self.url, {"file": upload}, format="multipart")
+            queries.append(len(context.captured_queries))
+            # then:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["created"]["links"], count)
+        self.assertEqual(queries[0], queries[1])
+
+    def test_import_endpoint_rejects_missing_columns(self):
+        # given:
+        self.client.force_authenticate(self.manager)
+        upload = SimpleUploadedFile("roster.csv", b"first_name,last_name\nAnn,Smith\n", content_type="text/csv")
+        # when:
+        response = self.client.post(self.url, {"file": upload}, format="multipart")
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Missing columns", response.data["file"][0])
+
+    def test_parent_cannot_import_roster(self):
+        # given:
+        self.client.force_authenticate(self.parent.user)
+        upload = SimpleUploadedFile("roster.csv", self._generated(1).encode(), content_type="text/csv")
+        # when:
+        response = self.client.post(self.url, {"file": upload}, format="multipart")
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class FailingEmailBackend(EmailBackend):
+    """
+    Locmem backend refusing messages to `failing` addresses
+    """
+    failing = {"bounce@example.com"}
+
+    def send_messages(self, messages):
+        if any(address in self.failing for message in messages for address in message.to):
+            raise ConnectionError("Mailbox unavailable")
+        return super().send_messages(messages)
+
+
+class SessionCountingEmailBackend(FailingEmailBackend):
+    """
+    Failing backend counting sessions, a message sent without an open session gets one of its own (like SMTP)
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.is_open = False
+        self.sessions = 0
+
+    def open(self):
+        if self.is_open:
+            return False
+        self.is_open = True
+        self.sessions += 1
+        return True
+
+    def close(self):
+        self.is_open = False
+
+    def send_messages(self, messages):
+        new_session = self.open()
+        try:
+            return super().send_messages(messages)
+        finally:
+            if new_session:
+                self.close()
+
+
+class RefusingEmailBackend(EmailBackend):
+    """
+    Backend of unreachable mail server
+    """
+
+    def open(self):
+        raise ConnectionRefusedError("Connection refused")
+
+
+class StopPolling(Exception):
+    pass
+
+
+class TestParentInvitations(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = GroupFactory()
+
+    def _create_child(self, email):
+        return Child.objects.create_with_parent(
+            {"email": email, "first_name": "Mary", "last_name": "Smith"},
+            {"first_name": "Ann", "last_name": "Smith", "birth_date": "2019-03-01", "group_id": self.group.id},
+        )
+
+    def test_creating_parent_only_queues_invitation(self):
+        # when:
+        child = self._create_child("mary@example.com")
+        # then:
+        invitation = ParentInvitation.objects.get()
+        self.assertEqual(invitation.parent, child.parents.get())
+        self.assertEqual(invitation.status, InvitationStatusEnum.pending)
+        self.assertEqual(mail.outbox, [])
+
+    def test_worker_sends_invitations_in_batches(self):
+        # given:
+        for index in range(5):
+            self._create_child(f"parent{index}@example.com")
+        output = StringIO()
+        # when:
+        call_command("send_parent_invitations", batch_size=2, stdout=output)
+        call_command("send_parent_invitations", stdout=output)
+        # then:
+        self.assertIn("Sent 5 invitations, 0 failed", output.getvalue())
+        self.assertIn("Sent 0 invitations", output.getvalue())
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [
+            f"parent{index}@example.com" for index in range(5)
+        ])
+        self.assertIn("http://localhost:8000/password-setup/", mail.outbox[0].body)
+        self.assertFalse(ParentInvitation.objects.exclude(status=InvitationStatusEnum.sent).exists())
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        # given:
+        self._create_child("bounce@example.com")
+        self._create_child("mary@example.com")
+        # when:
+        counters = send_pending_invitations(connection=FailingEmailBackend())
+        # then:
+        self.assertEqual(counters, {"sent": 1, "failed": 1})
+        invitation = ParentInvitation.objects.get(parent__user__email="bounce@example.com")
+        self.assertEqual((invitation.status, invitation.attempts), (InvitationStatusEnum.pending, 1))
+        self.assertEqual(invitation.last_error, "Mailbox unavailable")
+        self.assertGreater(invitation.next_attempt_at, timezone.now())
+
+        # when:
+        for attempt in range(INVITATION_MAX_ATTEMPTS - 1):
+            ParentInvitation.objects.update(next_attempt_at=timezone.now())
+            send_pending_invitations(connection=FailingEmailBackend())
+        # then:
+        invitation.refresh_from_db()
+        self.assertEqual((invitation.status, invitation.attempts), (InvitationStatusEnum.failed, INVITATION_MAX_ATTEMPTS))
+
+    def test_failed_delivery_reopens_shared_connection(self):
+        # given:
+        self._create_child("bounce@example.com")
+        for index in range(3):
+            self._create_child(f"parent{index}@example.com")
+        connection = SessionCountingEmailBackend()
+        # when:
+        counters = send_pending_invitations(connection=connection)
+        # then:
+        self.assertEqual(counters, {"sent": 3, "failed": 1})
+        self.assertEqual(connection.sessions, 2)
+
+    def test_empty_outbox_does_not_connect(self):
+        # given:
+        connection = SessionCountingEmailBackend()
+        # when:
+        counters = send_pending_invitations(connection=connection)
+        # then:
+        self.assertEqual(counters, {"sent": 0, "failed": 0})
+        self.assertEqual(connection.sessions, 0)
+
+    @override_settings(EMAIL_BACKEND="tests.test_endpoints.RefusingEmailBackend")
+    def test_unreachable_server_is_retried_with_backoff(self):
+        # given:
+        self._create_child("mary@example.com")
+        output = StringIO()
+        # when:
+        with patch("time.sleep", side_effect=StopPolling), self.assertRaises(StopPolling):
+            call_command("send_parent_invitations", interval=1, stdout=output)
+        # then:
+        self.assertIn("Sent 0 invitations, 1 failed", output.getvalue())
+        invitation = ParentInvitation.objects.get(parent__user__email="mary@example.com")
+        self.assertEqual((invitation.status, invitation.attempts), (InvitationStatusEnum.pending, 1))
+        self.assertEqual(invitation.last_error, "Connection refused")
+
+    def test_invitation_link_sets_password_once(self):
+        # given:
+        self._create_child("mary@example.com")
+        send_pending_invitations()
+        uid, token = mail.outbox[0].body.split("password-setup/")[1].split("/")[:2]
+        data = {"uid": uid, "token": token, "password": "Correct-horse-42"}
+        # when:
+        response = self.client.post(reverse("password-setup-list"), data)
+        reused = self.client.post(reverse("password-setup-list"), data)
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(reused.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(CustomUser.objects.get(email="mary@example.com").check_password("Correct-horse-42"))
+
+
+class TestGroupRollover(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.manager = CustomUserFactory(user_type=UserTypeEnum.manager)
+        cls.teacher = TeacherFactory()
+        cls.url = reverse('groups-rollover')
+
+    def setUp(self):
+        self.first, self.second, self.graduates = GroupFactory(), GroupFactory(), GroupFactory()
+        self.first_children = [ChildFactory(group=self.first) for _ in range(3)]
+        self.second_children = [ChildFactory(group=self.second) for _ in range(2)]
+        self.first_teacher = AssignedTeacher(teacher=TeacherFactory(), group=self.first)
+        self.second_teacher = AssignedTeacher(teacher=TeacherFactory(), group=self.second)
+
+    def _group_ids(self, objects):
+        return [type(obj).objects.get(id=obj.id).group_id for obj in objects]
+
+    def test_cohorts_move_up_at_once(self):
+        # given:
+        mapping = {self.first.id: self.second.id, self.second.id: self.graduates.id}
+        # when:
+        with self.assertNumQueries(7):
+            moves = Group.objects.rollover(mapping)
+        # then:
+        self.assertEqual(self._group_ids(self.first_children), [self.second.id] * 3)
+        self.assertEqual(self._group_ids(self.second_children), [self.graduates.id] * 2)
+        self.assertEqual(self._group_ids([self.first_teacher, self.second_teacher]), [self.second.id, self.graduates.id])
+        self.assertEqual(moves, [
+            {"group": self.first.id, "to": self.second.id, "children": 3, "teachers": 1, "duplicate_teachers": 0},
+            {"group": self.second.id, "to": self.graduates.id, "children": 2, "teachers": 1, "duplicate_teachers": 0},
+        ])
+
+    def test_dry_run_through_endpoint(self):
+        # given:
+        self.client.force_authenticate(self.manager)
+        data = {"moves": [{"from": self.first.id, "to": self.second.id}], "dry_run": True, "move_teachers": False}
+        # when:
+        response = self.client.post(self.url, data, format="json")
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["moves"], [
+            {"group": self.first.id, "to": self.second.id, "children": 3, "teachers": 0, "duplicate_teachers": 0},
+        ])
+        self.assertEqual(self._group_ids(self.first_children), [self.first.id] * 3)
+
+    def test_teacher_already_in_new_group_is_not_assigned_twice(self):
+        # given:
+        AssignedTeacher(teacher=self.first_teacher.teacher, group=self.graduates)
+        mapping = {self.first.id: self.graduates.id}
+        # when:
+        preview = Group.objects.rollover(mapping, dry_run=True)
+        moves = Group.objects.rollover(mapping)
+        # then:
+        expected = [
+            {"group": self.first.id, "to": self.graduates.id, "children": 3, "teachers": 0, "duplicate_teachers": 1},
+        ]
+        self.assertEqual(preview, expected)
+        self.assertEqual(moves, expected)
+        self.assertEqual(
+            list(self.first_teacher.teacher.groups.values_list("group", flat=True)), [self.graduates.id]
+        )
+
+    def test_command_keeps_teachers(self):
+        # given:
+        output = StringIO()
+        # when:
+        call_command("rollover_groups", "--move", f"{self.first.id}:{self.graduates.id}", "--keep-teachers", stdout=output)
+        # then:
+        self.assertIn("Moved 3 children and 0 teacher assignments", output.getvalue())
+        self.assertEqual(self._group_ids(self.first_children), [self.graduates.id] * 3)
+        self.assertEqual(self._group_ids([self.first_teacher]), [self.first.id])
+
+    def test_unknown_group_is_rejected(self):
+        # given:
+        self.client.force_authenticate(self.manager)
+        data = {"moves": [{"from": self.first.id, "to": 999999}]}
+        # when:
+        response = self.client.post(self.url, data, format="json")
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self._group_ids(self.first_children), [self.first.id] * 3)
+
+    def test_teacher_cannot_rollover(self):
+        # given:
+        self.client.force_authenticate(self.teacher.user)
+        # when:
+        response = self.client.post(self.url, {"moves": [{"from": self.first.id, "to": self.second.id}]}, format="json")
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
 class TestMeViewPermissions(APITestCase):
 
     @classmethod
@@ -286,9 +762,9 @@ class MessageViewPermissions(APITestCase):
         response = self.client.get(self.url)
         # then:
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIsInstance(response.data, list)
-        for message in response.data:
-            self.assertIn(message["child"], self.child_one.id)
+        self.assertIsInstance(response.data["results"], list)
+        for message in response.data["results"]:
+            self.assertEqual(message["child"], self.child_one.id)
        
 
     def test_list_message_view_for_parent(self):
@@ -298,12 +774,12 @@ class MessageViewPermissions(APITestCase):
         response = self.client.get(self.url)
         #then:
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIsInstance(response.data, list)
+        self.assertIsInstance(response.data["results"], list)
         self.assertContains(response, self.child_one.id)
         self.assertContains(response, self.child_two.id)
         self.assertContains(response, self.messages_child_one.id)
         self.assertContains(response, self.messages_child_two.id)
-        self.assertEqual(len(response.data), 2)
+        self.assertEqual(len(response.data["results"]), 2)
 
     def test_detail_message_view_for_unrelated_teacher(self):
         # when:
@@ -0,0 +1,908 @@
+import tempfile
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.test import APITestCase
+from rest_framework import status
+
+from school_tracker.schedules.archive import get_archive_path, open_archive
+from school_tracker.schedules.calendar import EventCalendar, event_calendar
+from school_tracker.schedules.ical import iter_feed
+from school_tracker.schedules.recurrence import expand_recurrence, parse_recurrence
+from school_tracker.schedules.trends import get_trends
+from school_tracker.chats.models import ReadCursor
+from school_tracker.schedules.models import DayPlan, DayPlanStatistic, Event
+from school_tracker.utils.enums import UserTypeEnum
+from tests.factories import (
+    AssignedTeacher,
+    ChildFactory,
+    CustomUserFactory,
+    DayPlanFactory,
+    EventFactory,
+    GroupFactory,
+    MessageFactory,
+    ParentFactory,
+    TeacherFactory
+)
+
+
+class TestDayPlanEvents(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.parent = ParentFactory()
+        cls.group = GroupFactory()
+        cls.teacher = TeacherFactory()
+        cls.assigned_teacher = AssignedTeacher(teacher=cls.teacher, group=cls.group)
+        cls.child = ChildFactory(parents=[cls.parent], group=cls.group)
+        cls.first_day = date(2024, 3, 4)
+        for offset in range(5):
+            dayplan = DayPlanFactory(child=cls.child)
+            DayPlan.objects.filter(id=dayplan.id).update(day=cls.first_day + timedelta(days=offset))
+        cls.trip = EventFactory(title="Trip to the zoo", date=cls.first_day)
+        cls.url = reverse('dayplans-list')
+
+    def setUp(self):
+        event_calendar.clear()
+
+    def test_dayplan_list_loads_events_with_single_query(self):
+        # given:
+        EventFactory(title="Theatre", date=self.first_day + timedelta(days=2))
+        self.client.force_authenticate(self.parent.user)
+        # when:
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        events = {entry["day"]: entry["events"] for entry in response.data}
+        self.assertEqual(events[str(self.first_day)], ["Trip to the zoo"])
+        self.assertEqual(events[str(self.first_day + timedelta(days=2))], ["Theatre"])
+        self.assertEqual(events[str(self.first_day + timedelta(days=1))], [])
+
+    def test_titles_survive_clear_during_prefetch(self):
+        # given:
+        calendar = EventCalendar()
+        prefetch = calendar.prefetch
+
+        def prefetch_and_clear(*args):
+            # Event saved by another thread right after loading
+            loaded = prefetch(*args)
+            calendar.clear()
+            return loaded
+
+        # when:
+        with patch.object(calendar, "prefetch", side_effect=prefetch_and_clear):
+            titles = calendar.get_titles(self.first_day)
+        # then:
+        self.assertEqual(titles, ["Trip to the zoo"])
+
+    def test_cached_events_are_served_without_queries(self):
+        # given:
+        self.client.force_authenticate(self.teacher.user)
+        self.client.get(self.url)
+        # then:
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url)
+        self.assertEqual(len(response.data), 5)
+
+    def test_saving_event_invalidates_cache(self):
+        # given:
+        self.client.force_authenticate(self.parent.user)
+        self.client.get(self.url)
+        # when:
+        self.trip.title = "Trip to the museum"
+        self.trip.save()
+        response = self.client.get(self.url, {"child": self.child.id})
+        # then:
+        events = {entry["day"]: entry["events"] for entry in response.data}
+        self.assertEqual(events[str(self.first_day)], ["Trip to the museum"])
+
+    def test_group_events_are_shown_to_group_only(self):
+        # given:
+        event = EventFactory(title="Group picnic", date=self.first_day)
+        event.groups.add(GroupFactory())
+        EventFactory(title="Own group picnic", date=self.first_day).groups.add(self.group)
+        self.client.force_authenticate(self.parent.user)
+        # when:
+        response = self.client.get(self.url)
+        # then:
+        events = {entry["day"]: entry["events"] for entry in response.data}
+        self.assertEqual(events[str(self.first_day)], ["Trip to the zoo", "Own group picnic"])
+
+    def test_dayplan_events_property(self):
+        # given:
+        dayplan = DayPlan.objects.get(child=self.child, day=self.first_day)
+        empty_dayplan = DayPlan.objects.get(child=self.child, day=self.first_day + timedelta(days=1))
+        # then:
+        self.assertEqual(dayplan.events, ["Trip to the zoo"])
+        self.assertEqual(empty_dayplan.events, "No events for today.")
+
+
+class TestRecurringEvents(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.parent = ParentFactory()
+        cls.child = ChildFactory(parents=[cls.parent])
+        cls.monday = date(2024, 3, 4)
+        DayPlan.objects.bulk_create([
+            DayPlan(child=cls.child, day=cls.monday + timedelta(days=offset)) for offset in range(5)
+        ])
+        cls.swimming = EventFactory(title="Swimming", date=date(2019, 9, 3), recurrence="FREQ=WEEKLY;BYDAY=TU")
+
+    def setUp(self):
+        event_calendar.clear()
+
+    def test_recurring_event_is_shown_on_matching_days(self):
+        # given:
+        EventFactory(title="Choir", date=date(2024, 2, 1), recurrence="FREQ=WEEKLY;COUNT=3;BYDAY=TH")
+        self.client.force_authenticate(self.parent.user)
+        # when:
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('dayplans-list'))
+        # then:
+        events = {entry["day"]: entry["events"] for entry in response.data}
+        self.assertEqual(events[str(self.monday + timedelta(days=1))], ["Swimming"])
+        self.assertEqual(sum(len(titles) for titles in events.values()), 1)
+
+    def test_rebased_expansion_matches_full_expansion(self):
+        # given:
+        rules = ["FREQ=WEEKLY;BYDAY=TU", "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,FR", "FREQ=DAILY;INTERVAL=3"]
+        first_day, start_day, end_day = date(2019, 9, 3), date(2024, 3, 1), date(2024, 4, 30)
+        for rule in rules:
+            # when:
+            days = expand_recurrence(rule, first_day, start_day, end_day)
+            # then:
+            expected = [
+                occurrence.date() for occurrence in parse_recurrence(rule, first_day).between(
+                    datetime.combine(start_day, time.min), datetime.combine(end_day, time.min), inc=True
+                )
+            ]
+            self.assertEqual(list(days), expected)
+
+    def test_recurrence_end_limits_loaded_events(self):
+        # when:
+        counted = EventFactory(date=self.monday, recurrence="FREQ=WEEKLY;COUNT=3")
+        until = EventFactory(date=self.monday, recurrence="FREQ=DAILY;UNTIL=20240310")
+        # then:
+        self.assertEqual(counted.recurrence_end, date(2024, 3, 18))
+        self.assertEqual(until.recurrence_end, date(2024, 3, 10))
+        self.assertIsNone(self.swimming.recurrence_end)
+        self.assertEqual(
+            set(Event.objects.occurring(date(2024, 3, 12), date(2024, 3, 31))), {self.swimming, counted}
+        )
+
+    def test_recurring_days_off(self):
+        # given:
+        group = GroupFactory()
+        EventFactory(date=self.monday, is_day_off=True, recurrence="FREQ=WEEKLY;BYDAY=FR").groups.add(group)
+        # when:
+        days_off = Event.objects.fetch_days_off(date(2024, 3, 11), date(2024, 3, 24))
+        # then:
+        self.assertEqual(days_off, {date(2024, 3, 15): {group.id}, date(2024, 3, 22): {group.id}})
+
+    def test_feed_contains_recurrence_rule(self):
+        # when:
+        feed = "".join(iter_feed(Event.objects.all()))
+        # then:
+        self.assertIn("DTSTART;VALUE=DATE:20190903\r\nRRULE:FREQ=WEEKLY;BYDAY=TU\r\n", feed)
+
+    def test_invalid_recurrence_is_rejected(self):
+        # given:
+        event = EventFactory.build(date=self.monday, recurrence="every tuesday")
+        # then:
+        with self.assertRaises(ValidationError):
+            event.full_clean()
+
+
+class TestDayPlanBulkReports(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = GroupFactory()
+        cls.teacher = TeacherFactory()
+        cls.unrelated_teacher = TeacherFactory()
+        cls.assigned_teacher = AssignedTeacher(teacher=cls.teacher, group=cls.group)
+        cls.children = [ChildFactory(group=cls.group) for _ in range(10)]
+        cls.other_child = ChildFactory()
+        cls.url = reverse('dayplans-bulk')
+
+    def _reports(self, behaviour="great_day"):
+        return [
+            {"child": child.id, "meals_at_school": "full", "behaviour": behaviour, "summary": "Fine"}
+            for child in self.children
+        ]
+
+    def test_bulk_reports_are_saved_with_constant_queries(self):
+        # given:
+        small_group = GroupFactory()
+        AssignedTeacher(teacher=self.teacher, group=small_group)
+        small_children = [ChildFactory(group=small_group) for _ in range(2)]
+        self.client.force_authenticate(self.teacher.user)
+        queries = []
+        for group, children in ((small_group, small_children), (self.group, self.children)):
+            reports = [
+                {"child": child.id, "meals_at_school": "full", "behaviour": "great_day", "summary": "Fine"}
+                for child in children
+            ]
+            # when:
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(self.url, {"group": group.id, "reports": reports}, format="json")
+            queries.append(len(context.captured_queries))
+            # then:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data["saved"], len(children))
+        self.assertEqual(queries[0], queries[1])
+        self.assertEqual(DayPlan.objects.filter(child__group=self.group, behaviour="great_day").count(), 10)
+
+    def test_duplicate_teacher_assignment_does_not_repeat_dayplans(self):
+        # given:
+        dayplan = DayPlanFactory(child=self.children[0], day=date(2024, 3, 4))
+        AssignedTeacher(teacher=self.teacher, group=self.group)
+        # when:
+        dayplans = DayPlan.objects.fetch_related_to_user(self.teacher.user).filter(child__group=self.group)
+        # then:
+        self.assertEqual(list(dayplans), [dayplan])
+
+    def test_partial_reports_keep_other_fields(self):
+        # given:
+        DayPlanFactory(
+            child=self.children[0], day=date(2024, 3, 4), meals_at_school="full", behaviour="ok_day", summary="Ate well"
+        )
+        self.client.force_authenticate(self.teacher.user)
+        reports = [
+            {"child": self.children[0].id, "behaviour": "great_day"},
+            {"child": self.children[1].id, "summary": "Napped"},
+        ]
+        # when:
+        response = self.client.post(
+            self.url, {"group": self.group.id, "day": "2024-03-04", "reports": reports}, format="json"
+        )
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            list(DayPlan.objects.filter(day=date(2024, 3, 4)).order_by("child").values_list(
+                "meals_at_school", "behaviour", "summary"
+            )),
+            [("full", "great_day", "Ate well"), ("not_specified", "not_specified", "Napped")],
+        )
+        self.assertEqual(
+            list(DayPlanStatistic.objects.filter(child=self.children[0], period="week").exclude(count=0).order_by(
+                "field"
+            ).values_list("field", "value", "count")),
+            [("behaviour", "great_day", 1), ("meals_at_school", "full", 1)],
+        )
+
+    def test_bulk_reports_update_existing_dayplans(self):
+        # given:
+        DayPlanFactory(child=self.children[0], day=date(2024, 3, 4), summary="Old")
+        self.client.force_authenticate(self.teacher.user)
+        # when:
+        response = self.client.post(
+            self.url,
+            {"group": self.group.id, "day": "2024-03-04", "reports": self._reports("ok_day")},
+            format="json",
+        )
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        dayplans = DayPlan.objects.filter(child=self.children[0])
+        self.assertEqual(dayplans.count(), 1)
+        self.assertEqual((dayplans[0].behaviour, dayplans[0].summary), ("ok_day", "Fine"))
+
+    def test_children_outside_group_are_rejected(self):
+        # given:
+        self.client.force_authenticate(self.teacher.user)
+        reports = self._reports() + [{"child": self.other_child.id}]
+        # when:
+        response = self.client.post(self.url, {"group": self.group.id, "reports": reports}, format="json")
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(DayPlan.objects.exists())
+
+    def test_unrelated_teacher_cannot_fill_reports(self):
+        # given:
+        self.client.force_authenticate(self.unrelated_teacher.user)
+        # when:
+        response = self.client.post(
+            self.url, {"group": self.group.id, "reports": self._reports()}, format="json"
+        )
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestDayPlanTimeline(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.parent = ParentFactory()
+        cls.other_parent = ParentFactory()
+        cls.child = ChildFactory(parents=[cls.parent])
+        cls.first_day = date(2022, 9, 1)
+        DayPlan.objects.bulk_create([
+            DayPlan(child=cls.child, day=cls.first_day + timedelta(days=offset)) for offset in range(100)
+        ])
+        cls.url = reverse('dayplans-timeline', args=[cls.child.id])
+
+    def setUp(self):
+        event_calendar.clear()
+
+    def test_timeline_walks_history_newest_first(self):
+        # given:
+        self.client.force_authenticate(self.parent.user)
+        days, url = [], f"{self.url}?page_size=30"
+        # when:
+        while url:
+            with self.assertNumQueries(4):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            days += [entry["day"] for entry in response.data["results"]]
+            url = response.data["next"]
+        # then:
+        self.assertEqual(len(days), 100)
+        self.assertEqual(days, sorted(days, reverse=True))
+
+    def test_timeline_within_date_range(self):
+        # given:
+        self.client.force_authenticate(self.parent.user)
+        # when:
+        response = self.client.get(self.url, {"from": "2022-09-03", "to": "2022-09-05"})
+        # then:
+        self.assertEqual(
+            [entry["day"] for entry in response.data["results"]],
+            ["2022-09-05", "2022-09-04", "2022-09-03"],
+        )
+        self.assertIsNone(response.data["next"])
+
+    def test_invalid_cursor(self):
+        # given:
+        self.client.force_authenticate(self.parent.user)
+        # when:
+        response = self.client.get(self.url, {"cursor": "broken"})
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unrelated_parent_cannot_see_timeline(self):
+        # given:
+        self.client.force_authenticate(self.other_parent.user)
+        # when:
+        response = self.client.get(self.url)
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestDayPlanStatistics(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.manager = CustomUserFactory(user_type=UserTypeEnum.manager)
+        cls.parent = ParentFactory()
+        cls.group = GroupFactory()
+        cls.child = ChildFactory(parents=[cls.parent], group=cls.group)
+        cls.classmate = ChildFactory(group=cls.group)
+        cls.monday = date(2024, 3, 4)
+
+    def _counters(self, child, period="week"):
+        return {
+            (row["period_start"], row["field"], row["value"]): row["total"]
+            for row in DayPlanStatistic.objects.fetch_for_child(child.id, period)
+        }
+
+    def test_saving_dayplans_updates_counters(self):
+        # when:
+        DayPlanFactory(child=self.child, day=self.monday, behaviour="great_day", meals_at_school="full")
+        dayplan = DayPlanFactory(child=self.child, day=self.monday + timedelta(days=1), behaviour="great_day")
+        dayplan.behaviour = "talk_needed"
+        dayplan.save()
+        DayPlanFactory(child=self.child, day=self.monday + timedelta(days=2))
+        # then:
+        self.assertEqual(self._counters(self.child), {
+            (self.monday, "behaviour", "great_day"): 1,
+            (self.monday, "behaviour", "talk_needed"): 1,
+            (self.monday, "meals_at_school", "full"): 1,
+        })
+        self.assertEqual(self._counters(self.child, "month")[(date(2024, 3, 1), "behaviour", "great_day")], 1)
+
+    def test_deleting_dayplan_updates_counters(self):
+        # given:
+        dayplan = DayPlanFactory(child=self.child, day=self.monday, behaviour="ok_day")
+        # when:
+        DayPlan.objects.get(id=dayplan.id).delete()
+        # then:
+        self.assertEqual(self._counters(self.child), {})
+
+    def test_bulk_reports_update_counters(self):
+        # given:
+        DayPlanFactory(child=self.child, day=self.monday, behaviour="ok_day")
+        # when:
+        DayPlan.objects.upsert_reports(self.monday, [
+            {"child": self.child.id, "behaviour": "great_day", "meals_at_school": "half"},
+            {"child": self.classmate.id, "behaviour": "great_day", "meals_at_school": "full"},
+        ])
+        # then:
+        self.assertEqual(self._counters(self.child), {
+            (self.monday, "behaviour", "great_day"): 1,
+            (self.monday, "meals_at_school", "half"): 1,
+        })
+
+    def test_stale_instance_updates_counters_from_stored_row(self):
+        # given:
+        DayPlanFactory(child=self.child, day=self.monday, behaviour="great_day")
+        stale = DayPlan.objects.get(child=self.child, day=self.monday)
+        DayPlan.objects.upsert_reports(self.monday, [{"child": self.child.id, "behaviour": "ok_day"}])
+        # when:
+        stale.behaviour = "talk_needed"
+        stale.save()
+        # then:
+        counters = DayPlanStatistic.objects.filter(child=self.child, period="week").exclude(count=0)
+        self.assertEqual(
+            list(counters.values_list("field", "value", "count")), [("behaviour", "talk_needed", 1)]
+        )
+
+    def test_stale_instance_delete_removes_stored_values(self):
+        # given:
+        DayPlanFactory(child=self.child, day=self.monday, behaviour="great_day")
+        stale = DayPlan.objects.get(child=self.child, day=self.monday)
+        DayPlan.objects.upsert_reports(self.monday, [{"child": self.child.id, "behaviour": "ok_day"}])
+        # when:
+        stale.delete()
+        # then:
+        self.assertFalse(DayPlanStatistic.objects.filter(child=self.child).exclude(count=0).exists())
+
+    def test_bulk_reports_lock_replaced_dayplans(self):
+        # given:
+        DayPlanFactory(child=self.child, day=self.monday, behaviour="ok_day")
+        # when:
+        with CaptureQueriesContext(connection) as queries:
+            DayPlan.objects.upsert_reports(self.monday, [
+                {"child": self.classmate.id, "behaviour": "ok_day"},
+                {"child": self.child.id, "behaviour": "great_day"},
+            ])
+        # then:
+        selects = [query["sql"] for query in queries.captured_queries if query["sql"].startswith("SELECT")]
+        if connection.features.has_select_for_update:
+            self.assertIn("FOR UPDATE", selects[0])
+        self.assertEqual(self._counters(self.child), {(self.monday, "behaviour", "great_day"): 1})
+        self.assertEqual(self._counters(self.classmate), {(self.monday, "behaviour", "ok_day"): 1})
+
+    def test_rebuild_matches_incremental_counters(self):
+        # given:
+        for offset, behaviour in enumerate(["great_day", "ok_day", "great_day", "not_specified"]):
+            DayPlanFactory(child=self.child, day=self.monday + timedelta(days=offset * 3), behaviour=behaviour)
+        counters = {period: self._counters(self.child, period) for period in ("week", "month")}
+        # when:
+        DayPlanStatistic.objects.all().delete()
+        DayPlanStatistic.objects.rebuild()
+        # then:
+        self.assertEqual({period: self._counters(self.child, period) for period in ("week", "month")}, counters)
+
+    def test_group_statistics_for_manager(self):
+        # given:
+        DayPlan.objects.upsert_reports(self.monday, [
+            {"child": self.child.id, "behaviour": "great_day"},
+            {"child": self.classmate.id, "behaviour": "great_day"},
+        ])
+        self.client.force_authenticate(self.manager)
+        # when:
+        response = self.client.get(reverse('dayplans-group-statistics'), {"group": self.group.id})
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [
+            {"period_start": self.monday, "behaviour": {"great_day": 2}},
+        ])
+
+    def test_child_statistics_for_parent(self):
+        # given:
+        DayPlanFactory(child=self.child, day=self.monday, behaviour="great_day")
+        self.client.force_authenticate(self.parent.user)
+        # when:
+        response = self.client.get(
+            reverse('dayplans-statistics', args=[self.child.id]), {"period": "month", "from": "2024-03-15"}
+        )
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], [
+            {"period_start": date(2024, 3, 1), "behaviour": {"great_day": 1}},
+        ])
+
+    def test_parent_cannot_read_group_statistics(self):
+        # given:
+        self.client.force_authenticate(self.parent.user)
+        # when:
+        response = self.client.get(reverse('dayplans-group-statistics'), {"group": self.group.id})
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class TestEventFeed(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.parent = ParentFactory()
+        cls.group = GroupFactory()
+        cls.child = ChildFactory(parents=[cls.parent], group=cls.group)
+        cls.other_group = GroupFactory()
+
+    def setUp(self):
+        cache.clear()
+        self.open_day = EventFactory(title="Open day", date=date(2024, 3, 4))
+        self.picnic = EventFactory(title="Picnic; bring food", date=date(2024, 3, 5))
+        self.picnic.groups.add(self.group)
+        self.trip = EventFactory(title="Other group trip", date=date(2024, 3, 6))
+        self.trip.groups.add(self.other_group)
+        self.client.force_authenticate(self.parent.user)
+        self.url = self.client.get(reverse('events-feed-url')).data["url"]
+        self.client.force_authenticate(None)
+
+    def _get(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        content = b"".join(response.streaming_content) if response.streaming else response.content
+        return response, content.decode()
+
+    def test_feed_contains_institution_and_own_group_events(self):
+        # when:
+        response, content = self._get()
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "text/calendar; charset=utf-8")
+        self.assertIn("SUMMARY:Open day\r\n", content)
+        self.assertIn("SUMMARY:Picnic\\; bring food\r\n", content)
+        self.assertIn("DTSTART;VALUE=DATE:20240305\r\n", content)
+        self.assertNotIn("Other group trip", content)
+
+    def test_unchanged_feed_is_not_modified(self):
+        # given:
+        response, content = self._get()
+        # when:
+        with self.assertNumQueries(3):
+            by_etag, _ = self._get(if_none_match=response["ETag"])
+        # then:
+        self.assertEqual(by_etag.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertNotIn("Last-Modified", response)
+
+    def test_feed_is_served_from_cache(self):
+        # given:
+        _, content = self._get()
+        # when:
+        with self.assertNumQueries(3):
+            response, cached_content = self._get()
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached_content, content)
+
+    def test_changed_event_changes_feed(self):
+        # given:
+        response, _ = self._get()
+        # when:
+        self.trip.groups.add(self.group)
+        changed, content = self._get(if_none_match=response["ETag"])
+        # then:
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(changed["ETag"], response["ETag"])
+        self.assertIn("Other group trip", content)
+
+    def test_deleted_event_changes_feed(self):
+        # given:
+        response, _ = self._get()
+        # when:
+        self.picnic.delete()
+        changed, content = self._get(if_none_match=response["ETag"])
+        by_date, _ = self._get(if_modified_since=http_date(timezone.now().timestamp()))
+        # then:
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(by_date.status_code, status.HTTP_200_OK)
+        self.assertNotIn("Picnic", content)
+
+    def test_version_is_shared_through_database(self):
+        # given:
+        response, _ = self._get()
+        # when:
+        # change made by another process, which does not reach this process' cache
+        Event.objects.filter(pk=self.open_day.pk).update(title="Open day moved", updated_at=timezone.now())
+        changed, content = self._get(if_none_match=response["ETag"])
+        # then:
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertIn("SUMMARY:Open day moved\r\n", content)
+
+    def test_invalid_token(self):
+        # when:
+        response = self.client.get(reverse('events-feed', kwargs={"token": "forged"}))
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestParentDashboard(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.parent = ParentFactory()
+        cls.teacher = TeacherFactory()
+        cls.url = reverse('dashboard-list')
+
+    def setUp(self):
+        event_calendar.clear()
+
+    def _add_child(self, name):
+        child = ChildFactory(first_name=name, parents=[self.parent])
+        DayPlanFactory(child=child, behaviour="great_day")
+        EventFactory(title=f"{name}'s group trip", date=timezone.localdate()).groups.add(child.group)
+        message = MessageFactory(sender=self.teacher.user, child=child)
+        ReadCursor.objects.create(user=self.parent.user, child=child, unread_count=2)
+        return child, message
+
+    def _dashboard(self):
+        self.client.force_authenticate(self.parent.user)
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_dashboard_summarizes_every_child(self):
+        # given:
+        child, message = self._add_child("Ann")
+        EventFactory(title="Institution holiday", date=timezone.localdate())
+        # when:
+        data = self._dashboard()
+        # then:
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]["id"], child.id)
+        self.assertEqual(data[0]["dayplan"]["behaviour"], "great_day")
+        self.assertEqual(data[0]["events"], ["Ann's group trip", "Institution holiday"])
+        self.assertEqual(data[0]["latest_message"]["id"], message.id)
+        self.assertEqual(data[0]["unread_count"], 2)
+
+    def test_dashboard_query_count_does_not_depend_on_children(self):
+        # given:
+        for name in ["Ann", "Bob", "Cecil", "Dora"]:
+            self._add_child(name)
+        ChildFactory(first_name="Eve", parents=[self.parent])
+        # when:
+        data = self._dashboard()
+        # then:
+        self.assertEqual([entry["first_name"] for entry in data], ["Ann", "Bob", "Cecil", "Dora", "Eve"])
+        self.assertEqual(data[-1]["dayplan"], None)
+        self.assertEqual(data[-1]["latest_message"], None)
+        self.assertEqual(data[-1]["unread_count"], 0)
+
+
+class TestPregenerateDayPlans(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = GroupFactory()
+        cls.closed_group = GroupFactory()
+        cls.children = [ChildFactory(group=cls.group) for _ in range(3)]
+        cls.closed_child = ChildFactory(group=cls.closed_group)
+        cls.friday = date(2024, 3, 8)
+
+    def _run(self, **options):
+        output = StringIO()
+        call_command("pregenerate_dayplans", stdout=output, **options)
+        return output.getvalue()
+
+    def test_empty_dayplans_are_created_once(self):
+        # given:
+        DayPlanFactory(child=self.children[0], day=self.friday, behaviour="great_day")
+        # when:
+        output = self._run(day=self.friday)
+        self._run(day=self.friday)
+        # then:
+        self.assertIn("created 3 dayplans", output)
+        self.assertEqual(DayPlan.objects.filter(day=self.friday).count(), 4)
+        self.assertEqual(DayPlan.objects.get(child=self.children[0], day=self.friday).behaviour, "great_day")
+
+    def test_weekends_and_days_off_are_skipped(self):
+        # given:
+        EventFactory(date=self.friday, is_day_off=True).groups.add(self.closed_group)
+        EventFactory(date=self.friday + timedelta(days=3), is_day_off=True)
+        # when:
+        with self.assertRaises(CommandError):
+            self._run(day=self.friday + timedelta(days=1))
+        self._run(day=self.friday)
+        # then:
+        self.assertFalse(DayPlan.objects.filter(child=self.closed_child).exists())
+        self.assertEqual(DayPlan.objects.filter(day=self.friday).count(), 3)
+
+    def test_next_school_days_are_generated(self):
+        # given:
+        today = timezone.localdate()
+        # when:
+        self._run(days=3)
+        # then:
+        days = sorted(set(DayPlan.objects.values_list("day", flat=True)))
+        self.assertEqual(len(days), 3)
+        self.assertTrue(all(today < day and day.weekday() < 5 for day in days))
+
+
+class TestDayPlanArchive(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.parent = ParentFactory()
+        cls.other_parent = ParentFactory()
+        cls.child = ChildFactory(parents=[cls.parent])
+        cls.classmate = ChildFactory()
+        cls.first_day = date(2022, 9, 1)
+        cls.url = reverse('dayplans-archive', args=[cls.child.id])
+
+    def setUp(self):
+        archive_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archive_dir.cleanup)
+        settings_override = override_settings(DAYPLAN_ARCHIVE_DIR=archive_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def _create_history(self):
+        behaviours = ["great_day", "ok_day", "talk_needed", "not_specified"]
+        for offset in range(40):
+            DayPlanFactory(
+                child=self.child,
+                day=self.first_day + timedelta(days=offset * 7),
+                behaviour=behaviours[offset % 4],
+                meals_at_school="full",
+                summary=f"Week {offset} żółw" if offset % 2 else None,
+            )
+            DayPlanFactory(child=self.classmate, day=self.first_day + timedelta(days=offset * 7))
+        DayPlanFactory(child=self.child, day=date(2023, 9, 1), behaviour="great_day")
+
+    def _run(self, **options):
+        output = StringIO()
+        call_command("archive_dayplans", stdout=output, **options)
+        return output.getvalue()
+
+    def test_archive_replaces_rows_of_closed_year(self):
+        # given:
+        self._create_history()
+        timeline = list(
+            DayPlan.objects.fetch_timeline(self.child.id, self.first_day, date(2023, 8, 31)).values(
+                "day", "meals_at_school", "behaviour", "summary"
+            )
+        )
+        counters = list(DayPlanStatistic.objects.fetch_for_child(self.child.id, "month", end_day=date(2023, 8, 31)))
+        # when:
+        output = self._run(year=2022, delete=True)
+        # then:
+        self.assertIn("Deleted 80 dayplans", output)
+        self.assertEqual(list(DayPlan.objects.values_list("day", flat=True)), [date(2023, 9, 1)])
+        reader = open_archive(2022)
+        self.assertEqual(len(reader), 80)
+        self.assertEqual(reader.timeline(self.child.id), timeline)
+        self.assertEqual(reader.statistics(self.child.id, "month"), counters)
+
+    def test_rebuild_after_archive_keeps_archived_counters(self):
+        # given:
+        self._create_history()
+        counters = list(DayPlanStatistic.objects.order_by("child", "period", "period_start", "field", "value").values(
+            "child", "period", "period_start", "field", "value", "count"
+        ))
+        self._run(year=2022, delete=True)
+        # when:
+        call_command("rebuild_dayplan_statistics", stdout=StringIO())
+        # then:
+        self.assertEqual(list(DayPlanStatistic.objects.order_by(
+            "child", "period", "period_start", "field", "value"
+        ).values("child", "period", "period_start", "field", "value", "count")), counters)
+
+    def test_archive_endpoint_for_parent(self):
+        # given:
+        self._create_history()
+        self._run(year=2022)
+        self.client.force_authenticate(self.parent.user)
+        # when:
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"year": 2022, "period": "month", "to": "2022-09-30"})
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([dayplan["day"] for dayplan in response.data["dayplans"]], [
+            date(2022, 9, 29), date(2022, 9, 22), date(2022, 9, 15), date(2022, 9, 8), date(2022, 9, 1),
+        ])
+        self.assertEqual(response.data["dayplans"][1]["summary"], "Week 3 żółw")
+        self.assertEqual(response.data["statistics"], [{
+            "period_start": date(2022, 9, 1),
+            "behaviour": {"great_day": 2, "ok_day": 1, "talk_needed": 1},
+            "meals_at_school": {"full": 5},
+        }])
+
+    def test_archive_endpoint_errors(self):
+        # given:
+        self._run(year=2022)
+        # when:
+        self.client.force_authenticate(self.other_parent.user)
+        forbidden = self.client.get(self.url, {"year": 2022})
+        self.client.force_authenticate(self.parent.user)
+        missing = self.client.get(self.url, {"year": 2021})
+        # then:
+        self.assertEqual(forbidden.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(get_archive_path(2022).exists())
+
+    def test_open_school_year_is_not_archived(self):
+        # given:
+        today = timezone.localdate()
+        year = today.year if today.month >= 9 else today.year - 1
+        # when:
+        with self.assertRaises(CommandError):
+            self._run(year=year)
+        # then:
+        self.assertIsNone(open_archive(year))
+
+
+class TestBehaviourTrends(APITestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.teacher = TeacherFactory()
+        cls.parent = ParentFactory()
+        cls.group = GroupFactory()
+        AssignedTeacher(teacher=cls.teacher, group=cls.group)
+        cls.drifting = ChildFactory(group=cls.group, parents=[cls.parent])
+        cls.steady = ChildFactory(group=cls.group)
+        cls.silent = ChildFactory(group=cls.group)
+        cls.url = reverse('dayplans-trends')
+
+    def setUp(self):
+        cache.clear()
+
+    def _history(self, days):
+        start = timezone.localdate() - timedelta(days=days)
+        rows = []
+        for offset in range(days):
+            day = start + timedelta(days=offset)
+            worse = offset >= days - 5
+            rows.append((self.drifting.id, day, "talk_needed" if worse else ["great_day", "ok_day"][offset % 2]))
+            rows.append((self.steady.id, day, "ok_day"))
+        return rows
+
+    def test_drifting_child_is_flagged_first(self):
+        # when:
+        results = get_trends([self.steady.id, self.silent.id, self.drifting.id], self._history(30), window=5)
+        # then:
+        self.assertEqual([row["child"] for row in results], [self.drifting.id, self.steady.id, self.silent.id])
+        self.assertEqual(results[0]["flags"], ["drift", "concern"])
+        self.assertEqual((results[0]["baseline"], results[0]["recent"]), (0.48, 3.0))
+        self.assertEqual((results[1]["flags"], results[1]["zscore"]), ([], 0.0))
+        self.assertEqual(results[2], {
+            "child": self.silent.id, "reports": 0, "baseline": None,
+            "previous": None, "recent": None, "zscore": None, "flags": [],
+        })
+
+    def test_trends_are_cached_per_group_per_day(self):
+        # given:
+        for child_id, day, behaviour in self._history(20):
+            DayPlanFactory(child_id=child_id, day=day, behaviour=behaviour)
+        self.client.force_authenticate(self.teacher.user)
+        # when:
+        response = self.client.get(self.url, {"group": self.group.id, "window": 5})
+        with self.assertNumQueries(2):
+            cached = self.client.get(self.url, {"group": self.group.id, "window": 5})
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(cached.data, response.data)
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_parent_cannot_read_trends(self):
+        # given:
+        self.client.force_authenticate(self.parent.user)
+        # when:
+        response = self.client.get(self.url, {"group": self.group.id})
+        # then:
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)